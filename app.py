@@ -1,23 +1,22 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, Response
 from dotenv import load_dotenv
 import os
-import openai
 import json
+import copy
 import urllib.parse
 from datetime import datetime
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
 import pdfkit
 import tempfile
-import shutil
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
 from ml_model import HealthAnalysisModel  # Add ML model import
+from llm_gateway import LLMGateway
+from llm_cache import LLMResponseCache
+from json_stream import IncrementalJSONObjectParser
+from job_queue import JobQueue, InMemoryJobStore, SQLiteJobStore
+from pdf_report import ReportRenderPool
+from mailer import Mailer, SMTPConnectionPool
 import random
 
 load_dotenv()
@@ -25,14 +24,49 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.urandom(24)  # Required for session handling
 
+# PDF reports render in worker processes. Created first so the workers are
+# forked before any background threads start.
+pdf_render_pool = ReportRenderPool(max_workers=int(os.getenv('METABOLX_PDF_WORKERS', '2')))
+
 # Initialize OpenAI with API key from environment variable
 api_key = os.getenv('OPENAI_API_KEY')
 if not api_key:
     raise ValueError("No OpenAI API key found. Please set the OPENAI_API_KEY environment variable.")
-openai.api_key = api_key
+
+# Shared async OpenAI client: pooled connections, bounded concurrency
+llm_gateway = LLMGateway(api_key=api_key)
+
+# Cache of blood report analyses, keyed by the full prompt. Bump the schema
+# version whenever the expected JSON structure changes.
+ANALYSIS_SCHEMA_VERSION = 1
+analysis_cache = LLMResponseCache(
+    max_entries=int(os.getenv('METABOLX_LLM_CACHE_SIZE', '256')),
+    ttl=int(os.getenv('METABOLX_LLM_CACHE_TTL', '86400')),
+    path=os.getenv('METABOLX_LLM_CACHE_PATH')
+)
+
+# Blood report analyses and report emails run in the background; set a job
+# store path to share results between worker processes
+job_store_path = os.getenv('METABOLX_JOB_STORE_PATH')
+job_store = SQLiteJobStore(job_store_path) if job_store_path else InMemoryJobStore()
+analysis_jobs = JobQueue(store=job_store, max_workers=int(os.getenv('METABOLX_ANALYSIS_WORKERS', '4')))
+report_jobs = JobQueue(store=job_store, max_workers=int(os.getenv('METABOLX_PDF_WORKERS', '2')))
+
+# Report emails go out over pooled, logged-in SMTP sessions, with retries
+mailer = Mailer(SMTPConnectionPool(
+    os.getenv('SMTP_HOST', 'smtp.gmail.com'),
+    int(os.getenv('SMTP_PORT', '587')),
+    username=os.getenv('EMAIL_USER'),
+    password=os.getenv('EMAIL_PASSWORD'),
+    starttls=os.getenv('SMTP_STARTTLS', '1') != '0',
+    max_connections=int(os.getenv('METABOLX_SMTP_CONNECTIONS', '2'))
+))
 
 # Initialize ML model
-health_model = HealthAnalysisModel()
+health_model = HealthAnalysisModel(
+    retrain=os.getenv('METABOLX_RETRAIN') == '1',
+    mmap=os.getenv('METABOLX_MODEL_MMAP') == '1'
+)
 
 @app.context_processor
 def utility_processor():
@@ -55,7 +89,391 @@ def get_bmi_category(bmi):
     else:
         return "Obese"
 
-def analyze_blood_report(report_text, patient_data):
+# Top-level fields of the blood report analysis and their JSON types
+ANALYSIS_SCHEMA = {
+    "healthScore": "number",
+    "metaboliteScore": "number",
+    "comprehensiveScore": "number",
+    "criticalMarkers": "array",
+    "improvementAreas": "array",
+    "detailedAnalysis": "string",
+    "diagnosis": "object",
+    "medicines": "array",
+    "recommendations": "object",
+    "advancedFeatures": "object",
+    "systemScores": "object",
+    "biomarkers": "object",
+    "charts": "object",
+    "comprehensiveAnalysis": "array",
+    "metabolism": "array",
+    "medicineComparison": "object"
+}
+
+# Used for any field the model's response is missing, gets wrong or loses to truncation
+DEFAULT_ANALYSIS = {
+    "healthScore": 70,
+    "metaboliteScore": 75,
+    "comprehensiveScore": 72,
+    "criticalMarkers": [
+        "Unable to parse detailed analysis"
+    ],
+    "improvementAreas": [
+        "Please consult healthcare provider"
+    ],
+    "detailedAnalysis": "Error processing detailed analysis",
+    "diagnosis": {
+        "primary": "Analysis processing error",
+        "findings": [
+            "Unable to process detailed findings"
+        ],
+        "risks": [
+            "Assessment incomplete"
+        ],
+        "recommendations": [
+            "Please consult healthcare provider for detailed analysis"
+        ],
+        "followup": {
+            "plan": "Schedule follow-up with healthcare provider",
+            "nextAppointment": "As soon as possible"
+        }
+    },
+    "medicines": [
+        {
+            "name": "Default Medicine",
+            "description": "Standard treatment option based on patient profile",
+            "score": 85,
+            "dosage": "As prescribed by healthcare provider",
+            "category": "Primary Treatment",
+            "primaryUse": "General health management",
+            "warnings": [
+                "Consult healthcare provider before use",
+                "Follow prescribed dosage strictly"
+            ]
+        }
+    ],
+    "recommendations": {
+        "lifestyle": [
+            "Please consult healthcare provider"
+        ],
+        "diet": [
+            "Please consult healthcare provider"
+        ],
+        "followUp": [
+            "Schedule follow-up appointment"
+        ]
+    },
+    "advancedFeatures": {
+        "insulin_resistance_index": 75,
+        "metabolic_syndrome_score": 80,
+        "inflammation_index": 70,
+        "oxidative_stress_score": 65,
+        "hormone_balance_index": 85,
+        "cardiovascular_risk_index": 30,
+        "liver_health_index": 85,
+        "kidney_function_index": 90,
+        "metabolic_efficiency_score": 80,
+        "immune_system_score": 85,
+        "endocrine_balance_score": 80,
+        "digestive_health_score": 75,
+        "bone_health_index": 85,
+        "muscle_mass_index": 80,
+        "vascular_health_score": 85
+    },
+    "systemScores": {
+        "liver": 85,
+        "kidney": 90,
+        "cardiovascular": 80,
+        "endocrine": 85,
+        "immune": 85,
+        "digestive": 75
+    },
+    "biomarkers": {
+        "glucose": 95,
+        "cholesterol": 180,
+        "hdl": 55,
+        "ldl": 100,
+        "triglycerides": 150,
+        "alt": 30,
+        "ast": 25,
+        "creatinine": 0.9
+    },
+    "charts": {
+        "medicineEffectiveness": {
+            "labels": [
+                "Efficacy",
+                "Safety",
+                "Absorption",
+                "Duration",
+                "Cost-Effectiveness",
+                "Side Effects"
+            ],
+            "datasets": [
+                {
+                    "label": "Primary Medicine",
+                    "data": [
+                        85,
+                        80,
+                        75,
+                        82,
+                        78,
+                        76
+                    ]
+                },
+                {
+                    "label": "Alternative Options",
+                    "data": [
+                        82,
+                        78,
+                        80,
+                        75,
+                        85,
+                        79
+                    ]
+                }
+            ]
+        },
+        "treatmentResponse": {
+            "labels": [
+                "Week 1",
+                "Week 2",
+                "Week 4",
+                "Week 8",
+                "Week 12"
+            ],
+            "datasets": [
+                {
+                    "label": "Expected Response",
+                    "data": [
+                        20,
+                        35,
+                        55,
+                        75,
+                        85
+                    ]
+                },
+                {
+                    "label": "Minimum Expected",
+                    "data": [
+                        15,
+                        25,
+                        40,
+                        60,
+                        70
+                    ]
+                }
+            ]
+        },
+        "sideEffects": {
+            "labels": [
+                "Mild",
+                "Moderate",
+                "Severe"
+            ],
+            "data": [
+                25,
+                12,
+                3
+            ]
+        },
+        "findings": {
+            "labels": [
+                "Glucose",
+                "Cholesterol",
+                "Triglycerides",
+                "HDL",
+                "LDL"
+            ],
+            "datasets": [
+                {
+                    "label": "Current Values",
+                    "data": [
+                        95,
+                        180,
+                        150,
+                        45,
+                        110
+                    ]
+                },
+                {
+                    "label": "Normal Range",
+                    "data": [
+                        100,
+                        200,
+                        150,
+                        40,
+                        100
+                    ]
+                }
+            ]
+        }
+    },
+    "comprehensiveAnalysis": [
+        {
+            "name": "Liver Function",
+            "score": 85,
+            "description": "Healthy liver enzyme levels and protein synthesis",
+            "details": {
+                "enzymeActivity": "ALT and AST within optimal range",
+                "proteinSynthesis": "Albumin production at 95% efficiency",
+                "detoxification": "Phase I and II pathways functioning well",
+                "bileProduction": "Normal bile flow and composition"
+            }
+        },
+        {
+            "name": "Kidney Function",
+            "score": 90,
+            "description": "Excellent filtration rate and electrolyte balance",
+            "details": {
+                "filtrationRate": "GFR at 95 mL/min/1.73m²",
+                "electrolyteBalance": "Na+/K+ ratio optimal",
+                "wasteElimination": "Creatinine and BUN within range",
+                "acidBaseBalance": "pH homeostasis maintained"
+            }
+        },
+        {
+            "name": "Cardiovascular Health",
+            "score": 80,
+            "description": "Good heart function with moderate risk factors",
+            "details": {
+                "bloodPressure": "120/80 mmHg at rest",
+                "heartRate": "68 BPM resting",
+                "circulation": "Good peripheral perfusion",
+                "oxygenation": "98% O2 saturation"
+            }
+        }
+    ],
+    "metabolism": [
+        {
+            "type": "Protein Metabolism",
+            "percentage": 85,
+            "details": "Efficient protein synthesis and breakdown",
+            "subMetrics": {
+                "aminoAcidProfile": 88,
+                "nitrogenBalance": 84,
+                "proteinSynthesis": 86,
+                "enzymeActivity": 82
+            }
+        },
+        {
+            "type": "Lipid Metabolism",
+            "percentage": 75,
+            "details": "Moderate lipid processing efficiency",
+            "subMetrics": {
+                "fattyAcidOxidation": 78,
+                "cholesterolSynthesis": 73,
+                "lipidTransport": 76,
+                "ketoneProduction": 74
+            }
+        },
+        {
+            "type": "Carbohydrate Metabolism",
+            "percentage": 80,
+            "details": "Good glucose regulation and glycogen storage",
+            "subMetrics": {
+                "glucoseRegulation": 82,
+                "glycogenStorage": 79,
+                "insulinSensitivity": 81,
+                "pyruvateMetabolism": 78
+            }
+        }
+    ],
+    "medicineComparison": {
+        "topMedicines": [
+            {
+                "name": "Primary Medicine",
+                "metaboliteImpact": {
+                    "glucoseMetabolism": {
+                        "impact": 85,
+                        "description": "Effectively regulates blood glucose levels"
+                    },
+                    "lipidMetabolism": {
+                        "impact": 90,
+                        "description": "Significantly reduces cholesterol synthesis"
+                    },
+                    "proteinMetabolism": {
+                        "impact": 80,
+                        "description": "Maintains protein balance"
+                    },
+                    "hormoneRegulation": {
+                        "impact": 75,
+                        "description": "Moderate impact on hormone regulation"
+                    }
+                },
+                "biomarkerEffects": [
+                    {
+                        "marker": "LDL Cholesterol",
+                        "expectedChange": "Reduction by 30-50%",
+                        "timeframe": "4-6 weeks",
+                        "confidenceLevel": 90
+                    }
+                ],
+                "synergies": [
+                    "Enhanced with CoQ10 supplementation"
+                ],
+                "contraindications": [
+                    "Active liver disease",
+                    "Pregnancy"
+                ]
+            },
+            {
+                "name": "Alternative Medicine",
+                "metaboliteImpact": {
+                    "glucoseMetabolism": {
+                        "impact": 80,
+                        "description": "Good regulation of glucose levels"
+                    },
+                    "lipidMetabolism": {
+                        "impact": 85,
+                        "description": "Effective cholesterol reduction"
+                    },
+                    "proteinMetabolism": {
+                        "impact": 75,
+                        "description": "Adequate protein metabolism support"
+                    },
+                    "hormoneRegulation": {
+                        "impact": 70,
+                        "description": "Moderate hormone regulation"
+                    }
+                },
+                "biomarkerEffects": [
+                    {
+                        "marker": "LDL Cholesterol",
+                        "expectedChange": "Reduction by 25-40%",
+                        "timeframe": "4-6 weeks",
+                        "confidenceLevel": 85
+                    }
+                ],
+                "synergies": [
+                    "Enhanced with omega-3 supplements"
+                ],
+                "contraindications": [
+                    "Liver problems",
+                    "Muscle disorders"
+                ]
+            }
+        ],
+        "comparisonMetrics": {
+            "efficacy": {
+                "medicine1": 85,
+                "medicine2": 80
+            },
+            "metabolicResponse": {
+                "medicine1": 80,
+                "medicine2": 75
+            },
+            "sideEffectProfile": {
+                "medicine1": 75,
+                "medicine2": 70
+            },
+            "overallBenefit": {
+                "medicine1": 80,
+                "medicine2": 75
+            }
+        }
+    }
+}
+
+async def analyze_blood_report(report_text, patient_data):
     try:
         # Calculate patient metrics
         bmi = calculate_bmi(float(patient_data.get('weight')), float(patient_data.get('height')))
@@ -366,292 +784,71 @@ Format the response as a JSON object with the following structure:
 
 {analysis_requirements}"""
 
-        # Get analysis from GPT-4
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are a medical expert analyzing blood reports. 
-                    You MUST provide your response as a valid JSON object.
-                    Do not include any text before or after the JSON.
-                    The JSON must exactly match the specified structure.
-                    Your response should start with '{' and end with '}'.
-                    Do not include any explanations, notes, or text outside the JSON structure.
-                    For medications:
-                    - Always provide at least 10 medication recommendations
-                    - Ensure each medication has all required fields
-                    - Use proper JSON formatting with double quotes
-                    - Include commas between all elements
-                    - Do not include trailing commas
-                    - Ensure all arrays and objects are properly closed"""
-                },
-                {
-                    "role": "user",
-                    "content": f"Analyze this data and respond ONLY with a JSON object matching the specified structure. Your response must start with '{{' and end with '}}'. Do not include any other text:\n\n{prompt}"
-                }
-            ],
-            max_tokens=4000,
-            temperature=0.7
-        )
+        messages = [
+            {
+                "role": "system",
+                "content": """You are a medical expert analyzing blood reports. 
+                You MUST provide your response as a valid JSON object.
+                Do not include any text before or after the JSON.
+                The JSON must exactly match the specified structure.
+                Your response should start with '{' and end with '}'.
+                Do not include any explanations, notes, or text outside the JSON structure.
+                For medications:
+                - Always provide at least 10 medication recommendations
+                - Ensure each medication has all required fields
+                - Use proper JSON formatting with double quotes
+                - Include commas between all elements
+                - Do not include trailing commas
+                - Ensure all arrays and objects are properly closed"""
+            },
+            {
+                "role": "user",
+                "content": f"Analyze this data and respond ONLY with a JSON object matching the specified structure. Your response must start with '{{' and end with '}}'. Do not include any other text:\n\n{prompt}"
+            }
+        ]
 
-        # Enhanced error handling for JSON parsing
-        try:
-            response_content = response.choices[0].message.content.strip()
-            print("Raw API Response:", response_content)  # Debug print
-            
-            # Try to find valid JSON within the response
-            json_start = response_content.find('{')
-            json_end = response_content.rfind('}') + 1
-            
-            if json_start >= 0 and json_end > json_start:
-                json_content = response_content[json_start:json_end]
-                # Clean the JSON string
-                json_content = json_content.replace('\n', ' ').replace('\r', '')
-                json_content = ' '.join(json_content.split())  # Remove extra whitespace
-                try:
-                    analysis = json.loads(json_content)
-                except json.JSONDecodeError as json_err:
-                    print(f"JSON parse attempt failed: {str(json_err)}")
-                    # Create a default analysis with basic structure
-                    analysis = {
-                        "healthScore": 70,
-                        "metaboliteScore": 75,
-                        "comprehensiveScore": 72,
-                        "criticalMarkers": ["Unable to parse detailed analysis"],
-                        "improvementAreas": ["Please consult healthcare provider"],
-                        "detailedAnalysis": "Error processing detailed analysis",
-                        "diagnosis": {
-                            "primary": "Analysis processing error",
-                            "findings": ["Unable to process detailed findings"],
-                            "risks": ["Assessment incomplete"],
-                            "recommendations": ["Please consult healthcare provider for detailed analysis"],
-                "followup": {
-                                "plan": "Schedule follow-up with healthcare provider",
-                                "nextAppointment": "As soon as possible"
-                            }
-                        },
-                        "medicines": [
-                            {
-                                "name": "Default Medicine",
-                                "description": "Standard treatment option based on patient profile",
-                                "score": 85,
-                                "dosage": "As prescribed by healthcare provider",
-                                "category": "Primary Treatment",
-                                "primaryUse": "General health management",
-                                "warnings": ["Consult healthcare provider before use", "Follow prescribed dosage strictly"]
-                            }
-                        ],
-                        "recommendations": {
-                            "lifestyle": ["Please consult healthcare provider"],
-                            "diet": ["Please consult healthcare provider"],
-                            "followUp": ["Schedule follow-up appointment"]
-                        },
-                        "advancedFeatures": {
-                            "insulin_resistance_index": 75,
-                            "metabolic_syndrome_score": 80,
-                            "inflammation_index": 70,
-                            "oxidative_stress_score": 65,
-                            "hormone_balance_index": 85,
-                            "cardiovascular_risk_index": 30,
-                            "liver_health_index": 85,
-                            "kidney_function_index": 90,
-                            "metabolic_efficiency_score": 80,
-                            "immune_system_score": 85,
-                            "endocrine_balance_score": 80,
-                            "digestive_health_score": 75,
-                            "bone_health_index": 85,
-                            "muscle_mass_index": 80,
-                            "vascular_health_score": 85
-                        },
-                        "systemScores": {
-                            "liver": 85,
-                            "kidney": 90,
-                            "cardiovascular": 80,
-                            "endocrine": 85,
-                            "immune": 85,
-                            "digestive": 75
-                        },
-                        "biomarkers": {
-                            "glucose": 95,
-                            "cholesterol": 180,
-                            "hdl": 55,
-                            "ldl": 100,
-                            "triglycerides": 150,
-                            "alt": 30,
-                            "ast": 25,
-                            "creatinine": 0.9
-                        },
-                        "charts": {
-                            "medicineEffectiveness": {
-                                "labels": ["Efficacy", "Safety", "Absorption", "Duration", "Cost-Effectiveness", "Side Effects"],
-                                "datasets": [
-                                    {
-                                        "label": "Primary Medicine",
-                                        "data": [85, 80, 75, 82, 78, 76]
-                                    },
-                                    {
-                                        "label": "Alternative Options",
-                                        "data": [82, 78, 80, 75, 85, 79]
-                                    }
-                                ]
-                            },
-                            "treatmentResponse": {
-                                "labels": ["Week 1", "Week 2", "Week 4", "Week 8", "Week 12"],
-                                "datasets": [
-                                    {
-                                        "label": "Expected Response",
-                                        "data": [20, 35, 55, 75, 85]
-                                    },
-                                    {
-                                        "label": "Minimum Expected",
-                                        "data": [15, 25, 40, 60, 70]
-                                    }
-                                ]
-                            },
-                            "sideEffects": {
-                                "labels": ["Mild", "Moderate", "Severe"],
-                                "data": [25, 12, 3]
-                            },
-                            "findings": {
-                                "labels": ["Glucose", "Cholesterol", "Triglycerides", "HDL", "LDL"],
-                                "datasets": [
-                                    {
-                                        "label": "Current Values",
-                                        "data": [95, 180, 150, 45, 110]
-                                    },
-                                    {
-                                        "label": "Normal Range",
-                                        "data": [100, 200, 150, 40, 100]
-                                    }
-                                ]
-                            }
-                        },
-                        "comprehensiveAnalysis": [
-                {
-                    "name": "Liver Function",
-                                "score": 85,
-                                "description": "Healthy liver enzyme levels and protein synthesis",
-                                "details": {
-                                    "enzymeActivity": "ALT and AST within optimal range",
-                                    "proteinSynthesis": "Albumin production at 95% efficiency",
-                                    "detoxification": "Phase I and II pathways functioning well",
-                                    "bileProduction": "Normal bile flow and composition"
-                                }
-                },
-                {
-                    "name": "Kidney Function",
-                                "score": 90,
-                                "description": "Excellent filtration rate and electrolyte balance",
-                                "details": {
-                                    "filtrationRate": "GFR at 95 mL/min/1.73m²",
-                                    "electrolyteBalance": "Na+/K+ ratio optimal",
-                                    "wasteElimination": "Creatinine and BUN within range",
-                                    "acidBaseBalance": "pH homeostasis maintained"
-                                }
-                },
-                {
-                    "name": "Cardiovascular Health",
-                                "score": 80,
-                                "description": "Good heart function with moderate risk factors",
-                                "details": {
-                                    "bloodPressure": "120/80 mmHg at rest",
-                                    "heartRate": "68 BPM resting",
-                                    "circulation": "Good peripheral perfusion",
-                                    "oxygenation": "98% O2 saturation"
-                                }
-                            }
-                        ],
-                        "metabolism": [
-                            {
-                                "type": "Protein Metabolism",
-                                "percentage": 85,
-                                "details": "Efficient protein synthesis and breakdown",
-                                "subMetrics": {
-                                    "aminoAcidProfile": 88,
-                                    "nitrogenBalance": 84,
-                                    "proteinSynthesis": 86,
-                                    "enzymeActivity": 82
-                                }
-                            },
-                            {
-                                "type": "Lipid Metabolism",
-                                "percentage": 75,
-                                "details": "Moderate lipid processing efficiency",
-                                "subMetrics": {
-                                    "fattyAcidOxidation": 78,
-                                    "cholesterolSynthesis": 73,
-                                    "lipidTransport": 76,
-                                    "ketoneProduction": 74
-                                }
-                            },
-                            {
-                                "type": "Carbohydrate Metabolism",
-                                "percentage": 80,
-                                "details": "Good glucose regulation and glycogen storage",
-                                "subMetrics": {
-                                    "glucoseRegulation": 82,
-                                    "glycogenStorage": 79,
-                                    "insulinSensitivity": 81,
-                                    "pyruvateMetabolism": 78
-                                }
-                            }
-                        ],
-                        "medicineComparison": {
-                            "topMedicines": [
-                                {
-                                    "name": "Primary Medicine",
-                                    "metaboliteImpact": {
-                                        "glucoseMetabolism": {"impact": 85, "description": "Effectively regulates blood glucose levels"},
-                                        "lipidMetabolism": {"impact": 90, "description": "Significantly reduces cholesterol synthesis"},
-                                        "proteinMetabolism": {"impact": 80, "description": "Maintains protein balance"},
-                                        "hormoneRegulation": {"impact": 75, "description": "Moderate impact on hormone regulation"}
-                                    },
-                                    "biomarkerEffects": [
-                                        {
-                                            "marker": "LDL Cholesterol",
-                                            "expectedChange": "Reduction by 30-50%",
-                                            "timeframe": "4-6 weeks",
-                                            "confidenceLevel": 90
-                                        }
-                                    ],
-                                    "synergies": ["Enhanced with CoQ10 supplementation"],
-                                    "contraindications": ["Active liver disease", "Pregnancy"]
-                                },
-                                {
-                                    "name": "Alternative Medicine",
-                                    "metaboliteImpact": {
-                                        "glucoseMetabolism": {"impact": 80, "description": "Good regulation of glucose levels"},
-                                        "lipidMetabolism": {"impact": 85, "description": "Effective cholesterol reduction"},
-                                        "proteinMetabolism": {"impact": 75, "description": "Adequate protein metabolism support"},
-                                        "hormoneRegulation": {"impact": 70, "description": "Moderate hormone regulation"}
-                                    },
-                                    "biomarkerEffects": [
-                                        {
-                                            "marker": "LDL Cholesterol",
-                                            "expectedChange": "Reduction by 25-40%",
-                                            "timeframe": "4-6 weeks",
-                                            "confidenceLevel": 85
-                                        }
-                                    ],
-                                    "synergies": ["Enhanced with omega-3 supplements"],
-                                    "contraindications": ["Liver problems", "Muscle disorders"]
-                                }
-                            ],
-                            "comparisonMetrics": {
-                                "efficacy": {"medicine1": 85, "medicine2": 80},
-                                "metabolicResponse": {"medicine1": 80, "medicine2": 75},
-                                "sideEffectProfile": {"medicine1": 75, "medicine2": 70},
-                                "overallBenefit": {"medicine1": 80, "medicine2": 75}
-                            }
-                        }
-                    }
-            else:
-                raise ValueError("No valid JSON object found in the response")
-                
-        except Exception as e:
-            print(f"Unexpected error parsing response: {str(e)}")
-            raise
+        # Reuse the analysis of an identical submission (refreshes, retries)
+        cache_key = analysis_cache.make_key("gpt-4", messages, schema_version=ANALYSIS_SCHEMA_VERSION)
+        response_content = analysis_cache.get(cache_key)
+        cache_hit = response_content is not None
+
+        # Parse the analysis as it streams in: each top-level field is decoded
+        # and validated as soon as it is complete
+        parser = IncrementalJSONObjectParser(ANALYSIS_SCHEMA)
+        if cache_hit:
+            parser.feed(response_content)
+        else:
+            # Get analysis from GPT-4
+            parts = []
+            async for chunk in llm_gateway.astream_chat(
+                messages,
+                model="gpt-4",
+                max_tokens=4000,
+                temperature=0.7,
+                timeout=180
+            ):
+                parts.append(chunk)
+                parser.feed(chunk)
+            response_content = ''.join(parts)
+        analysis = parser.close()
+
+        if not parser.started:
+            print("Raw API Response:", response_content)
+            raise ValueError("No valid JSON object found in the response")
+        if parser.truncated:
+            print(f"Analysis response was cut off; recovered {len(analysis)} fields")
+        for error in parser.errors:
+            print(f"Analysis response: {error}")
+
+        # Only complete, valid responses are worth serving again
+        if parser.complete and not parser.errors and not cache_hit:
+            analysis_cache.set(cache_key, response_content)
+
+        missing = parser.missing
+        if missing:
+            print(f"Using default values for missing analysis fields: {', '.join(missing)}")
+            for key in missing:
+                analysis[key] = copy.deepcopy(DEFAULT_ANALYSIS[key])
 
         # Add patient information
         analysis["patientInfo"] = {
@@ -679,7 +876,7 @@ Format the response as a JSON object with the following structure:
             }]
         
         # Sort medicines by score
-        analysis['medicines'] = sorted(analysis['medicines'], key=lambda x: x['score'], reverse=True)
+        analysis['medicines'] = sorted(analysis['medicines'], key=lambda x: x.get('score', 0), reverse=True)
         
         return analysis
     except Exception as e:
@@ -745,6 +942,14 @@ def medical_history():
         return redirect(url_for('blood_report'))
     return render_template('medical_history.html')
 
+async def run_analysis(report_text, patient_data):
+    """Background job: analyze a blood report and date the result"""
+    result = await analyze_blood_report(report_text, patient_data)
+    
+    # Add analysis date
+    result['analysisDate'] = datetime.now().strftime('%Y-%m-%d')
+    return result
+
 @app.route('/step3', methods=['GET', 'POST'])
 def blood_report():
     if 'medical_history' not in session:
@@ -761,61 +966,108 @@ def blood_report():
             patient_data = {**session['personal_info'], **session['medical_history']}
             report_text = session['blood_report']['reportText']
             
-            # Get the analysis result
-            result = analyze_blood_report(report_text, patient_data)
+            # Queue the analysis and let the results page wait for it
+            job_id = analysis_jobs.submit(run_analysis, report_text, patient_data)
             
-            # Add analysis date
-            result['analysisDate'] = datetime.now().strftime('%Y-%m-%d')
-            
-            # Clear session after successful analysis
+            # Clear session once the analysis has been queued
             session.clear()
             
-            return render_template('dashboard.html', result=result)
+            return redirect(url_for('analysis_result', job_id=job_id))
         except Exception as e:
             print(f"Error in blood report analysis: {str(e)}")
             return render_template('error.html', error=str(e))
             
     return render_template('blood_report.html')
 
+@app.route('/analysis/<job_id>')
+def analysis_result(job_id):
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return render_template('error.html', error="This analysis was not found or has expired."), 404
+    if job['status'] == 'done':
+        return render_template('dashboard.html', result=job['result'])
+    if job['status'] == 'failed':
+        return render_template('error.html', error=job['error'])
+    return render_template('analysis_pending.html', job_id=job_id)
+
+@app.route('/analysis/<job_id>/status')
+def analysis_status(job_id):
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({'status': 'unknown'}), 404
+    return jsonify({'status': job['status'], 'error': job['error']})
+
+def chat_messages(user_message):
+    """Prompt messages for the MetabolX assistant"""
+    # Create a system message that defines the assistant's role and capabilities
+    system_message = """You are the MetabolX Assistant, an AI helper for the MetabolX platform. 
+    MetabolX is an AI-powered platform that analyzes metabolite data to predict disease risks and recommend treatments.
+    You can explain:
+    - How metabolite analysis works
+    - The disease prediction process
+    - Digital twin simulation capabilities
+    - Treatment recommendations
+    - Data privacy and security
+    - Scientific basis of our analysis
+    - Integration with healthcare workflows
+    
+    Keep responses concise, friendly, and focused on MetabolX's capabilities."""
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message}
+    ]
+
+CHAT_OPTIONS = {'model': "gpt-3.5-turbo", 'max_tokens': 150, 'temperature': 0.7, 'timeout': 30}
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Events message with a JSON payload"""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+def stream_llm_response(messages, finalize, **chat_options):
+    """Stream an LLM reply as Server-Sent Events.
+
+    Sends a ``token`` event per chunk as it arrives, then a ``done`` event
+    carrying ``finalize(full_text)``, or an ``error`` event if the call fails.
+    """
+    def generate():
+        parts = []
+        try:
+            for chunk in llm_gateway.stream_chat(messages, **chat_options):
+                parts.append(chunk)
+                yield sse_event({"delta": chunk}, "token")
+            yield sse_event(finalize("".join(parts)), "done")
+        except Exception as e:
+            print(f"Error in streamed response: {str(e)}")
+            yield sse_event({"error": str(e)}, "error")
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/chat', methods=['POST'])
-def chat():
+async def chat():
     try:
         data = request.get_json()
         user_message = data.get('message', '')
 
-        # Create a system message that defines the assistant's role and capabilities
-        system_message = """You are the MetabolX Assistant, an AI helper for the MetabolX platform. 
-        MetabolX is an AI-powered platform that analyzes metabolite data to predict disease risks and recommend treatments.
-        You can explain:
-        - How metabolite analysis works
-        - The disease prediction process
-        - Digital twin simulation capabilities
-        - Treatment recommendations
-        - Data privacy and security
-        - Scientific basis of our analysis
-        - Integration with healthcare workflows
-        
-        Keep responses concise, friendly, and focused on MetabolX's capabilities."""
-
         # Get response from OpenAI
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ],
-            max_tokens=150,
-            temperature=0.7
-        )
-
-        # Extract the assistant's response
-        ai_response = response.choices[0].message.content
+        ai_response = await llm_gateway.chat(chat_messages(user_message), **CHAT_OPTIONS)
 
         return jsonify({"response": ai_response})
     except Exception as e:
         print(f"Error in chat endpoint: {str(e)}")
         return jsonify({"response": "I apologize, but I encountered an error. Please try again."}), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    data = request.get_json()
+    user_message = data.get('message', '')
+    return stream_llm_response(chat_messages(user_message), lambda text: {"response": text}, **CHAT_OPTIONS)
+
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify(analysis_cache.stats())
+
 @app.route('/email_report', methods=['POST'])
 def email_report():
     try:
@@ -834,286 +1086,43 @@ def email_report():
             report_data['analysis'] = report_data.get('analysis', {})
             report_data['analysis']['recommendations'] = []
 
-        # Create a temporary directory for PDF generation
-        temp_dir = os.path.join(os.path.dirname(__file__), 'temp')
-        os.makedirs(temp_dir, exist_ok=True)
-        pdf_path = os.path.join(temp_dir, f'report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf')
-
-        # Generate PDF using reportlab
-        doc = SimpleDocTemplate(pdf_path, pagesize=letter)
-        styles = getSampleStyleSheet()
-        story = []
-
-        # Title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            alignment=1  # Center alignment
-        )
-        story.append(Paragraph("MetabolX Health Analysis Report", title_style))
-        story.append(Spacer(1, 12))
-
-        # Patient Information
-        story.append(Paragraph("Patient Information", styles['Heading2']))
-        patient_data = [
-            ["Name:", report_data.get('patientName', 'N/A')],
-            ["Age:", f"{report_data.get('age', 0)} years"],
-            ["Gender:", report_data.get('gender', 'N/A')],
-            ["BMI:", f"{report_data.get('bmi', 'N/A')} ({report_data.get('bmiCategory', 'N/A')})"],
-            ["Ethnicity:", report_data.get('ethnicity', 'N/A')],
-            ["Diagnosed Conditions:", ", ".join(report_data.get('conditions', ['None']))],
-            ["Current Medications:", ", ".join(report_data.get('medications', ['None']))],
-            ["Allergies:", ", ".join(report_data.get('allergies', ['None']))]
-        ]
-        patient_table = Table(patient_data, colWidths=[2*inch, 4*inch])
-        patient_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('PADDING', (0, 0), (-1, -1), 6),
-        ]))
-        story.append(patient_table)
-        story.append(Spacer(1, 20))
-
-        # Overall Scores
-        story.append(Paragraph("Health Scores", styles['Heading2']))
-        scores_data = [
-            ["Score Type", "Value", "Category"],
-            ["Overall Health Score", f"{report_data.get('healthScore', 0)}/100", get_score_category(report_data.get('healthScore', 0))],
-            ["Metabolite Score", f"{report_data.get('metaboliteScore', 0)}/100", get_score_category(report_data.get('metaboliteScore', 0))],
-            ["Comprehensive Score", f"{report_data.get('comprehensiveScore', 0)}/100", get_score_category(report_data.get('comprehensiveScore', 0))]
-        ]
-        scores_table = Table(scores_data, colWidths=[2*inch, 2*inch, 2*inch])
-        scores_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('PADDING', (0, 0), (-1, -1), 6),
-        ]))
-        story.append(scores_table)
-        story.append(Spacer(1, 20))
-
-        # Metabolite Analysis
-        story.append(Paragraph("Metabolite Analysis", styles['Heading2']))
-        metabolite_data = [
-            ["Metabolite", "Value", "Normal Range", "Status"],
-            ["Glucose", f"{report_data['metabolites'].get('glucose', 0)} mg/dL", "70-100 mg/dL", 
-             get_metabolite_status('glucose', report_data['metabolites'].get('glucose', 0))],
-            ["Cholesterol", f"{report_data['metabolites'].get('cholesterol', 0)} mg/dL", "125-200 mg/dL",
-             get_metabolite_status('cholesterol', report_data['metabolites'].get('cholesterol', 0))],
-            ["Triglycerides", f"{report_data['metabolites'].get('triglycerides', 0)} mg/dL", "<150 mg/dL",
-             get_metabolite_status('triglycerides', report_data['metabolites'].get('triglycerides', 0))],
-            ["HDL", f"{report_data['metabolites'].get('hdl', 0)} mg/dL", ">40 mg/dL",
-             get_metabolite_status('hdl', report_data['metabolites'].get('hdl', 0))],
-            ["LDL", f"{report_data['metabolites'].get('ldl', 0)} mg/dL", "<100 mg/dL",
-             get_metabolite_status('ldl', report_data['metabolites'].get('ldl', 0))]
-        ]
-        metabolite_table = Table(metabolite_data, colWidths=[1.5*inch, 1.5*inch, 1.5*inch, 1.5*inch])
-        metabolite_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('PADDING', (0, 0), (-1, -1), 6),
-        ]))
-        story.append(metabolite_table)
-        story.append(Spacer(1, 20))
-
-        # Comprehensive Analysis
-        story.append(Paragraph("Comprehensive Analysis", styles['Heading2']))
-        for analysis in report_data.get('comprehensiveAnalysis', []):
-            analysis_text = f"{analysis['name']}: Score {analysis['score']}/100 - {analysis['description']}"
-            story.append(Paragraph(analysis_text, styles['Normal']))
-            story.append(Spacer(1, 6))
-        story.append(Spacer(1, 14))
-
-        # Metabolism Analysis
-        story.append(Paragraph("Metabolism Analysis", styles['Heading2']))
-        for metabolism in report_data.get('metabolism', []):
-            metabolism_text = f"{metabolism['type']}: {metabolism['percentage']}% - {metabolism.get('status', '')}"
-            story.append(Paragraph(metabolism_text, styles['Normal']))
-            story.append(Spacer(1, 6))
-        story.append(Spacer(1, 14))
-
-        # Primary Diagnosis
-        story.append(Paragraph("Diagnosis", styles['Heading2']))
-        story.append(Paragraph(f"Primary Diagnosis: {report_data['analysis'].get('primaryDiagnosis', 'N/A')}", styles['Normal']))
-        story.append(Spacer(1, 10))
-
-        # Findings
-        story.append(Paragraph("Key Findings:", styles['Heading3']))
-        for finding in report_data['analysis'].get('findings', []):
-            story.append(Paragraph(f"• {finding}", styles['Normal']))
-        story.append(Spacer(1, 14))
-
-        # Health Risks
-        story.append(Paragraph("Health Risk Assessment", styles['Heading2']))
-        risk_data = [
-            ["Risk Type", "Assessment"],
-            ["Diabetes Risk", report_data['analysis'].get('diabetesRisk', 'N/A')],
-            ["Heart Disease Risk", report_data['analysis'].get('heartDiseaseRisk', 'N/A')]
-        ]
-        risk_table = Table(risk_data, colWidths=[3*inch, 3*inch])
-        risk_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('PADDING', (0, 0), (-1, -1), 6),
-        ]))
-        story.append(risk_table)
-        story.append(Spacer(1, 20))
-
-        # Critical Markers
-        if report_data.get('criticalMarkers'):
-            story.append(Paragraph("Critical Markers", styles['Heading2']))
-            for marker in report_data['criticalMarkers']:
-                story.append(Paragraph(f"• {marker}", styles['Normal']))
-            story.append(Spacer(1, 14))
-
-        # Improvement Areas
-        if report_data.get('improvementAreas'):
-            story.append(Paragraph("Areas for Improvement", styles['Heading2']))
-            for area in report_data['improvementAreas']:
-                story.append(Paragraph(f"• {area}", styles['Normal']))
-            story.append(Spacer(1, 14))
-
-        # Medicine Recommendations
-        if report_data.get('medicines'):
-            story.append(Paragraph("Medicine Recommendations", styles['Heading2']))
-            for medicine in report_data['medicines']:
-                med_text = f"""• {medicine['name']} (Score: {medicine['score']}/100)
-                   Category: {medicine['category']}
-                   Primary Use: {medicine['primaryUse']}
-                   Dosage: {medicine['dosage']}
-                   Description: {medicine['description']}"""
-                story.append(Paragraph(med_text, styles['Normal']))
-                if medicine.get('warnings'):
-                    warnings_text = "Warnings: " + ", ".join(medicine['warnings'])
-                    story.append(Paragraph(warnings_text, ParagraphStyle(
-                        'Warning',
-                        parent=styles['Normal'],
-                        textColor=colors.red
-                    )))
-                story.append(Spacer(1, 10))
-            story.append(Spacer(1, 14))
-
-        # Medicine Comparison Analysis
-        if report_data.get('medicineComparison'):
-            story.append(Paragraph("Top Medicines Metabolite Impact Analysis", styles['Heading2']))
-            
-            # Create comparison table headers
-            comparison_data = [["Metric", "Medicine 1", "Medicine 2"]]
-            
-            # Add comparison metrics
-            metrics = report_data['medicineComparison'].get('comparisonMetrics', {})
-            for metric_name, values in metrics.items():
-                comparison_data.append([
-                    metric_name.replace('_', ' ').title(),
-                    f"{values.get('medicine1', 0)}/100",
-                    f"{values.get('medicine2', 0)}/100"
-                ])
-            
-            # Create and style the comparison table
-            comparison_table = Table(comparison_data, colWidths=[2*inch, 2*inch, 2*inch])
-            comparison_table.setStyle(TableStyle([
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-                ('PADDING', (0, 0), (-1, -1), 6),
-            ]))
-            story.append(comparison_table)
-            story.append(Spacer(1, 20))
-            
-            # Detailed metabolite impact for each top medicine
-            for medicine in report_data['medicineComparison'].get('topMedicines', []):
-                story.append(Paragraph(f"Detailed Analysis: {medicine['name']}", styles['Heading3']))
-                
-                # Metabolite Impact Table
-                impact_data = [["Metabolism Type", "Impact Score", "Description"]]
-                for metabolism_type, impact in medicine.get('metaboliteImpact', {}).items():
-                    impact_data.append([
-                        metabolism_type.replace('_', ' ').title(),
-                        f"{impact.get('impact', 0)}/100",
-                        impact.get('description', 'N/A')
-                    ])
-                
-                impact_table = Table(impact_data, colWidths=[1.5*inch, 1*inch, 3.5*inch])
-                impact_table.setStyle(TableStyle([
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-                    ('PADDING', (0, 0), (-1, -1), 6),
-                ]))
-                story.append(impact_table)
-                story.append(Spacer(1, 10))
-                
-                # Biomarker Effects
-                story.append(Paragraph("Expected Biomarker Effects:", styles['Heading4']))
-                for effect in medicine.get('biomarkerEffects', []):
-                    effect_text = f"""• {effect['marker']}: 
-                       Expected Change: {effect['expectedChange']}
-                       Timeframe: {effect['timeframe']}
-                       Confidence: {effect['confidenceLevel']}%"""
-                    story.append(Paragraph(effect_text, styles['Normal']))
-                
-                # Synergies and Contraindications
-                if medicine.get('synergies'):
-                    story.append(Paragraph("Synergistic Effects:", styles['Heading4']))
-                    for synergy in medicine['synergies']:
-                        story.append(Paragraph(f"• {synergy}", styles['Normal']))
-                
-                if medicine.get('contraindications'):
-                    story.append(Paragraph("Contraindications:", styles['Heading4']))
-                    for contraindication in medicine['contraindications']:
-                        story.append(Paragraph(f"• {contraindication}", ParagraphStyle(
-                            'Contraindication',
-                            parent=styles['Normal'],
-                            textColor=colors.red
-                        )))
-                
-                story.append(Spacer(1, 20))
-
-        # Recommendations
-        story.append(Paragraph("Recommendations", styles['Heading2']))
-        recommendations = report_data['analysis'].get('recommendations', [])
-        if recommendations:
-            for recommendation in recommendations:
-                story.append(Paragraph(f"• {recommendation}", styles['Normal']))
-                story.append(Spacer(1, 6))
-        else:
-            story.append(Paragraph("No specific recommendations at this time.", styles['Normal']))
-        story.append(Spacer(1, 20))
-
-        # Follow-up Plan
-        story.append(Paragraph("Follow-up Plan", styles['Heading2']))
-        story.append(Paragraph(report_data['analysis'].get('followUpPlan', 'Please consult with your healthcare provider for follow-up care.'), styles['Normal']))
-        story.append(Spacer(1, 20))
-
-        # Footer
-        story.append(Spacer(1, 30))
-        footer_style = ParagraphStyle(
-            'Footer',
-            parent=styles['Normal'],
-            fontSize=8,
-            textColor=colors.gray
-        )
-        story.append(Paragraph("This report is generated by MetabolX and should be reviewed with your healthcare provider.", footer_style))
-        story.append(Paragraph(f"Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", footer_style))
-        story.append(Paragraph(f"Report ID: {datetime.now().strftime('%Y%m%d%H%M%S')}", footer_style))
+        if not os.getenv('EMAIL_USER') or not os.getenv('EMAIL_PASSWORD'):
+            return jsonify({'success': False, 'error': 'Email configuration missing'}), 500
 
-        # Build PDF
-        doc.build(story)
+        # Render and send in the background; the client polls the job
+        job_id = report_jobs.submit(send_report_email, email, report_data)
+        return jsonify({'success': True, 'jobId': job_id}), 202
 
-        # Send email with PDF attachment
-        sender_email = os.getenv('EMAIL_USER')
-        sender_password = os.getenv('EMAIL_PASSWORD')
+    except Exception as e:
+        print(f"Error sending email: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
 
-        if not sender_email or not sender_password:
-            return jsonify({'success': False, 'error': 'Email configuration missing'}), 500
+@app.route('/email_report/<job_id>')
+def email_report_status(job_id):
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({'status': 'unknown'}), 404
+    return jsonify({'status': job['status'], 'error': job['error'], 'result': job['result']})
+
+@app.route('/render_stats')
+def render_stats():
+    return jsonify(pdf_render_pool.stats())
 
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = email
-        msg['Subject'] = 'YOUR COMPREHENSIVE HEALTH REPORT FROM METABOLX'
+def send_report_email(email, report_data):
+    """Background job: render the PDF report and email it to ``email``"""
+    pdf_bytes, render_seconds = pdf_render_pool.render(report_data)
 
-        # Add body
-        body = f"""Dear {report_data.get('patientName', 'Patient')},
+    # Send email with PDF attachment
+    sender_email = os.getenv('EMAIL_USER')
+
+    # Create message
+    msg = MIMEMultipart()
+    msg['From'] = sender_email
+    msg['To'] = email
+    msg['Subject'] = 'YOUR COMPREHENSIVE HEALTH REPORT FROM METABOLX'
+
+    # Add body
+    body = f"""Dear {report_data.get('patientName', 'Patient')},
 
 Thank you for choosing MetabolX for your health analysis. We are pleased to share your
 detailed health report, which includes:
@@ -1153,80 +1162,21 @@ The MetabolX Team
 
 """
 
-        msg.attach(MIMEText(body, 'plain'))
+    msg.attach(MIMEText(body, 'plain'))
 
-        # Attach PDF
-        with open(pdf_path, 'rb') as f:
-            pdf_attachment = MIMEApplication(f.read(), _subtype='pdf')
-            pdf_attachment.add_header(
-                'Content-Disposition', 
-                'attachment', 
-                filename='MetabolX_Health_Report.pdf'
-            )
-            msg.attach(pdf_attachment)
+    # Attach PDF
+    pdf_attachment = MIMEApplication(pdf_bytes, _subtype='pdf')
+    pdf_attachment.add_header(
+        'Content-Disposition', 
+        'attachment', 
+        filename='MetabolX_Health_Report.pdf'
+    )
+    msg.attach(pdf_attachment)
 
-        # Send email
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
+    # Send email; waits for delivery (including retries) so the job reports it
+    mailer.send(msg)
 
-        # Clean up
-        if os.path.exists(pdf_path):
-            os.remove(pdf_path)
-
-        return jsonify({'success': True})
-
-    except Exception as e:
-        print(f"Error sending email: {str(e)}")
-        return jsonify({'success': False, 'error': str(e)}), 500
-
-    finally:
-        # Ensure temp directory is cleaned up
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
-
-def get_score_category(score):
-    if score >= 90:
-        return "Excellent"
-    elif score >= 80:
-        return "Good"
-    elif score >= 70:
-        return "Fair"
-    elif score >= 60:
-        return "Poor"
-    else:
-        return "Critical"
-
-def get_metabolite_status(metabolite, value):
-    if not value:
-        return "N/A"
-    
-    if metabolite == 'glucose':
-        if value < 70:
-            return "Low"
-        elif value > 100:
-            return "High"
-        return "Normal"
-    elif metabolite == 'cholesterol':
-        if value < 125:
-            return "Low"
-        elif value > 200:
-            return "High"
-        return "Normal"
-    elif metabolite == 'triglycerides':
-        if value > 150:
-            return "High"
-        return "Normal"
-    elif metabolite == 'hdl':
-        if value < 40:
-            return "Low"
-        return "Normal"
-    elif metabolite == 'ldl':
-        if value > 100:
-            return "High"
-        return "Normal"
-    return "Unknown"
+    return {'renderSeconds': round(render_seconds, 3), 'pdfBytes': len(pdf_bytes)}
 
 def generate_analysis(blood_report):
     
@@ -1281,8 +1231,75 @@ def generate_analysis(blood_report):
     
     return analysis
 
+def simulation_messages(prompt, period, current_analysis):
+    """Prompt messages for a digital twin simulation"""
+    # Create a system message for the simulation
+    system_message = """You are a medical simulation expert analyzing potential health outcomes.
+    Based on the current health analysis and the proposed scenario, predict:
+    1. Changes in health scores
+    2. Impact on various health metrics
+    3. Potential risks and benefits
+    4. Expected improvements or declines
+    
+    Provide realistic and evidence-based predictions."""
+
+    # Create the user message with context
+    user_message = f"""Current Health Analysis:
+    - Health Score: {current_analysis.get('healthScore', 0)}
+    - Metabolite Score: {current_analysis.get('metaboliteScore', 0)}
+    - Comprehensive Score: {current_analysis.get('comprehensiveScore', 0)}
+    
+    Proposed Scenario: {prompt}
+    Time Period: {period} weeks
+    
+    Please predict the changes in health metrics and provide a detailed analysis."""
+
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message}
+    ]
+
+SIMULATION_OPTIONS = {'model': "gpt-4", 'max_tokens': 1000, 'temperature': 0.7, 'timeout': 90}
+
+def simulation_result(current_analysis, simulation_text):
+    """Structured simulation fields returned alongside the model's narrative"""
+    # Generate simulated scores with realistic variations
+    current_health_score = current_analysis.get('healthScore', 70)
+    simulated_health_score = min(100, max(0, current_health_score + random.uniform(-5, 15)))
+
+    # Generate predicted changes
+    predicted_changes = [
+        {
+            "metric": "Health Score",
+            "impact": round((simulated_health_score - current_health_score) / current_health_score * 100, 1),
+            "description": "Overall health status change"
+        },
+        {
+            "metric": "Metabolic Health",
+            "impact": round(random.uniform(-10, 20), 1),
+            "description": "Changes in metabolic function"
+        },
+        {
+            "metric": "Cardiovascular Health",
+            "impact": round(random.uniform(-8, 15), 1),
+            "description": "Impact on heart health"
+        },
+        {
+            "metric": "Immune System",
+            "impact": round(random.uniform(-5, 12), 1),
+            "description": "Changes in immune function"
+        }
+    ]
+
+    return {
+        'success': True,
+        'simulatedHealthScore': round(simulated_health_score, 1),
+        'predictedChanges': predicted_changes,
+        'simulationDetails': simulation_text
+    }
+
 @app.route('/simulate', methods=['POST'])
-def simulate():
+async def simulate():
     try:
         data = request.get_json()
         prompt = data.get('prompt')
@@ -1292,80 +1309,37 @@ def simulate():
         if not prompt or not current_analysis:
             return jsonify({'success': False, 'error': 'Missing required data'})
 
-        # Create a system message for the simulation
-        system_message = """You are a medical simulation expert analyzing potential health outcomes.
-        Based on the current health analysis and the proposed scenario, predict:
-        1. Changes in health scores
-        2. Impact on various health metrics
-        3. Potential risks and benefits
-        4. Expected improvements or declines
-        
-        Provide realistic and evidence-based predictions."""
-
-        # Create the user message with context
-        user_message = f"""Current Health Analysis:
-        - Health Score: {current_analysis.get('healthScore', 0)}
-        - Metabolite Score: {current_analysis.get('metaboliteScore', 0)}
-        - Comprehensive Score: {current_analysis.get('comprehensiveScore', 0)}
-        
-        Proposed Scenario: {prompt}
-        Time Period: {period} weeks
-        
-        Please predict the changes in health metrics and provide a detailed analysis."""
-
         # Get simulation from GPT-4
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ],
-            max_tokens=1000,
-            temperature=0.7
+        simulation_text = await llm_gateway.chat(
+            simulation_messages(prompt, period, current_analysis), **SIMULATION_OPTIONS
         )
 
-        # Parse the response
-        simulation_text = response.choices[0].message.content
-
-        # Generate simulated scores with realistic variations
-        current_health_score = current_analysis.get('healthScore', 70)
-        simulated_health_score = min(100, max(0, current_health_score + random.uniform(-5, 15)))
+        return jsonify(simulation_result(current_analysis, simulation_text))
 
-        # Generate predicted changes
-        predicted_changes = [
-            {
-                "metric": "Health Score",
-                "impact": round((simulated_health_score - current_health_score) / current_health_score * 100, 1),
-                "description": "Overall health status change"
-            },
-            {
-                "metric": "Metabolic Health",
-                "impact": round(random.uniform(-10, 20), 1),
-                "description": "Changes in metabolic function"
-            },
-            {
-                "metric": "Cardiovascular Health",
-                "impact": round(random.uniform(-8, 15), 1),
-                "description": "Impact on heart health"
-            },
-            {
-                "metric": "Immune System",
-                "impact": round(random.uniform(-5, 12), 1),
-                "description": "Changes in immune function"
-            }
-        ]
-
-        return jsonify({
-            'success': True,
-            'simulatedHealthScore': round(simulated_health_score, 1),
-            'predictedChanges': predicted_changes,
-            'simulationDetails': simulation_text
-        })
+    except Exception as e:
+        print(f"Error in simulation: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/simulate/stream', methods=['POST'])
+def simulate_stream():
+    try:
+        data = request.get_json()
+        prompt = data.get('prompt')
+        period = int(data.get('period', 4))
+        current_analysis = data.get('currentAnalysis')
     except Exception as e:
         print(f"Error in simulation: {str(e)}")
         return jsonify({'success': False, 'error': str(e)})
 
+    if not prompt or not current_analysis:
+        return jsonify({'success': False, 'error': 'Missing required data'})
+
+    return stream_llm_response(
+        simulation_messages(prompt, period, current_analysis),
+        lambda text: simulation_result(current_analysis, text),
+        **SIMULATION_OPTIONS
+    )
+
 if __name__ == '__main__':
     import argparse
     parser = argparse.ArgumentParser()
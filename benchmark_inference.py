@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from ml_model import HealthAnalysisModel
+from sample_patients import generate_test_patient
+
+
+def dataframe_predict(model, patient_data):
+    """The original one-row DataFrame inference path, kept for comparison"""
+    input_data = pd.DataFrame([patient_data])
+    for col in model.feature_columns:
+        if col not in input_data.columns:
+            input_data[col] = 0
+    input_scaled = model.scaler.transform(input_data[model.feature_columns])
+    model.classifier.predict(input_scaled)
+    return model.regressor.predict(input_scaled)[0]
+
+
+def measure(fn, patients, warmup=20):
+    """Return per-call latencies in milliseconds"""
+    for patient in patients[:warmup]:
+        fn(patient)
+    latencies = []
+    for patient in patients:
+        start = time.perf_counter()
+        fn(patient)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def report(name, latencies):
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"{name:<28} p50 {p50:8.3f} ms   p99 {p99:8.3f} ms   ({len(latencies)} calls)")
+
+
+def main(n_calls=500):
+    np.random.seed(0)
+    patients = [generate_test_patient() for _ in range(n_calls)]
+
+    print("Loading models...")
+    model = HealthAnalysisModel()
+    shared_model = HealthAnalysisModel(mmap=True)
+
+    print("\nSingle-patient inference latency:")
+    report("DataFrame path", measure(lambda p: dataframe_predict(model, p), patients))
+    report("predict (compiled trees)", measure(model.predict, patients))
+    report("predict (mmap compiled)", measure(shared_model.predict, patients))
+
+
+if __name__ == "__main__":
+    main()
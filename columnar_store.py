@@ -0,0 +1,177 @@
+import json
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+
+
+class ColumnarStore:
+    """Append-only on-disk table with one binary file per column.
+
+    Chunks are appended column by column, so a dataset far larger than memory
+    can be written one chunk at a time. Numeric, boolean and pandas
+    categorical columns are supported; categoricals are stored as int32 codes
+    with their categories in the schema (new categories in later chunks are
+    added to the end).
+
+    Uncompressed columns are raw arrays read back as read-only memory maps,
+    which makes column projection and row-range reads free: only the pages
+    that are touched are ever loaded. With ``compression='zlib'`` every
+    appended chunk becomes one compressed block per column (bytes shuffled so
+    that the exponent bytes of neighbouring values sit together); reads
+    decompress only the blocks of the requested columns that overlap the
+    requested rows. The compression of an existing store is taken from its
+    schema. The directory is created by the first ``append``; until then the
+    store is simply empty.
+
+    The schema is replaced atomically after the column files are written, so
+    it only ever describes complete appends. Bytes left past the recorded
+    end of a column by an interrupted append are cut off by the next one.
+    """
+
+    SCHEMA_NAME = 'schema.json'
+    COMPRESSIONS = ('zlib',)
+    COMPRESSION_LEVEL = 6
+
+    def __init__(self, directory, compression=None):
+        if compression is not None and compression not in self.COMPRESSIONS:
+            raise ValueError(f"Unknown compression '{compression}'; expected one of {self.COMPRESSIONS}")
+        self.directory = directory
+        self.schema_path = os.path.join(directory, self.SCHEMA_NAME)
+        if os.path.exists(self.schema_path):
+            with open(self.schema_path) as f:
+                self.schema = json.load(f)
+        else:
+            self.schema = {'columns': {}, 'n_rows': 0}
+            if compression is not None:
+                # Rows per block, and each column's block boundaries in its file
+                self.schema.update({'compression': compression, 'blocks': [], 'block_offsets': {}})
+        self.compression = self.schema.get('compression')
+
+    def __len__(self):
+        return self.schema['n_rows']
+
+    @property
+    def columns(self):
+        return list(self.schema['columns'])
+
+    def _column_path(self, name):
+        return os.path.join(self.directory, f'{name}.bin')
+
+    def append(self, frame):
+        """Append the rows of a DataFrame chunk."""
+        os.makedirs(self.directory, exist_ok=True)
+        if not self.schema['columns']:
+            for name in frame.columns:
+                dtype = frame[name].dtype
+                if isinstance(dtype, pd.CategoricalDtype):
+                    self.schema.setdefault('categories', {})[name] = list(dtype.categories)
+                    dtype = np.int32
+                elif not (np.issubdtype(dtype, np.number) or np.issubdtype(dtype, np.bool_)):
+                    raise ValueError(f"Column '{name}' is not numeric or categorical ({dtype}); "
+                                     "ColumnarStore only stores numeric and categorical columns")
+                self.schema['columns'][name] = np.dtype(dtype).str
+        elif list(frame.columns) != self.columns:
+            frame = frame.reindex(columns=self.columns)
+
+        categories = self.schema.get('categories', {})
+        for name, dtype in self.schema['columns'].items():
+            if name in categories:
+                values = self._category_codes(name, frame[name])
+            else:
+                values = np.ascontiguousarray(frame[name].to_numpy(), dtype=dtype)
+            with open(self._column_path(name), 'ab') as f:
+                # Drop anything an interrupted append wrote after the last
+                # schema update, so the new rows start where the schema says
+                f.truncate(self._column_bytes(name))
+                if self.compression:
+                    offsets = self.schema['block_offsets'].setdefault(name, [0])
+                    block = zlib.compress(_shuffle(values), self.COMPRESSION_LEVEL)
+                    f.write(block)
+                    offsets.append(offsets[-1] + len(block))
+                else:
+                    values.tofile(f)
+
+        if self.compression:
+            self.schema['blocks'].append(len(frame))
+        self.schema['n_rows'] += len(frame)
+        self._write_schema()
+
+    def _column_bytes(self, name):
+        """Length of column ``name``'s file as recorded by the schema"""
+        if self.compression:
+            return self.schema['block_offsets'].get(name, [0])[-1]
+        return self.schema['n_rows'] * np.dtype(self.schema['columns'][name]).itemsize
+
+    def _category_codes(self, name, values):
+        """Codes of ``values`` under the stored categories, adding unseen ones"""
+        categories = self.schema['categories'][name]
+        known = set(categories)
+        categories.extend(value for value in pd.unique(values.dropna()) if value not in known)
+        return pd.Categorical(values, categories=categories).codes.astype(np.int32)
+
+    def _decode(self, name, values):
+        categories = self.schema.get('categories', {}).get(name)
+        if categories is None:
+            return values
+        return pd.Categorical.from_codes(values, categories=categories)
+
+    def _write_schema(self):
+        tmp_path = f'{self.schema_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.schema, f, indent=2)
+        os.replace(tmp_path, self.schema_path)
+
+    def column(self, name):
+        """Return one column; a read-only memory map unless the store is compressed.
+
+        Categorical columns are returned as their int32 codes.
+        """
+        dtype = np.dtype(self.schema['columns'][name])
+        if len(self) == 0:
+            return np.empty(0, dtype=dtype)
+        if self.compression:
+            return self._read_blocks(name, 0, len(self))
+        return np.memmap(self._column_path(name), dtype=dtype, mode='r', shape=(len(self),))
+
+    def _read_blocks(self, name, start, stop):
+        """Decompress the blocks of column ``name`` that overlap rows ``start:stop``"""
+        dtype = np.dtype(self.schema['columns'][name])
+        if start >= stop:
+            return np.empty(0, dtype=dtype)
+        block_starts = np.concatenate([[0], np.cumsum(self.schema['blocks'])])
+        first = int(np.searchsorted(block_starts, start, side='right')) - 1
+        last = int(np.searchsorted(block_starts, stop, side='left'))
+        offsets = self.schema['block_offsets'][name]
+        with open(self._column_path(name), 'rb') as f:
+            f.seek(offsets[first])
+            data = f.read(offsets[last] - offsets[first])
+        pieces = [
+            _unshuffle(zlib.decompress(data[offsets[i] - offsets[first]:offsets[i + 1] - offsets[first]]), dtype)
+            for i in range(first, last)
+        ]
+        values = np.concatenate(pieces)
+        return values[start - block_starts[first]:stop - block_starts[first]]
+
+    def read(self, columns=None, start=0, stop=None):
+        """Read ``columns`` (default: all) for rows ``start:stop`` into a DataFrame."""
+        columns = self.columns if columns is None else list(columns)
+        if self.compression:
+            start, stop, _ = slice(start, stop).indices(len(self))
+            return pd.DataFrame({name: self._decode(name, self._read_blocks(name, start, stop)) for name in columns})
+        return pd.DataFrame({name: self._decode(name, np.array(self.column(name)[start:stop])) for name in columns})
+
+    def iter_chunks(self, chunk_size, columns=None):
+        """Yield the stored rows as DataFrames of at most ``chunk_size`` rows."""
+        for start in range(0, len(self), chunk_size):
+            yield self.read(columns, start, start + chunk_size)
+
+
+def _shuffle(values):
+    """Group the bytes of ``values`` by position within each item"""
+    return values.view(np.uint8).reshape(-1, values.dtype.itemsize).T.tobytes()
+
+
+def _unshuffle(data, dtype):
+    return np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, -1).T.copy().view(dtype).ravel()
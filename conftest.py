@@ -0,0 +1,32 @@
+import os
+import shutil
+
+import pytest
+
+from ml_model import HealthAnalysisModel
+
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'models')
+
+
+def isolated_model(directory):
+    """A model loaded from a copy of the registered models in ``directory``.
+
+    Should the copy's fingerprint not match, the retrain overwrites the copy
+    rather than the models committed to the repository; rows appended to the
+    training store stay in ``directory`` too.
+    """
+    model_path = os.path.join(directory, 'models')
+    shutil.copytree(MODEL_PATH, model_path, ignore=shutil.ignore_patterns('flat', 'training_stats.json'))
+    return HealthAnalysisModel(model_path=model_path, data_dir=os.path.join(directory, 'data'))
+
+
+@pytest.fixture(scope='module')
+def model(tmp_path_factory):
+    return isolated_model(str(tmp_path_factory.mktemp('model')))
+
+
+@pytest.fixture
+def fresh_model(tmp_path):
+    """A model of the test's own, for tests that update or re-register it"""
+    return isolated_model(str(tmp_path))
@@ -0,0 +1,43 @@
+import warnings
+
+import numpy as np
+
+
+class FeatureImputer:
+    """Missing-value statistics for the training data, computed once and reused.
+
+    Numeric columns (any integer, float or boolean dtype) are filled with
+    their median and every other column with its most frequent value. The
+    medians of all numeric columns are computed in a single vectorized pass.
+    The fitted imputer is registered with the models so inference fills
+    missing features with the same statistics that training used.
+    """
+
+    def __init__(self, statistics=None):
+        self.statistics_ = dict(statistics or {})
+
+    def fit(self, frame):
+        """Compute the fill value of every column of ``frame``."""
+        numeric = frame.select_dtypes(include=['number', 'bool'])
+        with warnings.catch_warnings():
+            # Columns that are entirely missing have no median; they are skipped below
+            warnings.simplefilter('ignore', RuntimeWarning)
+            medians = np.nanmedian(numeric.to_numpy(dtype=np.float64), axis=0)
+
+        statistics = {col: float(value) for col, value in zip(numeric.columns, medians) if not np.isnan(value)}
+        for col in frame.columns.difference(numeric.columns, sort=False):
+            mode = frame[col].mode()
+            if len(mode):
+                statistics[col] = mode[0]
+
+        self.statistics_ = statistics
+        return self
+
+    def transform(self, frame):
+        """Fill the missing values of ``frame`` in place and return it."""
+        frame.fillna(self.statistics_, inplace=True)
+        return frame
+
+    def fill_values(self, columns, default=0.0):
+        """Return the fill values for ``columns`` as a float array."""
+        return np.array([self.statistics_.get(col, default) for col in columns], dtype=np.float64)
@@ -0,0 +1,205 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+
+class FlatTreeEnsemble:
+    """Tree ensemble stored as contiguous node arrays instead of sklearn Tree objects.
+
+    Every tree is appended to the same ``feature``/``threshold``/``left``/``right``/
+    ``value`` arrays. Leaves point back at themselves so a sample can be stepped a
+    fixed number of times without checking whether it already reached a leaf.
+    Each tree adds its leaf ``value`` (``width`` columns wide) into the output
+    columns starting at ``tree_output[tree]``.
+
+    The arrays are saved as plain ``.npy`` files, so ``load(..., mmap_mode='r')``
+    maps them read-only and every forked worker shares the same page-cache copy.
+    """
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'depths', 'tree_output')
+
+    # Rows traversed together; bounds the (rows x trees) index matrices
+    BLOCK_SIZE = 512
+
+    def __init__(self, arrays, meta):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.meta = meta
+        self.n_outputs = meta['n_outputs']
+        self.n_features_in_ = meta['n_features']
+
+        # Traverse trees deepest first, so after k steps only the leading
+        # ``self._active[k]`` columns of the node matrix still need to move
+        order = np.argsort(-np.asarray(self.depths), kind='stable')
+        self._roots = np.asarray(self.roots)[order]
+        depths = np.asarray(self.depths)[order]
+        self._active = [int((depths > step).sum()) for step in range(int(depths.max(initial=0)))]
+
+        # One-hot map from (sorted) tree to the first output column it writes to
+        n_starts = self.n_outputs - self.value.shape[1] + 1
+        self._output_map = np.zeros((len(self.roots), n_starts))
+        self._output_map[np.arange(len(self.roots)), np.asarray(self.tree_output)[order]] = 1.0
+
+    @staticmethod
+    def _flatten(trees, leaf_values, tree_output):
+        """Concatenate sklearn trees into one set of node arrays."""
+        features, thresholds, lefts, rights, values = [], [], [], [], []
+        roots, depths = [], []
+        offset = 0
+        for tree, value in zip(trees, leaf_values):
+            n_nodes = tree.node_count
+            node_ids = np.arange(offset, offset + n_nodes, dtype=np.int32)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.int32))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.int32))
+            values.append(value)
+            roots.append(offset)
+            depths.append(tree.max_depth)
+            offset += n_nodes
+
+        return {
+            'feature': np.concatenate(features),
+            'threshold': np.concatenate(thresholds).astype(np.float64),
+            'left': np.concatenate(lefts),
+            'right': np.concatenate(rights),
+            'value': np.concatenate(values).astype(np.float64),
+            'roots': np.asarray(roots, dtype=np.int32),
+            'depths': np.asarray(depths, dtype=np.int32),
+            'tree_output': np.asarray(tree_output, dtype=np.int32)
+        }
+
+    def _accumulate(self, X):
+        """Sum every tree's leaf value into an (n_samples, n_outputs) array.
+
+        All trees are traversed together: each step moves a (rows x trees)
+        matrix of node indices one level down.
+        """
+        # sklearn evaluates trees on float32 input; match it so splits agree exactly
+        X = np.asarray(X, dtype=np.float32)
+        out = np.zeros((X.shape[0], self.n_outputs))
+        width = self.value.shape[1]
+
+        for start in range(0, X.shape[0], self.BLOCK_SIZE):
+            block = np.ascontiguousarray(X[start:start + self.BLOCK_SIZE])
+            flat_block = block.ravel()
+            row_offsets = (np.arange(block.shape[0]) * block.shape[1])[:, np.newaxis]
+            node = np.tile(self._roots, (block.shape[0], 1))
+            for n_active in self._active:
+                current = node[:, :n_active]
+                go_left = flat_block.take(row_offsets + self.feature.take(current)) <= self.threshold.take(current)
+                node[:, :n_active] = np.where(go_left, self.left.take(current), self.right.take(current))
+
+            leaf_values = self.value[node]
+            for j in range(width):
+                out[start:start + block.shape[0], j:j + self._output_map.shape[1]] += leaf_values[:, :, j] @ self._output_map
+
+        return out
+
+    def save(self, directory):
+        """Write the ensemble to ``directory`` as one ``.npy`` file per array."""
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f, indent=2)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """Load an ensemble saved by ``save``, memory-mapping the arrays by default."""
+        arrays = {
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in cls.ARRAYS
+        }
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        return cls(arrays, meta)
+
+
+class CompiledHealthEnsemble(FlatTreeEnsemble):
+    """The health classifier and regressor compiled into one flat ensemble.
+
+    The ``RandomForestClassifier`` trees write class probabilities into the
+    first ``n_classes`` output columns and each ``GradientBoostingRegressor``
+    stage of ``MultiOutputRegressor`` writes into the column of its target, so
+    a single traversal yields both the vote and every regression score.
+    Matches sklearn's predictions to floating point rounding.
+    """
+
+    @classmethod
+    def from_sklearn(cls, classifier, regressor):
+        n_classes = len(classifier.classes_)
+        n_targets = len(regressor.estimators_)
+        trees, leaf_values, tree_output = [], [], []
+
+        n_trees = len(classifier.estimators_)
+        for estimator in classifier.estimators_:
+            # Same per-tree normalisation as DecisionTreeClassifier.predict_proba,
+            # pre-divided by the number of trees so the forest average is a sum
+            value = estimator.tree_.value[:, 0, :n_classes]
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            trees.append(estimator.tree_)
+            leaf_values.append(value / normalizer / n_trees)
+            tree_output.append(0)
+
+        init = []
+        for target, booster in enumerate(regressor.estimators_):
+            if booster.loss != 'squared_error':
+                raise ValueError(f"Unsupported gradient boosting loss: {booster.loss}")
+            init.append(float(np.ravel(booster.init_.constant_)[0]))
+            for stage in booster.estimators_[:, 0]:
+                # Fold the learning rate into the leaves; pad to the shared value
+                # width (the padding lands in spare columns past the targets)
+                value = np.zeros((stage.tree_.node_count, n_classes))
+                value[:, 0] = booster.learning_rate * stage.tree_.value[:, 0, 0]
+                trees.append(stage.tree_)
+                leaf_values.append(value)
+                tree_output.append(n_classes + target)
+
+        arrays = cls._flatten(trees, leaf_values, tree_output)
+        meta = {
+            'n_outputs': n_classes + n_targets + n_classes - 1,
+            'n_features': int(classifier.n_features_in_),
+            'classes': classifier.classes_.tolist(),
+            'n_targets': n_targets,
+            'init': init
+        }
+        return cls(arrays, meta)
+
+    def __init__(self, arrays, meta):
+        super().__init__(arrays, meta)
+        self.classes_ = np.asarray(meta['classes'])
+        self.init_ = np.asarray(meta['init'])
+
+    def predict(self, X):
+        """Return ``(labels, scores)``: the forest vote and the regression targets."""
+        out = self._accumulate(X)
+        n_classes = len(self.classes_)
+        labels = self.classes_.take(np.argmax(out[:, :n_classes], axis=1), axis=0)
+        scores = self.init_ + out[:, n_classes:n_classes + len(self.init_)]
+        return labels, scores
+
+    def predict_proba(self, X):
+        return self._accumulate(X)[:, :len(self.classes_)]
+
+
+def export_flat_models(classifier, regressor, directory):
+    """Compile both fitted ensembles into ``directory`` (written atomically)."""
+    tmp_directory = f'{directory}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    CompiledHealthEnsemble.from_sklearn(classifier, regressor).save(tmp_directory)
+    try:
+        os.rename(tmp_directory, directory)
+    except OSError:
+        # Another worker exported the same version first; keep theirs
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+
+
+def load_flat_models(directory, mmap_mode='r'):
+    """Return the ``CompiledHealthEnsemble`` saved by ``export_flat_models``."""
+    return CompiledHealthEnsemble.load(directory, mmap_mode=mmap_mode)
@@ -0,0 +1,137 @@
+import asyncio
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class InMemoryJobStore:
+    """Job records kept in a dict; only visible to the current process.
+
+    Records not updated for ``ttl`` seconds are dropped.
+    """
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id):
+        now = time.time()
+        with self._lock:
+            for stale in [key for key, job in self._jobs.items() if job['updated_at'] <= now - self.ttl]:
+                del self._jobs[stale]
+            self._jobs[job_id] = {
+                'id': job_id, 'status': 'queued', 'result': None, 'error': None,
+                'created_at': now, 'updated_at': now
+            }
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields, updated_at=time.time())
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+
+class SQLiteJobStore:
+    """Job records kept in a SQLite file.
+
+    Every worker process on the machine can look up any job, so the request
+    that polls for a result does not have to reach the process that ran it.
+    Results are stored as JSON. Records not updated for ``ttl`` seconds are
+    deleted.
+    """
+
+    def __init__(self, path, ttl=3600):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, status TEXT NOT NULL, result TEXT, error TEXT, '
+            'created_at REAL NOT NULL, updated_at REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at)')
+
+    def create(self, job_id):
+        now = time.time()
+        with self._lock:
+            self._db.execute('DELETE FROM jobs WHERE updated_at <= ?', (now - self.ttl,))
+            self._db.execute(
+                'INSERT INTO jobs (id, status, created_at, updated_at) VALUES (?, ?, ?, ?)',
+                (job_id, 'queued', now, now)
+            )
+
+    def update(self, job_id, **fields):
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'])
+        fields['updated_at'] = time.time()
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        with self._lock:
+            self._db.execute(f'UPDATE jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute(
+                'SELECT id, status, result, error, created_at, updated_at FROM jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(('id', 'status', 'result', 'error', 'created_at', 'updated_at'), row))
+        if job['result'] is not None:
+            job['result'] = json.loads(job['result'])
+        return job
+
+
+class JobQueue:
+    """Run slow work in a bounded thread pool and track it by job id.
+
+    ``submit`` returns immediately with an id; the job then moves through
+    ``queued``, ``running`` and ``done`` (with its ``result``) or ``failed``
+    (with its ``error``). Status lives in ``store``, an ``InMemoryJobStore``
+    by default or a ``SQLiteJobStore`` to share it between processes.
+    Coroutine functions are run to completion on the worker thread.
+    """
+
+    def __init__(self, store=None, max_workers=4):
+        self.store = store if store is not None else InMemoryJobStore()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job-worker')
+
+    def submit(self, func, *args, **kwargs):
+        """Queue ``func(*args, **kwargs)`` and return its job id."""
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id)
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def get(self, job_id):
+        """Return the job record, or None if it is unknown or expired."""
+        return self.store.get(job_id)
+
+    def _run(self, job_id, func, args, kwargs):
+        self.store.update(job_id, status='running')
+        try:
+            result = func(*args, **kwargs)
+            if inspect.iscoroutine(result):
+                result = asyncio.run(result)
+            self.store.update(job_id, status='done', result=result)
+        except Exception as e:
+            print(f"Job {job_id} failed: {str(e)}")
+            self.store.update(job_id, status='failed', error=str(e))
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
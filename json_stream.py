@@ -0,0 +1,190 @@
+import json
+import re
+
+
+# Characters that change the scanner state; everything else is skipped over
+_STRUCTURAL = re.compile(r'[\\"{}\[\],]')
+
+_JSON_TYPES = {
+    'number': (int, float),
+    'string': str,
+    'array': list,
+    'object': dict,
+    'boolean': bool
+}
+
+
+def _matches(value, json_type):
+    if json_type == 'number' and isinstance(value, bool):
+        return False
+    return isinstance(value, _JSON_TYPES[json_type])
+
+
+def _closers(stack):
+    return ''.join('}' if opener == '{' else ']' for opener in reversed(stack))
+
+
+class IncrementalJSONObjectParser:
+    """Parse a JSON object from a text stream, one top-level member at a time.
+
+    ``feed`` accepts chunks as they arrive (text before the opening brace is
+    ignored) and returns the top-level members completed by that chunk. Each
+    member is decoded on its own as soon as its closing comma or brace
+    arrives, and checked against ``schema``, a mapping of key to JSON type
+    name (``'number'``, ``'string'``, ``'array'``, ``'object'``,
+    ``'boolean'``). Members that fail to decode or have the wrong type are
+    left out and described in ``errors``.
+
+    ``close`` ends the stream. If the object was cut off, the member in
+    progress is repaired by closing its open string and containers (or by
+    dropping its incomplete last element) and ``truncated`` is set.
+    """
+
+    def __init__(self, schema=None):
+        self.schema = schema or {}
+        self.members = {}
+        self.errors = []
+        self.truncated = False
+        self.started = False
+        self.complete = False
+
+        self._pending = []
+        self._pending_length = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        # Offsets (within the pending member) of commas inside nested
+        # containers, with the open containers at that point
+        self._cut_points = []
+
+    @property
+    def missing(self):
+        """Schema keys that have not been received (or were rejected)."""
+        return [key for key in self.schema if key not in self.members]
+
+    def feed(self, text):
+        """Consume the next chunk of text; return the members it completed as (key, value) pairs."""
+        completed = []
+        if self.complete:
+            return completed
+
+        position = 0
+        if not self.started:
+            position = text.find('{')
+            if position < 0:
+                return completed
+            self.started = True
+            position += 1
+
+        member_start = position
+        skip_until = position
+        if self._escape:
+            # The previous chunk ended with a backslash inside a string
+            self._escape = False
+            skip_until = position + 1
+
+        for match in _STRUCTURAL.finditer(text, position):
+            index = match.start()
+            if index < skip_until:
+                continue
+            char = match.group()
+
+            if self._in_string:
+                if char == '\\':
+                    skip_until = index + 2
+                    if skip_until > len(text):
+                        self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._stack.append(char)
+            elif char in '}]':
+                if self._stack:
+                    self._stack.pop()
+                elif char == '}':
+                    # End of the top-level object
+                    self._append(text[member_start:index])
+                    self._finish_member(completed)
+                    self.complete = True
+                    return completed
+            elif char == ',':
+                if self._stack:
+                    self._cut_points.append((self._pending_length + index - member_start, tuple(self._stack)))
+                else:
+                    self._append(text[member_start:index])
+                    self._finish_member(completed)
+                    member_start = index + 1
+
+        self._append(text[member_start:])
+        return completed
+
+    def close(self):
+        """End the stream and return every accepted member as a dict."""
+        if self.started and not self.complete:
+            self.truncated = True
+            pending = ''.join(self._pending)
+            if pending.strip():
+                self._recover(pending)
+            self._reset_member()
+        return self.members
+
+    def _append(self, text):
+        if text:
+            self._pending.append(text)
+            self._pending_length += len(text)
+
+    def _reset_member(self):
+        self._pending = []
+        self._pending_length = 0
+        self._cut_points = []
+
+    def _finish_member(self, completed):
+        text = ''.join(self._pending)
+        self._reset_member()
+        if not text.strip():
+            return
+        try:
+            member = json.loads('{' + text + '}')
+        except ValueError as e:
+            self.errors.append(f"Malformed member {text.strip()[:40]!r}: {str(e)}")
+            return
+        for key, value in member.items():
+            if self._accept(key, value):
+                completed.append((key, value))
+
+    def _accept(self, key, value):
+        json_type = self.schema.get(key)
+        if json_type is not None and not _matches(value, json_type):
+            self.errors.append(f"'{key}' should be a {json_type}, got {type(value).__name__}")
+            return False
+        self.members[key] = value
+        return True
+
+    def _recover(self, pending):
+        """Salvage the member that was cut off, if enough of it arrived."""
+        candidates = []
+        if self._in_string:
+            # Close the open string (dropping a dangling escape)
+            candidates.append((pending[:-1] if self._escape else pending) + '"' + _closers(self._stack))
+        else:
+            tail = pending.rstrip().rstrip(',')
+            # A trailing number or literal may itself be cut short, so only
+            # keep the tail as is when it ends on a closed string or container
+            if tail.endswith(('"', '}', ']')):
+                candidates.append(tail + _closers(self._stack))
+        # Fall back to cutting the incomplete last element of a nested container
+        for offset, stack in reversed(self._cut_points):
+            candidates.append(pending[:offset] + _closers(stack))
+
+        for candidate in candidates:
+            try:
+                member = json.loads('{' + candidate + '}')
+            except ValueError:
+                continue
+            for key, value in member.items():
+                self._accept(key, value)
+            return
+
+        self.errors.append(f"Dropped truncated member {pending.strip()[:40]!r}")
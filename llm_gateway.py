@@ -0,0 +1,142 @@
+import asyncio
+import os
+import queue
+import threading
+
+import httpx
+import openai
+
+
+# Marks the end of a streamed reply in the chunk queue
+_STREAM_END = object()
+
+
+class LLMGateway:
+    """Shared asynchronous client for the chat-completions API.
+
+    All calls run on one background event loop that owns a pooled, keep-alive
+    ``httpx.AsyncClient``. Callers await ``chat`` from any thread or event
+    loop (Flask runs every async view in a fresh loop), and connections are
+    still reused across requests. A semaphore bounds the number of requests
+    in flight, and every call gets its own timeout. ``stream_chat`` yields a
+    reply as its tokens arrive, for streamed responses.
+    """
+
+    def __init__(self, api_key=None, base_url=None, max_concurrency=None, timeout=60.0, max_retries=2):
+        self.api_key = api_key or os.getenv('OPENAI_API_KEY')
+        self.base_url = base_url or os.getenv('OPENAI_BASE_URL')
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv('METABOLX_LLM_CONCURRENCY', '32'))
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='llm-gateway', daemon=True)
+        self._thread.start()
+        self._submit(self._open()).result()
+
+    async def _open(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency
+            ),
+            timeout=self.timeout
+        )
+        self._client = openai.AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            http_client=self._http_client,
+            max_retries=self.max_retries
+        )
+
+    def _submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    async def chat(self, messages, model='gpt-3.5-turbo', max_tokens=None, temperature=0.7, timeout=None):
+        """Return the assistant's reply to ``messages``.
+
+        ``timeout`` (seconds) applies to this call only and defaults to the
+        gateway's timeout.
+        """
+        future = self._submit(self._chat(messages, model, max_tokens, temperature, timeout))
+        return await asyncio.wrap_future(future)
+
+    async def _chat(self, messages, model, max_tokens, temperature, timeout):
+        options = {'max_tokens': max_tokens} if max_tokens is not None else {}
+        async with self._semaphore:
+            response = await self._client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                timeout=self.timeout if timeout is None else timeout,
+                **options
+            )
+        return response.choices[0].message.content
+
+    def stream_chat(self, messages, model='gpt-3.5-turbo', max_tokens=None, temperature=0.7, timeout=None):
+        """Yield the reply to ``messages`` piece by piece as tokens arrive.
+
+        A plain (blocking) iterator, so it can feed a streamed WSGI response.
+        Errors are raised from the iterator; abandoning it cancels the request.
+        """
+        chunks = queue.Queue()
+        future = self._submit(self._stream_chat(chunks.put, messages, model, max_tokens, temperature, timeout))
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is _STREAM_END:
+                    break
+                yield chunk
+            future.result()
+        finally:
+            future.cancel()
+
+    async def astream_chat(self, messages, model='gpt-3.5-turbo', max_tokens=None, temperature=0.7, timeout=None):
+        """Async version of ``stream_chat``, for use with ``async for``."""
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+
+        def put(chunk):
+            loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+
+        future = self._submit(self._stream_chat(put, messages, model, max_tokens, temperature, timeout))
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is _STREAM_END:
+                    break
+                yield chunk
+            await asyncio.wrap_future(future)
+        finally:
+            future.cancel()
+
+    async def _stream_chat(self, put, messages, model, max_tokens, temperature, timeout):
+        options = {'max_tokens': max_tokens} if max_tokens is not None else {}
+        try:
+            async with self._semaphore:
+                stream = await self._client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    timeout=self.timeout if timeout is None else timeout,
+                    stream=True,
+                    **options
+                )
+                try:
+                    async for event in stream:
+                        if event.choices and event.choices[0].delta.content:
+                            put(event.choices[0].delta.content)
+                finally:
+                    await stream.response.aclose()
+        finally:
+            put(_STREAM_END)
+
+    def close(self):
+        """Close the pooled connections and stop the background loop."""
+        if self._loop.is_running():
+            self._submit(self._http_client.aclose()).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
@@ -0,0 +1,218 @@
+import heapq
+import itertools
+import smtplib
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+
+class SMTPConnectionPool:
+    """Reusable, logged-in SMTP connections.
+
+    Connections are opened on demand (EHLO, STARTTLS, login) up to
+    ``max_connections`` and returned to the pool after use. Before an idle
+    connection is reused it is checked with NOOP; connections idle for
+    longer than ``idle_timeout`` seconds, or that fail with anything other
+    than an SMTP reply, are closed instead.
+    """
+
+    def __init__(self, host, port=587, username=None, password=None, starttls=True,
+                 max_connections=2, idle_timeout=60, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._idle = []
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _open(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            self._discard(smtp)
+            raise
+        self.connections_opened += 1
+        return smtp
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                smtp, idle_since = self._idle.pop()
+            if time.time() - idle_since < self.idle_timeout:
+                try:
+                    if smtp.noop()[0] == 250:
+                        return smtp
+                except (smtplib.SMTPException, OSError):
+                    pass
+            self._discard(smtp)
+        return self._open()
+
+    @staticmethod
+    def _discard(smtp):
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for a batch of sends."""
+        with self._slots:
+            smtp = self._checkout()
+            try:
+                yield smtp
+            except smtplib.SMTPResponseException:
+                # The server answered, so the session is still usable
+                self._release(smtp)
+                raise
+            except BaseException:
+                self._discard(smtp)
+                raise
+            else:
+                self._release(smtp)
+
+    def _release(self, smtp):
+        with self._lock:
+            self._idle.append((smtp, time.time()))
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for smtp, _ in idle:
+            self._discard(smtp)
+
+
+class _Delivery:
+    def __init__(self, message):
+        self.message = message
+        self.future = Future()
+        self.attempts = 0
+
+
+def _is_permanent(error):
+    """5xx replies will not succeed on retry; everything else might."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+class Mailer:
+    """Deliver email in the background over pooled SMTP sessions.
+
+    ``submit`` queues a message and returns a Future for its delivery. The
+    queue is drained by one delivery thread per pool connection
+    (``pool.max_connections``); each thread takes the messages that are due
+    (up to ``batch_size``) and sends them over one borrowed connection, so
+    while one session waits on a slow server the others keep sending.
+    Temporary failures are retried with exponential backoff, starting at
+    ``backoff`` seconds and capped at ``max_backoff``, up to
+    ``max_attempts`` tries. Permanent (5xx) rejections fail the Future
+    straight away.
+    """
+
+    def __init__(self, pool, max_attempts=4, backoff=2.0, max_backoff=300.0, batch_size=50):
+        self.pool = pool
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.batch_size = batch_size
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._run, name=f'mailer-{i}', daemon=True)
+            for i in range(pool.max_connections)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, message):
+        """Queue ``message`` (an ``email.message.Message``); return a Future."""
+        delivery = _Delivery(message)
+        self._schedule(delivery, time.time())
+        return delivery.future
+
+    def send(self, message, timeout=None):
+        """Queue ``message`` and wait until it has been delivered."""
+        return self.submit(message).result(timeout)
+
+    def _schedule(self, delivery, due):
+        with self._condition:
+            heapq.heappush(self._queue, (due, next(self._sequence), delivery))
+            self._condition.notify()
+
+    def _next_batch(self):
+        with self._condition:
+            while True:
+                now = time.time()
+                if self._queue and self._queue[0][0] <= now:
+                    batch = []
+                    while self._queue and self._queue[0][0] <= now and len(batch) < self.batch_size:
+                        batch.append(heapq.heappop(self._queue)[2])
+                    return batch
+                if self._closed:
+                    return None
+                self._condition.wait(self._queue[0][0] - now if self._queue else None)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._deliver(batch)
+
+    def _deliver(self, batch):
+        pending = list(batch)
+        try:
+            with self.pool.connection() as smtp:
+                while pending:
+                    delivery = pending[0]
+                    try:
+                        smtp.send_message(delivery.message)
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                        # Rejected by the server; the session carries on
+                        pending.pop(0)
+                        self._failed(delivery, e)
+                    else:
+                        pending.pop(0)
+                        delivery.future.set_result(None)
+        except Exception as e:
+            print(f"SMTP session failed: {str(e)}")
+            for delivery in pending:
+                self._failed(delivery, e)
+
+    def _failed(self, delivery, error):
+        delivery.attempts += 1
+        if _is_permanent(error) or delivery.attempts >= self.max_attempts:
+            print(f"Giving up on email to {delivery.message['To']} after {delivery.attempts} attempt(s): {str(error)}")
+            delivery.future.set_exception(error)
+            return
+        delay = min(self.backoff * 2 ** (delivery.attempts - 1), self.max_backoff)
+        print(f"Email to {delivery.message['To']} failed ({str(error)}); retrying in {delay:.1f}s")
+        self._schedule(delivery, time.time() + delay)
+
+    def close(self, wait=True):
+        """Stop once the queue has drained (retries included) and close the pool."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self.pool.close()
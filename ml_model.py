@@ -5,20 +5,154 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
 from sklearn.multioutput import MultiOutputRegressor
 from sklearn.metrics import accuracy_score, mean_squared_error
+from sklearn.base import clone
 import joblib
+from joblib import Parallel, delayed
+import copy
 import os
 import json
+import time
+import tempfile
+import operator
+from itertools import chain, islice
+from model_registry import ModelRegistry
+from flat_trees import CompiledHealthEnsemble
+from training_store import TrainingStore
+from columnar_store import ColumnarStore
+from feature_imputer import FeatureImputer
+from synthetic_shards import iter_shards
+from real_data_loader import nhanes_source_digest
+
+
+# Version of the synthetic training data generators (generate_training_data,
+# _sample_training_data and RealDataLoader's synthetic records). Bump it
+# whenever they change so that registered models are retrained.
+TRAINING_DATA_VERSION = 1
+
+
+def _fit_estimator_timed(estimator, X, y):
+    """Fit one estimator in a pool worker and report how long it took"""
+    start = time.perf_counter()
+    estimator.fit(X, y)
+    return estimator, time.perf_counter() - start
+
+
+# Reference range of each biomarker; values are scaled so the range maps to 0-1
+MARKER_REFERENCE_RANGES = {
+    'glucose': (70, 100),
+    'cholesterol': (125, 200),
+    'triglycerides': (0, 150),
+    'hdl': (40, 60),
+    'ldl': (0, 100),
+    'alt': (7, 56),
+    'ast': (10, 40),
+    'bilirubin': (0.3, 1.2),
+    'alkaline_phosphatase': (44, 147),
+    'creatinine': (0.6, 1.2),
+    'bun': (7, 20),
+    'sodium': (135, 145),
+    'potassium': (3.5, 5.0),
+    'chloride': (96, 106),
+    'bicarbonate': (23, 29),
+    'calcium': (8.5, 10.5),
+    'magnesium': (1.7, 2.3),
+    'phosphate': (2.5, 4.5),
+    'total_protein': (6.0, 8.0),
+    'albumin': (3.5, 5.0),
+    'globulin': (2.0, 3.5),
+    'ag_ratio': (1.1, 2.5)
+}
+
+# Weight of each marker in its body system's score
+SYSTEM_MARKER_WEIGHTS = {
+    'liver': {'alt': 0.3, 'ast': 0.3, 'bilirubin': 0.2, 'alkaline_phosphatase': 0.2},
+    'kidney': {'creatinine': 0.3, 'bun': 0.2, 'sodium': 0.2, 'potassium': 0.15, 'chloride': 0.15},
+    'cardio': {'cholesterol': 0.25, 'triglycerides': 0.25, 'hdl': 0.2, 'ldl': 0.2, 'glucose': 0.1},
+    'endocrine': {'glucose': 0.4, 'calcium': 0.2, 'magnesium': 0.2, 'phosphate': 0.2},
+    'immune': {'total_protein': 0.3, 'albumin': 0.3, 'globulin': 0.2, 'ag_ratio': 0.2},
+    'digestive': {'albumin': 0.3, 'total_protein': 0.3, 'bilirubin': 0.2, 'alkaline_phosphatase': 0.2}
+}
+
+# Health insights: (feature, comparison, threshold, insight, moderate threshold,
+# moderate insight). Only the first insight is given when both thresholds are met.
+HEALTH_INSIGHT_RULES = [
+    ('metabolic_syndrome_score', operator.gt, 50, "High risk of metabolic syndrome detected",
+     25, "Moderate risk of metabolic syndrome"),
+    ('cardiovascular_risk_index', operator.gt, 70, "High cardiovascular risk detected",
+     50, "Moderate cardiovascular risk"),
+    ('liver_health_index', operator.lt, 30, "Significant liver function impairment",
+     50, "Mild liver function impairment"),
+    ('kidney_function_index', operator.lt, 30, "Significant kidney function impairment",
+     50, "Mild kidney function impairment"),
+    ('immune_system_score', operator.lt, 30, "Weakened immune system detected",
+     50, "Moderate immune system function"),
+    ('hormone_balance_index', operator.lt, 30, "Significant hormonal imbalance detected",
+     50, "Mild hormonal imbalance"),
+    ('oxidative_stress_score', operator.gt, 70, "High oxidative stress levels detected",
+     50, "Moderate oxidative stress levels")
+]
+
+# Recommendations: (category, feature, comparison, threshold, recommendations)
+RECOMMENDATION_RULES = [
+    ('lifestyle', 'metabolic_syndrome_score', operator.gt, 25,
+     ["Increase physical activity to at least 150 minutes per week", "Implement stress management techniques"]),
+    ('lifestyle', 'cardiovascular_risk_index', operator.gt, 50,
+     ["Regular cardiovascular exercise", "Monitor blood pressure regularly"]),
+    ('diet', 'metabolic_efficiency_score', operator.lt, 50,
+     ["Reduce refined carbohydrate intake", "Increase fiber-rich foods"]),
+    ('diet', 'liver_health_index', operator.lt, 50,
+     ["Reduce alcohol consumption", "Increase antioxidant-rich foods"]),
+    ('supplements', 'oxidative_stress_score', operator.gt, 50,
+     ["Consider antioxidant supplements", "Vitamin C and E supplementation"]),
+    ('supplements', 'bone_health_index', operator.lt, 50,
+     ["Calcium and Vitamin D supplementation", "Magnesium supplementation"]),
+    ('monitoring', 'kidney_function_index', operator.lt, 50,
+     ["Regular kidney function tests", "Monitor fluid intake"]),
+    ('monitoring', 'endocrine_balance_score', operator.lt, 50,
+     ["Regular hormone level checks", "Monitor blood sugar levels"])
+]
+
+# Trend simulation: scores move by at most this many points per week (before
+# noise), and each projected biomarker drifts toward its target value; markers
+# without a target only vary by noise
+TREND_MAX_WEEKLY_CHANGE = 2.0
+TREND_SCORE_NOISE = 0.2
+TREND_BIOMARKERS = ['glucose', 'cholesterol', 'triglycerides', 'hdl', 'ldl']
+TREND_BIOMARKER_TARGETS = {'glucose': 90, 'cholesterol': 170}
+
 
 class HealthAnalysisModel:
-    def __init__(self):
-        self.model_path = os.path.join(os.path.dirname(__file__), 'models')
+    # Batches up to this size are scored by the compiled flat ensemble; larger
+    # ones use sklearn's own tree traversal when the estimators are loaded
+    COMPILED_BATCH_ROWS = 1024
+
+    def __init__(self, retrain=False, mmap=False, training_jobs=None, model_path=None, data_dir=None):
+        # Registered models and accumulated training rows; the repository's
+        # models/ and data/ unless given
+        if model_path is None:
+            model_path = os.path.join(os.path.dirname(__file__), 'models')
+        if data_dir is None:
+            data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        self.model_path = model_path
         os.makedirs(self.model_path, exist_ok=True)
+        self.registry = ModelRegistry(self.model_path)
+        self.training_store = TrainingStore(
+            os.path.join(data_dir, 'training_store'), legacy_csv=os.path.join(data_dir, 'training_store.csv')
+        )
         
         self.classifier = RandomForestClassifier(n_estimators=100, random_state=42)
         self.regressor = MultiOutputRegressor(GradientBoostingRegressor(random_state=42))
         self.scaler = StandardScaler()
+        self.imputer = None
+        self.compiled = None
         self.is_trained = False
         
+        # Worker processes used to fit the classifier and regression targets
+        # (joblib convention: -1 means one per CPU)
+        if training_jobs is None:
+            training_jobs = int(os.getenv('METABOLX_TRAINING_JOBS', '-1'))
+        self.training_jobs = training_jobs
+        
         # Define base features
         self.base_features = [
             'age', 'gender', 'bmi', 'glucose', 'cholesterol', 'triglycerides',
@@ -47,6 +181,12 @@ class HealthAnalysisModel:
             'vascular_health_score'
         ]
         
+        # Raw markers, besides the base features, that the advanced features are computed from
+        self.advanced_inputs = [
+            'crp', 'esr', 'fibrinogen', 'malondialdehyde', '8_ohdg',
+            'testosterone', 'estradiol', 'cortisol'
+        ]
+        
         # Define system-specific scores
         self.system_scores = {
             'liver': ['alt', 'ast', 'bilirubin', 'alkaline_phosphatase', 'albumin'],
@@ -57,9 +197,31 @@ class HealthAnalysisModel:
             'digestive': ['albumin', 'total_protein', 'bilirubin', 'alkaline_phosphatase']
         }
         
+        # System scores as one matrix product: reference ranges per marker and a
+        # (system x marker) weight matrix. A marker counts towards a system when
+        # it is listed for the system and has a weight there.
+        self._system_names = list(self.system_scores)
+        self._score_markers = sorted({
+            marker for system, markers in self.system_scores.items()
+            for marker in markers if marker in SYSTEM_MARKER_WEIGHTS[system]
+        }, key=self.base_features.index)
+        ranges = np.array([MARKER_REFERENCE_RANGES[marker] for marker in self._score_markers], dtype=np.float64)
+        self._marker_low = ranges[:, 0]
+        self._marker_span = ranges[:, 1] - ranges[:, 0]
+        self._system_weights = np.zeros((len(self._system_names), len(self._score_markers)))
+        for i, system in enumerate(self._system_names):
+            for j, marker in enumerate(self._score_markers):
+                if marker in self.system_scores[system]:
+                    self._system_weights[i, j] = SYSTEM_MARKER_WEIGHTS[system].get(marker, 0.0)
+        
         # Combined feature columns
         self.feature_columns = self.base_features + self.advanced_features
         
+        # Position of each feature in the model input, and the value used when a
+        # patient does not provide it (the training medians once an imputer is fitted)
+        self._feature_index = {col: i for i, col in enumerate(self.feature_columns)}
+        self._default_features = np.zeros(len(self.feature_columns), dtype=np.float64)
+        
         # Define target columns for regression
         self.regression_targets = [
             'health_score',
@@ -73,49 +235,63 @@ class HealthAnalysisModel:
             'digestive_score'
         ]
         
-        # Load or train models
-        self.load_or_train_models()
+        # Everything besides the schema and the training data (see
+        # training_fingerprint) that determines what training produces
+        self.training_config = {
+            'synthetic_samples': 1000,
+            'imputation': 'median/mode',
+            'classifier': self.classifier.get_params(),
+            'regressor': self.regressor.estimator.get_params()
+        }
+        
+        # Load or train models. With mmap=True the tree ensembles are served from
+        # memory-mapped flat arrays shared by every worker process.
+        self.load_or_train_models(retrain=retrain, mmap=mmap)
 
     def generate_training_data(self, n_samples=1000):
         """Generate synthetic training data with realistic medical values."""
-        np.random.seed(42)
-        
+        # The legacy RandomState stream: train_models trains on these rows, and the
+        # registered models were fitted on exactly this stream
+        return self._sample_training_data(np.random.RandomState(42), n_samples)
+
+    def _sample_training_data(self, rng, n_samples):
+        """Draw ``n_samples`` synthetic training rows from ``rng`` (a ``Generator`` or ``RandomState``)"""
         # Generate base features
         data = {
-            'age': np.random.normal(45, 15, n_samples).clip(18, 90),
-            'gender': np.random.choice([0, 1], n_samples),
-            'bmi': np.random.normal(25, 5, n_samples).clip(15, 40),
-            'glucose': np.random.normal(95, 15, n_samples).clip(60, 200),
-            'cholesterol': np.random.normal(180, 30, n_samples).clip(100, 300),
-            'triglycerides': np.random.normal(150, 50, n_samples).clip(50, 400),
-            'hdl': np.random.normal(50, 10, n_samples).clip(30, 100),
-            'ldl': np.random.normal(100, 25, n_samples).clip(50, 200),
-            'alt': np.random.normal(25, 10, n_samples).clip(5, 100),
-            'ast': np.random.normal(25, 8, n_samples).clip(5, 80),
-            'bilirubin': np.random.normal(0.8, 0.3, n_samples).clip(0.2, 2.0),
-            'alkaline_phosphatase': np.random.normal(70, 20, n_samples).clip(30, 150),
-            'creatinine': np.random.normal(0.9, 0.3, n_samples).clip(0.5, 2.0),
-            'bun': np.random.normal(15, 5, n_samples).clip(5, 40),
-            'sodium': np.random.normal(140, 3, n_samples).clip(130, 150),
-            'potassium': np.random.normal(4.0, 0.5, n_samples).clip(3.0, 5.5),
-            'chloride': np.random.normal(102, 3, n_samples).clip(95, 110),
-            'bicarbonate': np.random.normal(24, 2, n_samples).clip(20, 30),
-            'calcium': np.random.normal(9.5, 0.5, n_samples).clip(8.0, 11.0),
-            'magnesium': np.random.normal(2.0, 0.2, n_samples).clip(1.5, 2.5),
-            'phosphate': np.random.normal(3.5, 0.5, n_samples).clip(2.5, 5.0),
-            'total_protein': np.random.normal(7.0, 0.5, n_samples).clip(6.0, 8.5),
-            'albumin': np.random.normal(4.0, 0.3, n_samples).clip(3.0, 5.0),
-            'globulin': np.random.normal(3.0, 0.4, n_samples).clip(2.0, 4.0),
-            'ag_ratio': np.random.normal(1.5, 0.2, n_samples).clip(1.0, 2.0),
+            'age': rng.normal(45, 15, n_samples).clip(18, 90),
+            'gender': rng.choice([0, 1], n_samples),
+            'bmi': rng.normal(25, 5, n_samples).clip(15, 40),
+            'glucose': rng.normal(95, 15, n_samples).clip(60, 200),
+            'cholesterol': rng.normal(180, 30, n_samples).clip(100, 300),
+            'triglycerides': rng.normal(150, 50, n_samples).clip(50, 400),
+            'hdl': rng.normal(50, 10, n_samples).clip(30, 100),
+            'ldl': rng.normal(100, 25, n_samples).clip(50, 200),
+            'alt': rng.normal(25, 10, n_samples).clip(5, 100),
+            'ast': rng.normal(25, 8, n_samples).clip(5, 80),
+            'bilirubin': rng.normal(0.8, 0.3, n_samples).clip(0.2, 2.0),
+            'alkaline_phosphatase': rng.normal(70, 20, n_samples).clip(30, 150),
+            'creatinine': rng.normal(0.9, 0.3, n_samples).clip(0.5, 2.0),
+            'bun': rng.normal(15, 5, n_samples).clip(5, 40),
+            'sodium': rng.normal(140, 3, n_samples).clip(130, 150),
+            'potassium': rng.normal(4.0, 0.5, n_samples).clip(3.0, 5.5),
+            'chloride': rng.normal(102, 3, n_samples).clip(95, 110),
+            'bicarbonate': rng.normal(24, 2, n_samples).clip(20, 30),
+            'calcium': rng.normal(9.5, 0.5, n_samples).clip(8.0, 11.0),
+            'magnesium': rng.normal(2.0, 0.2, n_samples).clip(1.5, 2.5),
+            'phosphate': rng.normal(3.5, 0.5, n_samples).clip(2.5, 5.0),
+            'total_protein': rng.normal(7.0, 0.5, n_samples).clip(6.0, 8.5),
+            'albumin': rng.normal(4.0, 0.3, n_samples).clip(3.0, 5.0),
+            'globulin': rng.normal(3.0, 0.4, n_samples).clip(2.0, 4.0),
+            'ag_ratio': rng.normal(1.5, 0.2, n_samples).clip(1.0, 2.0),
             # New biomarkers
-            'crp': np.random.normal(2.0, 2.0, n_samples).clip(0.1, 10.0),  # C-reactive protein
-            'esr': np.random.normal(15, 10, n_samples).clip(0, 50),  # Erythrocyte sedimentation rate
-            'fibrinogen': np.random.normal(300, 50, n_samples).clip(200, 500),  # Fibrinogen
-            'malondialdehyde': np.random.normal(1.0, 0.5, n_samples).clip(0.1, 3.0),  # Lipid peroxidation marker
-            '8_ohdg': np.random.normal(2.0, 1.0, n_samples).clip(0.1, 5.0),  # DNA damage marker
-            'testosterone': np.random.normal(600, 200, n_samples).clip(200, 1200),  # Testosterone
-            'estradiol': np.random.normal(50, 20, n_samples).clip(10, 100),  # Estradiol
-            'cortisol': np.random.normal(15, 5, n_samples).clip(5, 30)  # Cortisol
+            'crp': rng.normal(2.0, 2.0, n_samples).clip(0.1, 10.0),  # C-reactive protein
+            'esr': rng.normal(15, 10, n_samples).clip(0, 50),  # Erythrocyte sedimentation rate
+            'fibrinogen': rng.normal(300, 50, n_samples).clip(200, 500),  # Fibrinogen
+            'malondialdehyde': rng.normal(1.0, 0.5, n_samples).clip(0.1, 3.0),  # Lipid peroxidation marker
+            '8_ohdg': rng.normal(2.0, 1.0, n_samples).clip(0.1, 5.0),  # DNA damage marker
+            'testosterone': rng.normal(600, 200, n_samples).clip(200, 1200),  # Testosterone
+            'estradiol': rng.normal(50, 20, n_samples).clip(10, 100),  # Estradiol
+            'cortisol': rng.normal(15, 5, n_samples).clip(5, 30)  # Cortisol
         }
         
         # Convert to DataFrame
@@ -127,21 +303,72 @@ class HealthAnalysisModel:
             df[key] = value
         
         # Generate target variables
-        df['health_status'] = np.random.choice(['healthy', 'at_risk', 'unhealthy'], n_samples, p=[0.6, 0.3, 0.1])
+        df['health_status'] = rng.choice(['healthy', 'at_risk', 'unhealthy'], n_samples, p=[0.6, 0.3, 0.1])
         
         # Generate regression targets
-        df['predicted_glucose'] = df['glucose'] + np.random.normal(0, 5, n_samples)
-        df['predicted_cholesterol'] = df['cholesterol'] + np.random.normal(0, 10, n_samples)
-        df['predicted_bmi'] = df['bmi'] + np.random.normal(0, 1, n_samples)
+        df['predicted_glucose'] = df['glucose'] + rng.normal(0, 5, n_samples)
+        df['predicted_cholesterol'] = df['cholesterol'] + rng.normal(0, 10, n_samples)
+        df['predicted_bmi'] = df['bmi'] + rng.normal(0, 1, n_samples)
         
         return df
 
-    def load_or_train_models(self):
-        """Load existing models or train new ones"""
+    def training_data_provenance(self):
+        """Identify the data ``train_models`` would train on: the synthetic
+        generator version, the NHANES transport files and the training store."""
+        return {
+            'generator_version': TRAINING_DATA_VERSION,
+            'nhanes_sources': nhanes_source_digest(),
+            'training_store': self.training_store.digest()
+        }
+
+    def training_fingerprint(self):
+        """Registry fingerprint of the schema, training config and training data"""
+        return self.registry.fingerprint(
+            self.feature_columns, self.regression_targets,
+            dict(self.training_config, data=self.training_data_provenance())
+        )
+
+    def load_or_train_models(self, retrain=False, mmap=False):
+        """Load registered models, retraining only on fingerprint mismatch or request"""
+        fingerprint = self.training_fingerprint()
+        
+        if not retrain:
+            artifacts = self.registry.load(fingerprint, mmap_mode='r' if mmap else None)
+            if artifacts is not None:
+                self.scaler = artifacts['scaler']
+                self._set_imputer(artifacts.get('imputer'))
+                if 'compiled' in artifacts:
+                    # Shared flat trees only; the sklearn estimators are never unpickled
+                    self.classifier = None
+                    self.regressor = None
+                    self.compiled = artifacts['compiled']
+                else:
+                    self.classifier = artifacts['classifier']
+                    self.regressor = artifacts['regressor']
+                    self.compiled = CompiledHealthEnsemble.from_sklearn(self.classifier, self.regressor)
+                self.is_trained = True
+                print(f"Loaded registered models (version {self.registry.version})")
+                return
+        
+        self.train_models()
+        version = self.registry.save(
+            fingerprint,
+            {'scaler': self.scaler, 'imputer': self.imputer, 'classifier': self.classifier, 'regressor': self.regressor}
+        )
+        print(f"Registered trained models as version {version}")
+        
+        if mmap:
+            # Serve the freshly trained version from its shared flat export too
+            self.load_or_train_models(mmap=True)
+        else:
+            self.compiled = CompiledHealthEnsemble.from_sklearn(self.classifier, self.regressor)
+
+    def train_models(self):
+        """Train the classifier and regressor from scratch"""
         try:
             # Generate synthetic training data
             print("Generating synthetic training data...")
-            synthetic_data = self.generate_training_data(n_samples=1000)
+            synthetic_data = self.generate_training_data(n_samples=self.training_config['synthetic_samples'])
             
             # Load real data if available
             print("Loading real health data...")
@@ -151,12 +378,7 @@ class HealthAnalysisModel:
             
             if real_data is not None:
                 print("Combining synthetic and real data...")
-                # Calculate advanced features for real data
-                real_data = pd.DataFrame(real_data)
-                real_data = self.calculate_advanced_features(real_data)
-                
-                # Generate target variables for real data
-                real_data = self.generate_target_variables(real_data)
+                real_data = self._prepare_real_data(real_data, synthetic_data)
                 
                 # Combine datasets
                 training_data = pd.concat([synthetic_data, real_data], ignore_index=True)
@@ -165,15 +387,16 @@ class HealthAnalysisModel:
                 print("Using synthetic data only...")
                 training_data = synthetic_data
             
+            # Include rows accumulated by incremental updates
+            stored_data = self.training_store.load()
+            if stored_data is not None:
+                print(f"Adding {len(stored_data)} stored training rows...")
+                training_data = pd.concat([training_data, stored_data], ignore_index=True)
+            
             # Handle missing values
             print("Handling missing values...")
-            for col in training_data.columns:
-                if training_data[col].dtype in ['float64', 'int64']:
-                    # Fill numeric columns with median
-                    training_data[col] = training_data[col].fillna(training_data[col].median())
-                else:
-                    # Fill categorical columns with mode
-                    training_data[col] = training_data[col].fillna(training_data[col].mode()[0])
+            self._set_imputer(FeatureImputer().fit(training_data))
+            self.imputer.transform(training_data)
             
             # Split features and targets
             X = training_data[self.feature_columns]
@@ -184,14 +407,8 @@ class HealthAnalysisModel:
             self.scaler = StandardScaler()
             X_scaled = self.scaler.fit_transform(X)
             
-            # Train classifier
-            print("Training classifier...")
-            self.classifier.fit(X_scaled, y_health)
-            
-            # Train regressor
-            print("Training regressor...")
-            self.regressor.fit(X_scaled, y_regression)
-            
+            fit_seconds = self._fit_estimators(X_scaled, y_health, y_regression)
+            self.is_trained = True
             print("Model training completed successfully!")
             
             # Save training data statistics
@@ -199,16 +416,244 @@ class HealthAnalysisModel:
                 'total_samples': len(training_data),
                 'synthetic_samples': len(synthetic_data),
                 'real_samples': len(real_data) if real_data is not None else 0,
+                'stored_samples': len(stored_data) if stored_data is not None else 0,
+                'fit_seconds': fit_seconds,
                 'feature_importance': self.get_feature_importance().to_dict()
             }
             
-            with open('training_stats.json', 'w') as f:
+            with open(os.path.join(self.model_path, 'training_stats.json'), 'w') as f:
                 json.dump(stats, f, indent=2)
             
         except Exception as e:
             print(f"Error in model training: {str(e)}")
             raise
 
+    def _prepare_real_data(self, real_data, synthetic_data):
+        """Advanced features and targets for real data rows, as ``train_models`` combines them"""
+        # Markers the real data does not measure, whether as missing values or
+        # as absent columns, take the synthetic medians so every row gets
+        # features and targets
+        real_data = pd.DataFrame(real_data)
+        real_data = real_data.reindex(columns=list(dict.fromkeys([*real_data.columns, *self.base_features, *self.advanced_inputs])))
+        FeatureImputer().fit(synthetic_data).transform(real_data)
+        
+        # Calculate advanced features for real data
+        real_data = self.calculate_advanced_features(real_data)
+        
+        # Generate target variables for real data
+        return self.generate_target_variables(real_data)
+
+    def _set_imputer(self, imputer):
+        """Use ``imputer`` for training fills and its medians as inference defaults"""
+        self.imputer = imputer
+        if imputer is None:
+            self._default_features = np.zeros(len(self.feature_columns), dtype=np.float64)
+        else:
+            self._default_features = imputer.fill_values(self.feature_columns)
+
+    def _fit_estimators(self, X_scaled, y_health, y_regression):
+        """Fit the classifier and every regression target; return per-estimator fit seconds"""
+        # Train the classifier and each regression target concurrently. Every
+        # task fits a clone with the configured random_state, so the result is
+        # identical to fitting them one after another.
+        print(f"Training classifier and {len(self.regression_targets)} regression targets (n_jobs={self.training_jobs})...")
+        tasks = [('classifier', clone(self.classifier), np.asarray(y_health))]
+        for target in self.regression_targets:
+            tasks.append((target, clone(self.regressor.estimator), np.asarray(y_regression[target])))
+        
+        fitted = Parallel(n_jobs=self.training_jobs, backend='loky')(
+            delayed(_fit_estimator_timed)(estimator, X_scaled, y) for _, estimator, y in tasks
+        )
+        
+        fit_seconds = {}
+        for (name, _, _), (estimator, elapsed) in zip(tasks, fitted):
+            fit_seconds[name] = round(elapsed, 3)
+            print(f"  {name}: {elapsed:.2f}s")
+        
+        self.classifier = fitted[0][0]
+        # Assemble the MultiOutputRegressor exactly as its own fit() would
+        self.regressor = clone(self.regressor)
+        self.regressor.estimators_ = [estimator for estimator, _ in fitted[1:]]
+        self.regressor.n_features_in_ = self.regressor.estimators_[0].n_features_in_
+        return fit_seconds
+
+    def iter_training_data(self, n_samples, chunk_size=100000, random_state=42, n_jobs=None):
+        """Yield ``n_samples`` prepared training rows in chunks of ``chunk_size``.
+
+        Each chunk is drawn from its own ``SeedSequence`` child and carries only
+        the feature and target columns, so memory use is bounded by the chunk
+        size. Chunks are generated in ``n_jobs`` worker processes (default:
+        ``training_jobs``) and come out in the same order, with the same rows,
+        whatever the number of workers.
+        """
+        if n_jobs is None:
+            n_jobs = self.training_jobs
+        # Workers only need the schema and the formulas, not the fitted estimators
+        sampler = copy.copy(self)
+        sampler.classifier = sampler.regressor = sampler.compiled = None
+        yield from iter_shards(sampler._draw_training_rows, n_samples, chunk_size, random_state, n_jobs)
+
+    def _draw_training_rows(self, rng, n_samples):
+        return self._prepare_training_rows(self._sample_training_data(rng, n_samples))
+
+    def write_training_store(self, directory, n_samples, chunk_size=100000, include_real=True,
+                             patient_batches=None):
+        """Generate ``n_samples`` synthetic training rows into a columnar store.
+
+        Like ``train_models``, an equal number of rows from the real-data
+        loader's generator is added when ``include_real`` is set. Raw patient
+        DataFrames from ``patient_batches`` (e.g.
+        ``patient_dataset.iter_patient_batches``) are prepared and added too.
+        Only one chunk is held in memory at a time. Returns the ``ColumnarStore``.
+        """
+        store = ColumnarStore(directory)
+        sources = [self.iter_training_data(n_samples, chunk_size)]
+        if include_real:
+            from real_data_loader import RealDataLoader
+            real_chunks = RealDataLoader().iter_synthetic_health_data(n_samples, chunk_size, n_jobs=self.training_jobs)
+            sources.append(self._prepare_training_rows(chunk) for chunk in real_chunks)
+        if patient_batches is not None:
+            sources.append(self._prepare_training_rows(batch) for batch in patient_batches)
+        
+        for source in sources:
+            for chunk in source:
+                store.append(chunk)
+                print(f"  wrote {len(store)} rows to {directory}")
+        return store
+
+    def train_from_store(self, store, chunk_size=100000):
+        """Train from a ``ColumnarStore`` written by ``write_training_store``.
+
+        The scaler is fitted in one streaming pass and the scaled features are
+        written to a float32 memory map in a scratch directory that is removed
+        once the estimators are fitted (float32 is the dtype the trees train
+        on), so the training rows never have to fit in memory at once.
+        Registers and returns the new model version.
+        """
+        if isinstance(store, str):
+            store = ColumnarStore(store)
+        n_rows = len(store)
+        
+        # Stored rows are complete; keep their medians as the inference defaults
+        self._set_imputer(FeatureImputer({col: float(np.median(store.column(col))) for col in self.feature_columns}))
+        
+        print(f"Fitting scaler over {n_rows} stored rows...")
+        self.scaler = StandardScaler()
+        for chunk in store.iter_chunks(chunk_size, self.feature_columns):
+            self.scaler.partial_fit(chunk)
+        
+        y_health = (store.column('health_score') >= 70).astype(int)
+        y_regression = {target: store.column(target) for target in self.regression_targets}
+        with tempfile.TemporaryDirectory(prefix='features_scaled-') as scratch_dir:
+            X_scaled = np.lib.format.open_memmap(
+                os.path.join(scratch_dir, 'features_scaled.npy'), mode='w+',
+                dtype=np.float32, shape=(n_rows, len(self.feature_columns))
+            )
+            for start, chunk in zip(range(0, n_rows, chunk_size), store.iter_chunks(chunk_size, self.feature_columns)):
+                X_scaled[start:start + len(chunk)] = self.scaler.transform(chunk)
+            X_scaled.flush()
+            fit_seconds = self._fit_estimators(X_scaled, y_health, y_regression)
+            # Close the map before the scratch directory is removed
+            del X_scaled
+        self.is_trained = True
+        self.compiled = CompiledHealthEnsemble.from_sklearn(self.classifier, self.regressor)
+        
+        fingerprint = self.training_fingerprint()
+        version = self.registry.save(
+            fingerprint,
+            {'scaler': self.scaler, 'imputer': self.imputer, 'classifier': self.classifier, 'regressor': self.regressor},
+            metadata={'training_store': {'directory': store.directory, 'samples': n_rows, 'fit_seconds': fit_seconds}}
+        )
+        print(f"Registered models trained on {n_rows} stored rows as version {version}")
+        return version
+
+    def update_models(self, new_data, n_estimators=10):
+        """Incrementally update the models with newly arrived patient rows.
+
+        The rows are appended to the training store, the scaler statistics are
+        updated with ``partial_fit`` and ``n_estimators`` trees are added to the
+        forest and to each boosted regressor, fitted on the new rows only, so
+        the cost scales with the new data rather than the full training set.
+        Returns the new registry version.
+        """
+        if self.classifier is None:
+            raise ValueError("Incremental updates need the sklearn estimators; load the model without mmap")
+        
+        new_data = self._prepare_training_rows(new_data)
+        if self.imputer is not None:
+            self.imputer.transform(new_data)
+        y_health = (new_data['health_score'] >= 70).astype(int).to_numpy()
+        
+        # Update the scaler, then move existing split thresholds into the new
+        # scaling so the old trees keep making the same decisions
+        old_mean, old_scale = self.scaler.mean_.copy(), self.scaler.scale_.copy()
+        self.scaler.partial_fit(new_data[self.feature_columns])
+        self._rescale_tree_thresholds(old_mean, old_scale)
+        X_scaled = self.scaler.transform(new_data[self.feature_columns])
+        
+        # Grow the forest, as long as the new rows cover the trained classes
+        print(f"Adding {n_estimators} trees per estimator from {len(new_data)} new rows...")
+        if set(np.unique(y_health)) == set(self.classifier.classes_):
+            self.classifier.set_params(warm_start=True, n_estimators=len(self.classifier.estimators_) + n_estimators)
+            self.classifier.fit(X_scaled, y_health)
+            self.classifier.set_params(warm_start=False)
+        else:
+            print("Skipping classifier update: new rows do not cover the trained classes")
+        
+        # Continue boosting every regression target on the new rows
+        for booster, target in zip(self.regressor.estimators_, self.regression_targets):
+            booster.set_params(warm_start=True, n_estimators=booster.estimators_.shape[0] + n_estimators)
+            booster.fit(X_scaled, new_data[target].to_numpy())
+            booster.set_params(warm_start=False)
+        
+        self.training_store.append(new_data)
+        self.compiled = CompiledHealthEnsemble.from_sklearn(self.classifier, self.regressor)
+        
+        fingerprint = self.training_fingerprint()
+        version = self.registry.save(
+            fingerprint,
+            {'scaler': self.scaler, 'imputer': self.imputer, 'classifier': self.classifier, 'regressor': self.regressor},
+            metadata={'incremental_update': {'new_samples': len(new_data), 'added_estimators': n_estimators}}
+        )
+        print(f"Registered incrementally updated models as version {version}")
+        return version
+
+    def _prepare_training_rows(self, data):
+        """Turn raw patient rows into feature + target columns for training"""
+        data = pd.DataFrame(data).copy()
+        
+        # Sources that only carry some markers (such as ingested patient records)
+        # get the others as NaN; those gaps take the training medians below
+        data = data.reindex(columns=list(dict.fromkeys([*data.columns, *self.base_features])))
+        
+        missing_features = [col for col in self.advanced_features if col not in data.columns]
+        if missing_features:
+            inputs = data.reindex(columns=list(dict.fromkeys([*data.columns, *self.advanced_inputs])))
+            advanced_features = self.calculate_advanced_features(inputs)
+            for key in missing_features:
+                data[key] = advanced_features[key]
+        
+        if self.imputer is not None:
+            data.fillna(dict(zip(self.feature_columns, self._default_features)), inplace=True)
+        
+        if any(target not in data.columns for target in self.regression_targets):
+            data = self.generate_target_variables(data)
+        
+        return data[self.feature_columns + self.regression_targets]
+
+    def _rescale_tree_thresholds(self, old_mean, old_scale):
+        """Re-express split thresholds learned under the old scaling in the current one"""
+        trees = [estimator.tree_ for estimator in self.classifier.estimators_]
+        for booster in self.regressor.estimators_:
+            trees.extend(stage.tree_ for stage in booster.estimators_[:, 0])
+        
+        for tree in trees:
+            split = tree.children_left != -1
+            features = tree.feature[split]
+            raw_threshold = tree.threshold[split] * old_scale[features] + old_mean[features]
+            # tree.threshold is a writable view onto the tree's node array
+            tree.threshold[split] = (raw_threshold - self.scaler.mean_[features]) / self.scaler.scale_[features]
+
     def generate_target_variables(self, data):
         """Generate target variables for the dataset"""
         if isinstance(data, dict):
@@ -247,144 +692,144 @@ class HealthAnalysisModel:
                 elif col == 'inflammation_index':
                     data[col] = 30  # Default low inflammation
         
-        # Calculate health scores
-        health_scores = []
-        metabolite_scores = []
-        comprehensive_scores = []
-        system_scores = []
-        
-        for _, row in data.iterrows():
-            # Calculate base health score
-            base_health = (
-                (100 - abs(row['glucose'] - 90) / 2) * 0.2 +
-                (100 - row['cholesterol'] / 200 * 100) * 0.2 +
-                (row['hdl'] / 60 * 100) * 0.2 +
-                (100 - row['bmi'] / 30 * 100) * 0.2 +
-                (100 - abs(row['total_protein'] - 7.0) * 20) * 0.2
-            ).clip(0, 100)
-            
-            # Add influence from advanced features
-            health_score = (
-                base_health * 0.6 +
-                (100 - row['cardiovascular_risk_index']) * 0.1 +
-                row['liver_health_index'] * 0.1 +
-                row['kidney_function_index'] * 0.1 +
-                row['metabolic_efficiency_score'] * 0.1
-            ).clip(0, 100)
-            
-            # Calculate metabolite score
-            metabolite_score = (
-                (100 - abs(row['glucose'] - 90)) * 0.2 +
-                (100 - row['cholesterol'] / 200 * 100) * 0.2 +
-                (row['hdl'] / 60 * 100) * 0.2 +
-                (100 - row['triglycerides'] / 150 * 100) * 0.2 +
-                (100 - abs(row['total_protein'] - 7.0) * 20) * 0.2
-            ).clip(0, 100)
-            
-            # Calculate comprehensive score
-            comprehensive_score = (
-                health_score * 0.4 +
-                metabolite_score * 0.3 +
-                row['metabolic_efficiency_score'] * 0.3
-            ).clip(0, 100)
-            
-            # Calculate system-specific scores
-            liver_score = row['liver_health_index']
-            kidney_score = row['kidney_function_index']
-            cardio_score = 100 - row['cardiovascular_risk_index']
-            endocrine_score = (
-                (100 - abs(row['glucose'] - 90)) * 0.4 +
-                row['metabolic_efficiency_score'] * 0.6
-            ).clip(0, 100)
-            immune_score = (
-                (100 - row['inflammation_index']) * 0.5 +
-                (row['total_protein'] / 7.0 * 100) * 0.5
-            ).clip(0, 100)
-            digestive_score = (
-                row['liver_health_index'] * 0.3 +
-                (100 - abs(row['total_protein'] - 7.0) * 20) * 0.4 +
-                (100 - row['inflammation_index']) * 0.3
-            ).clip(0, 100)
-            
-            health_scores.append(health_score)
-            metabolite_scores.append(metabolite_score)
-            comprehensive_scores.append(comprehensive_score)
-            system_scores.append([
-                liver_score, kidney_score, cardio_score,
-                endocrine_score, immune_score, digestive_score
-            ])
+        # Calculate all scores column-wise; the formulas are elementwise, so this
+        # yields the same numbers as scoring each row on its own
+        glucose = data['glucose'].to_numpy(dtype=np.float64)
+        cholesterol = data['cholesterol'].to_numpy(dtype=np.float64)
+        hdl = data['hdl'].to_numpy(dtype=np.float64)
+        bmi = data['bmi'].to_numpy(dtype=np.float64)
+        total_protein = data['total_protein'].to_numpy(dtype=np.float64)
+        triglycerides = data['triglycerides'].to_numpy(dtype=np.float64)
+        liver_health = data['liver_health_index'].to_numpy(dtype=np.float64)
+        kidney_function = data['kidney_function_index'].to_numpy(dtype=np.float64)
+        cardiovascular_risk = data['cardiovascular_risk_index'].to_numpy(dtype=np.float64)
+        metabolic_efficiency = data['metabolic_efficiency_score'].to_numpy(dtype=np.float64)
+        inflammation = data['inflammation_index'].to_numpy(dtype=np.float64)
+        
+        # Calculate base health score
+        base_health = np.clip(
+            (100 - np.abs(glucose - 90) / 2) * 0.2 +
+            (100 - cholesterol / 200 * 100) * 0.2 +
+            (hdl / 60 * 100) * 0.2 +
+            (100 - bmi / 30 * 100) * 0.2 +
+            (100 - np.abs(total_protein - 7.0) * 20) * 0.2,
+            0, 100
+        )
+        
+        # Add influence from advanced features
+        health_score = np.clip(
+            base_health * 0.6 +
+            (100 - cardiovascular_risk) * 0.1 +
+            liver_health * 0.1 +
+            kidney_function * 0.1 +
+            metabolic_efficiency * 0.1,
+            0, 100
+        )
+        
+        # Calculate metabolite score
+        metabolite_score = np.clip(
+            (100 - np.abs(glucose - 90)) * 0.2 +
+            (100 - cholesterol / 200 * 100) * 0.2 +
+            (hdl / 60 * 100) * 0.2 +
+            (100 - triglycerides / 150 * 100) * 0.2 +
+            (100 - np.abs(total_protein - 7.0) * 20) * 0.2,
+            0, 100
+        )
+        
+        # Calculate comprehensive score
+        comprehensive_score = np.clip(
+            health_score * 0.4 +
+            metabolite_score * 0.3 +
+            metabolic_efficiency * 0.3,
+            0, 100
+        )
         
         # Add scores to dataframe
-        data['health_score'] = health_scores
-        data['metabolite_score'] = metabolite_scores
-        data['comprehensive_score'] = comprehensive_scores
-        system_scores = np.array(system_scores)
-        data['liver_score'] = system_scores[:, 0]
-        data['kidney_score'] = system_scores[:, 1]
-        data['cardio_score'] = system_scores[:, 2]
-        data['endocrine_score'] = system_scores[:, 3]
-        data['immune_score'] = system_scores[:, 4]
-        data['digestive_score'] = system_scores[:, 5]
+        data['health_score'] = health_score
+        data['metabolite_score'] = metabolite_score
+        data['comprehensive_score'] = comprehensive_score
+        
+        # Calculate system-specific scores
+        data['liver_score'] = liver_health
+        data['kidney_score'] = kidney_function
+        data['cardio_score'] = 100 - cardiovascular_risk
+        data['endocrine_score'] = np.clip(
+            (100 - np.abs(glucose - 90)) * 0.4 +
+            metabolic_efficiency * 0.6,
+            0, 100
+        )
+        data['immune_score'] = np.clip(
+            (100 - inflammation) * 0.5 +
+            (total_protein / 7.0 * 100) * 0.5,
+            0, 100
+        )
+        data['digestive_score'] = np.clip(
+            liver_health * 0.3 +
+            (100 - np.abs(total_protein - 7.0) * 20) * 0.4 +
+            (100 - inflammation) * 0.3,
+            0, 100
+        )
         
         return data
 
-    def generate_synthetic_data(self, n_samples=1000):
+    def generate_synthetic_data(self, n_samples=1000, random_state=42):
         """Generate synthetic but realistic medical data"""
-        np.random.seed(42)
+        # Same stream as the former global np.random.seed(42), without touching global state
+        rng = np.random.RandomState(random_state)
         data = {}
         
         # Generate age (18-90 years)
-        data['age'] = np.random.normal(45, 15, n_samples).clip(18, 90)
+        data['age'] = rng.normal(45, 15, n_samples).clip(18, 90)
         
         # Generate gender (0: Female, 1: Male)
-        data['gender_encoded'] = np.random.binomial(1, 0.5, n_samples)
+        data['gender_encoded'] = rng.binomial(1, 0.5, n_samples)
         
         # Generate BMI (18.5-35)
-        data['bmi'] = np.random.normal(25, 4, n_samples).clip(18.5, 35)
+        data['bmi'] = rng.normal(25, 4, n_samples).clip(18.5, 35)
         
         # Generate glucose levels (70-200 mg/dL)
-        data['glucose'] = np.random.normal(100, 25, n_samples).clip(70, 200)
+        data['glucose'] = rng.normal(100, 25, n_samples).clip(70, 200)
         
         # Generate cholesterol (150-300 mg/dL)
-        data['cholesterol'] = np.random.normal(200, 30, n_samples).clip(150, 300)
+        data['cholesterol'] = rng.normal(200, 30, n_samples).clip(150, 300)
         
         # Generate triglycerides (50-300 mg/dL)
-        data['triglycerides'] = np.random.normal(150, 50, n_samples).clip(50, 300)
+        data['triglycerides'] = rng.normal(150, 50, n_samples).clip(50, 300)
         
         # Generate HDL (30-90 mg/dL)
-        data['hdl'] = np.random.normal(50, 10, n_samples).clip(30, 90)
+        data['hdl'] = rng.normal(50, 10, n_samples).clip(30, 90)
         
         # Generate LDL (70-200 mg/dL)
-        data['ldl'] = np.random.normal(130, 25, n_samples).clip(70, 200)
+        data['ldl'] = rng.normal(130, 25, n_samples).clip(70, 200)
         
         # Generate liver function tests
-        data['alt'] = np.random.normal(30, 10, n_samples).clip(10, 100)
-        data['ast'] = np.random.normal(25, 8, n_samples).clip(10, 80)
+        data['alt'] = rng.normal(30, 10, n_samples).clip(10, 100)
+        data['ast'] = rng.normal(25, 8, n_samples).clip(10, 80)
         
         # Generate kidney function tests
-        data['creatinine'] = np.random.normal(1.0, 0.3, n_samples).clip(0.5, 2.0)
-        data['bun'] = np.random.normal(15, 5, n_samples).clip(7, 30)
+        data['creatinine'] = rng.normal(1.0, 0.3, n_samples).clip(0.5, 2.0)
+        data['bun'] = rng.normal(15, 5, n_samples).clip(7, 30)
         
         # Generate electrolytes
-        data['sodium'] = np.random.normal(140, 3, n_samples).clip(135, 145)
-        data['potassium'] = np.random.normal(4.0, 0.4, n_samples).clip(3.5, 5.0)
-        data['chloride'] = np.random.normal(102, 3, n_samples).clip(96, 106)
-        data['bicarbonate'] = np.random.normal(24, 2, n_samples).clip(22, 29)
+        data['sodium'] = rng.normal(140, 3, n_samples).clip(135, 145)
+        data['potassium'] = rng.normal(4.0, 0.4, n_samples).clip(3.5, 5.0)
+        data['chloride'] = rng.normal(102, 3, n_samples).clip(96, 106)
+        data['bicarbonate'] = rng.normal(24, 2, n_samples).clip(22, 29)
         
         # Generate minerals
-        data['calcium'] = np.random.normal(9.5, 0.5, n_samples).clip(8.5, 10.5)
-        data['magnesium'] = np.random.normal(2.0, 0.3, n_samples).clip(1.7, 2.4)
-        data['phosphate'] = np.random.normal(3.5, 0.5, n_samples).clip(2.5, 4.5)
+        data['calcium'] = rng.normal(9.5, 0.5, n_samples).clip(8.5, 10.5)
+        data['magnesium'] = rng.normal(2.0, 0.3, n_samples).clip(1.7, 2.4)
+        data['phosphate'] = rng.normal(3.5, 0.5, n_samples).clip(2.5, 4.5)
         
         # Generate proteins
-        data['protein'] = np.random.normal(7.0, 0.5, n_samples).clip(6.0, 8.0)
-        data['albumin'] = np.random.normal(4.3, 0.3, n_samples).clip(3.5, 5.0)
-        data['globulin'] = np.random.normal(2.7, 0.3, n_samples).clip(2.0, 3.5)
+        data['protein'] = rng.normal(7.0, 0.5, n_samples).clip(6.0, 8.0)
+        data['albumin'] = rng.normal(4.3, 0.3, n_samples).clip(3.5, 5.0)
+        data['globulin'] = rng.normal(2.7, 0.3, n_samples).clip(2.0, 3.5)
         data['a_g_ratio'] = data['albumin'] / data['globulin']
         
         # Generate other liver function tests
-        data['bilirubin'] = np.random.normal(0.8, 0.3, n_samples).clip(0.3, 1.5)
-        data['alkaline_phosphatase'] = np.random.normal(80, 20, n_samples).clip(40, 120)
+        data['bilirubin'] = rng.normal(0.8, 0.3, n_samples).clip(0.3, 1.5)
+        data['alkaline_phosphatase'] = rng.normal(80, 20, n_samples).clip(40, 120)
         
         # Generate health scores based on the biomarkers
         df = pd.DataFrame(data)
@@ -570,60 +1015,36 @@ class HealthAnalysisModel:
         return features
 
     def calculate_system_scores(self, data):
-        """Calculate health scores for different body systems."""
-        scores = {}
-        
-        for system, markers in self.system_scores.items():
-            # Calculate weighted average of markers
-            weights = {
-                'liver': {'alt': 0.3, 'ast': 0.3, 'bilirubin': 0.2, 'alkaline_phosphatase': 0.2},
-                'kidney': {'creatinine': 0.3, 'bun': 0.2, 'sodium': 0.2, 'potassium': 0.15, 'chloride': 0.15},
-                'cardio': {'cholesterol': 0.25, 'triglycerides': 0.25, 'hdl': 0.2, 'ldl': 0.2, 'glucose': 0.1},
-                'endocrine': {'glucose': 0.4, 'calcium': 0.2, 'magnesium': 0.2, 'phosphate': 0.2},
-                'immune': {'total_protein': 0.3, 'albumin': 0.3, 'globulin': 0.2, 'ag_ratio': 0.2},
-                'digestive': {'albumin': 0.3, 'total_protein': 0.3, 'bilirubin': 0.2, 'alkaline_phosphatase': 0.2}
-            }
-            
-            score = 0
-            for marker in markers:
-                if marker in data and marker in weights[system]:
-                    normalized_value = self.normalize_marker(marker, data[marker])
-                    score += normalized_value * weights[system][marker]
-            
-            scores[system] = score * 100
+        """Calculate health scores for different body systems.
+
+        Each score is the weighted sum of the system's markers, normalized
+        to their reference ranges, times 100; markers that are not provided
+        add nothing. ``data`` is one patient (a dict or Series), giving a
+        dict of scores, or a DataFrame with one row per patient, giving a
+        DataFrame with one column per system.
+        """
+        if isinstance(data, pd.DataFrame):
+            values = np.column_stack([
+                data[marker].to_numpy(dtype=np.float64) if marker in data else np.full(len(data), np.nan)
+                for marker in self._score_markers
+            ])
+            scores = self._score_systems(values)
+            return pd.DataFrame(scores, index=data.index, columns=self._system_names)
         
-        return scores
+        values = np.array([[data[marker] if marker in data else np.nan for marker in self._score_markers]], dtype=np.float64)
+        return dict(zip(self._system_names, self._score_systems(values)[0]))
+
+    def _score_systems(self, values):
+        """System scores for a (patients x score markers) array, one matrix product for all rows"""
+        normalized = np.clip((values - self._marker_low) / self._marker_span, 0, 1)
+        normalized = np.nan_to_num(normalized, nan=0.0)
+        return normalized @ self._system_weights.T * 100
 
     def normalize_marker(self, marker, value):
-        """Normalize a biomarker value to a 0-1 scale based on reference ranges."""
-        reference_ranges = {
-            'glucose': (70, 100),
-            'cholesterol': (125, 200),
-            'triglycerides': (0, 150),
-            'hdl': (40, 60),
-            'ldl': (0, 100),
-            'alt': (7, 56),
-            'ast': (10, 40),
-            'bilirubin': (0.3, 1.2),
-            'alkaline_phosphatase': (44, 147),
-            'creatinine': (0.6, 1.2),
-            'bun': (7, 20),
-            'sodium': (135, 145),
-            'potassium': (3.5, 5.0),
-            'chloride': (96, 106),
-            'bicarbonate': (23, 29),
-            'calcium': (8.5, 10.5),
-            'magnesium': (1.7, 2.3),
-            'phosphate': (2.5, 4.5),
-            'total_protein': (6.0, 8.0),
-            'albumin': (3.5, 5.0),
-            'globulin': (2.0, 3.5),
-            'ag_ratio': (1.1, 2.5)
-        }
-        
-        if marker in reference_ranges:
-            min_val, max_val = reference_ranges[marker]
-            return max(0, min(1, (value - min_val) / (max_val - min_val)))
+        """Normalize a biomarker value (or array of values) to a 0-1 scale based on reference ranges."""
+        if marker in MARKER_REFERENCE_RANGES:
+            min_val, max_val = MARKER_REFERENCE_RANGES[marker]
+            return np.clip((np.asarray(value, dtype=np.float64) - min_val) / (max_val - min_val), 0, 1)
         return 0.5  # Default to middle value if no reference range
 
     def analyze_health(self, data):
@@ -634,6 +1055,31 @@ class HealthAnalysisModel:
         # Calculate system scores
         system_scores = self.calculate_system_scores(data)
         
+        # Calculate base, comprehensive and metabolite scores
+        base_health, metabolite_score, comprehensive_score = self._overall_scores(
+            data,
+            np.mean(list(advanced_features.values())),
+            np.mean(list(system_scores.values()))
+        )
+        
+        # Generate health insights
+        insights = self.generate_health_insights(data, advanced_features, system_scores)
+        
+        # Generate recommendations
+        recommendations = self.generate_recommendations(data, advanced_features, system_scores)
+        
+        return {
+            'healthScore': base_health,
+            'metaboliteScore': metabolite_score,
+            'comprehensiveScore': comprehensive_score,
+            'advancedFeatures': advanced_features,
+            'systemScores': system_scores,
+            'insights': insights,
+            'recommendations': recommendations
+        }
+
+    def _overall_scores(self, data, advanced_mean, system_mean):
+        """Base health, metabolite and comprehensive scores, for one patient or columns of many"""
         # Calculate base health score
         base_health = (
             (100 - abs(data['glucose'] - 90) / 2) * 0.2 +
@@ -646,8 +1092,8 @@ class HealthAnalysisModel:
         # Calculate comprehensive score
         comprehensive_score = (
             base_health * 0.3 +
-            np.mean(list(advanced_features.values())) * 0.4 +
-            np.mean(list(system_scores.values())) * 0.3
+            advanced_mean * 0.4 +
+            system_mean * 0.3
         ).clip(0, 100)
         
         # Calculate metabolite score
@@ -658,67 +1104,68 @@ class HealthAnalysisModel:
             (100 - data['triglycerides'] / 150 * 100) * 0.25
         ).clip(0, 100)
         
-        # Generate health insights
-        insights = self.generate_health_insights(data, advanced_features, system_scores)
+        return base_health, metabolite_score, comprehensive_score
+
+    def analyze_cohort(self, data):
+        """Perform the ``analyze_health`` analysis for every patient in a DataFrame.
+
+        Everything is computed on whole columns, with no per-patient loop.
+        Returns a dict of DataFrames indexed like ``data``:
+
+        - ``scores``: ``healthScore``, ``metaboliteScore`` and
+          ``comprehensiveScore``, every advanced feature and one column per
+          body system.
+        - ``insights``: one boolean column per insight, True for the patients
+          it applies to.
+        - ``recommendations``: one boolean column per (category,
+          recommendation) pair.
+        """
+        advanced_features = pd.DataFrame(self.calculate_advanced_features(data), index=data.index)
+        system_scores = self.calculate_system_scores(data)
         
-        # Generate recommendations
-        recommendations = self.generate_recommendations(data, advanced_features, system_scores)
+        base_health, metabolite_score, comprehensive_score = self._overall_scores(
+            data,
+            advanced_features.to_numpy(dtype=np.float64).mean(axis=1),
+            system_scores.to_numpy().mean(axis=1)
+        )
+        scores = pd.concat([
+            pd.DataFrame({
+                'healthScore': base_health,
+                'metaboliteScore': metabolite_score,
+                'comprehensiveScore': comprehensive_score
+            }, index=data.index),
+            advanced_features,
+            system_scores
+        ], axis=1)
+        
+        insights = {}
+        for feature, compare, threshold, insight, moderate_threshold, moderate_insight in HEALTH_INSIGHT_RULES:
+            values = advanced_features[feature].to_numpy()
+            matched = compare(values, threshold)
+            insights[insight] = matched
+            insights[moderate_insight] = compare(values, moderate_threshold) & ~matched
+        
+        recommendations = {}
+        for category, feature, compare, threshold, texts in RECOMMENDATION_RULES:
+            matched = compare(advanced_features[feature].to_numpy(), threshold)
+            for text in texts:
+                recommendations[(category, text)] = matched
         
         return {
-            'healthScore': base_health,
-            'metaboliteScore': metabolite_score,
-            'comprehensiveScore': comprehensive_score,
-            'advancedFeatures': advanced_features,
-            'systemScores': system_scores,
-            'insights': insights,
-            'recommendations': recommendations
+            'scores': scores,
+            'insights': pd.DataFrame(insights, index=data.index),
+            'recommendations': pd.DataFrame(recommendations, index=data.index)
         }
 
     def generate_health_insights(self, data, advanced_features, system_scores):
         """Generate detailed health insights based on analysis."""
         insights = []
         
-        # Analyze metabolic health
-        if advanced_features['metabolic_syndrome_score'] > 50:
-            insights.append("High risk of metabolic syndrome detected")
-        elif advanced_features['metabolic_syndrome_score'] > 25:
-            insights.append("Moderate risk of metabolic syndrome")
-        
-        # Analyze cardiovascular health
-        if advanced_features['cardiovascular_risk_index'] > 70:
-            insights.append("High cardiovascular risk detected")
-        elif advanced_features['cardiovascular_risk_index'] > 50:
-            insights.append("Moderate cardiovascular risk")
-        
-        # Analyze liver health
-        if advanced_features['liver_health_index'] < 30:
-            insights.append("Significant liver function impairment")
-        elif advanced_features['liver_health_index'] < 50:
-            insights.append("Mild liver function impairment")
-        
-        # Analyze kidney health
-        if advanced_features['kidney_function_index'] < 30:
-            insights.append("Significant kidney function impairment")
-        elif advanced_features['kidney_function_index'] < 50:
-            insights.append("Mild kidney function impairment")
-        
-        # Analyze immune system
-        if advanced_features['immune_system_score'] < 30:
-            insights.append("Weakened immune system detected")
-        elif advanced_features['immune_system_score'] < 50:
-            insights.append("Moderate immune system function")
-        
-        # Analyze endocrine balance
-        if advanced_features['hormone_balance_index'] < 30:
-            insights.append("Significant hormonal imbalance detected")
-        elif advanced_features['hormone_balance_index'] < 50:
-            insights.append("Mild hormonal imbalance")
-        
-        # Analyze oxidative stress
-        if advanced_features['oxidative_stress_score'] > 70:
-            insights.append("High oxidative stress levels detected")
-        elif advanced_features['oxidative_stress_score'] > 50:
-            insights.append("Moderate oxidative stress levels")
+        for feature, compare, threshold, insight, moderate_threshold, moderate_insight in HEALTH_INSIGHT_RULES:
+            if compare(advanced_features[feature], threshold):
+                insights.append(insight)
+            elif compare(advanced_features[feature], moderate_threshold):
+                insights.append(moderate_insight)
         
         return insights
 
@@ -731,60 +1178,30 @@ class HealthAnalysisModel:
             'monitoring': []
         }
         
-        # Lifestyle recommendations based on scores
-        if advanced_features['metabolic_syndrome_score'] > 25:
-            recommendations['lifestyle'].append("Increase physical activity to at least 150 minutes per week")
-            recommendations['lifestyle'].append("Implement stress management techniques")
-        
-        if advanced_features['cardiovascular_risk_index'] > 50:
-            recommendations['lifestyle'].append("Regular cardiovascular exercise")
-            recommendations['lifestyle'].append("Monitor blood pressure regularly")
-        
-        # Dietary recommendations
-        if advanced_features['metabolic_efficiency_score'] < 50:
-            recommendations['diet'].append("Reduce refined carbohydrate intake")
-            recommendations['diet'].append("Increase fiber-rich foods")
-        
-        if advanced_features['liver_health_index'] < 50:
-            recommendations['diet'].append("Reduce alcohol consumption")
-            recommendations['diet'].append("Increase antioxidant-rich foods")
-        
-        # Supplement recommendations
-        if advanced_features['oxidative_stress_score'] > 50:
-            recommendations['supplements'].append("Consider antioxidant supplements")
-            recommendations['supplements'].append("Vitamin C and E supplementation")
-        
-        if advanced_features['bone_health_index'] < 50:
-            recommendations['supplements'].append("Calcium and Vitamin D supplementation")
-            recommendations['supplements'].append("Magnesium supplementation")
-        
-        # Monitoring recommendations
-        if advanced_features['kidney_function_index'] < 50:
-            recommendations['monitoring'].append("Regular kidney function tests")
-            recommendations['monitoring'].append("Monitor fluid intake")
-        
-        if advanced_features['endocrine_balance_score'] < 50:
-            recommendations['monitoring'].append("Regular hormone level checks")
-            recommendations['monitoring'].append("Monitor blood sugar levels")
+        for category, feature, compare, threshold, texts in RECOMMENDATION_RULES:
+            if compare(advanced_features[feature], threshold):
+                recommendations[category].extend(texts)
         
         return recommendations
 
     def predict(self, patient_data):
         """Make predictions for a single patient"""
-        # Prepare input data
-        input_data = pd.DataFrame([patient_data])
-        
-        # Ensure all required features are present
-        for col in self.feature_columns:
-            if col not in input_data.columns:
-                input_data[col] = 0  # Use default value
-        
-        # Scale features
-        input_scaled = self.scaler.transform(input_data[self.feature_columns])
+        # Map the patient straight onto a feature vector (no DataFrame for one row)
+        features = self._default_features.copy()
+        for key, value in patient_data.items():
+            index = self._feature_index.get(key)
+            if index is not None:
+                features[index] = value
+        missing = np.isnan(features)
+        if missing.any():
+            features[missing] = self._default_features[missing]
+        
+        # Scale features inline and predict on a 1 x n_features view
+        input_scaled = ((features - self.scaler.mean_) / self.scaler.scale_).reshape(1, -1)
         
         # Make predictions
-        health_risk = self.classifier.predict(input_scaled)[0]
-        scores = self.regressor.predict(input_scaled)[0]
+        health_risk, scores = self._predict_scaled(input_scaled)
+        health_risk, scores = health_risk[0], scores[0]
         
         # Prepare results
         results = {
@@ -804,108 +1221,155 @@ class HealthAnalysisModel:
         
         return results
 
+    def predict_many(self, patients, chunk_size=50000):
+        """Make predictions for many patients at once.
+
+        ``patients`` can be a DataFrame, a structured NumPy array, an iterable of
+        DataFrames (such as ``patient_dataset.iter_patient_batches``) or an
+        iterable of patient dicts. Each chunk gets one scaling pass and one predict call per
+        estimator. Returns a DataFrame with a ``health_risk`` column followed by
+        one column per regression target, in input order.
+        """
+        results = [self._predict_frame(chunk) for chunk in self._iter_chunks(patients, chunk_size)]
+        if not results:
+            return pd.DataFrame(columns=['health_risk'] + self.regression_targets)
+        return pd.concat(results, ignore_index=True)
+
+    def _iter_chunks(self, patients, chunk_size):
+        """Yield DataFrame chunks of at most ``chunk_size`` patients"""
+        if isinstance(patients, pd.DataFrame):
+            for start in range(0, len(patients), chunk_size):
+                yield patients.iloc[start:start + chunk_size]
+        elif isinstance(patients, np.ndarray):
+            if patients.dtype.names is None:
+                raise ValueError("predict_many expects a structured array with named fields")
+            for start in range(0, len(patients), chunk_size):
+                yield pd.DataFrame(patients[start:start + chunk_size])
+        else:
+            iterator = iter(patients)
+            first = next(iterator, None)
+            if first is None:
+                return
+            if isinstance(first, pd.DataFrame):
+                for frame in chain([first], iterator):
+                    yield from self._iter_chunks(frame, chunk_size)
+                return
+            iterator = chain([first], iterator)
+            while True:
+                records = list(islice(iterator, chunk_size))
+                if not records:
+                    break
+                yield pd.DataFrame.from_records(records)
+
+    def _predict_frame(self, frame):
+        """Score one chunk of patients"""
+        X_scaled = (self._feature_matrix(frame) - self.scaler.mean_) / self.scaler.scale_
+
+        health_risk, scores = self._predict_scaled(X_scaled)
+        results = pd.DataFrame(scores, columns=self.regression_targets)
+        results.insert(0, 'health_risk', health_risk.astype(bool))
+        return results
+
+    def _feature_matrix(self, frame):
+        """Model input rows for ``frame``; missing features get the same defaults as in predict()"""
+        X = frame.reindex(columns=self.feature_columns).to_numpy(dtype=np.float64)
+        missing = np.isnan(X)
+        if missing.any():
+            X[missing] = np.broadcast_to(self._default_features, X.shape)[missing]
+        return X
+
+    def _predict_scaled(self, X_scaled):
+        """Return (health_risk labels, regression scores) for scaled feature rows"""
+        if self.compiled is not None and (len(X_scaled) <= self.COMPILED_BATCH_ROWS or self.classifier is None):
+            # One traversal over every tree, no per-estimator sklearn dispatch
+            return self.compiled.predict(X_scaled)
+        return self.classifier.predict(X_scaled), self.regressor.predict(X_scaled)
+
     def predict_future_trends(self, current_data, prediction_weeks=12):
         """Predict future health trends based on current data"""
         try:
-            # Prepare input data
-            input_data = pd.DataFrame([current_data])
-            input_data = self.calculate_advanced_features(input_data)
-            
-            # Scale features
-            input_scaled = self.scaler.transform(input_data[self.feature_columns])
+            trends = self.simulate_trends(pd.DataFrame([current_data]), prediction_weeks)
             
-            # Get base predictions
-            base_predictions = self.regressor.predict(input_scaled)[0]
-            
-            # Generate time series predictions
             future_trends = {
-                'health_score': [],
-                'metabolite_score': [],
-                'risk_level': [],
-                'biomarker_predictions': {}
+                key: np.round(trends[key][0], 1).tolist()
+                for key in ('health_score', 'metabolite_score', 'risk_level')
+            }
+            future_trends['biomarker_predictions'] = {
+                biomarker: np.round(trends['biomarkers'][0, :, i], 1).tolist()
+                for i, biomarker in enumerate(TREND_BIOMARKERS) if biomarker in current_data
             }
-            
-            # Simulate weekly changes based on current health indicators
-            base_health = base_predictions[0]  # health_score
-            base_metabolite = base_predictions[1]  # metabolite_score
-            
-            for week in range(prediction_weeks):
-                # Calculate predicted changes based on current metrics
-                health_change = self._calculate_weekly_change(base_health, input_data)
-                metabolite_change = self._calculate_weekly_change(base_metabolite, input_data)
-                
-                # Update predictions
-                base_health = max(0, min(100, base_health + health_change))
-                base_metabolite = max(0, min(100, base_metabolite + metabolite_change))
-                
-                # Store predictions
-                future_trends['health_score'].append(round(base_health, 1))
-                future_trends['metabolite_score'].append(round(base_metabolite, 1))
-                future_trends['risk_level'].append(
-                    round(100 - ((base_health + base_metabolite) / 2), 1)
-                )
-            
-            # Predict key biomarker trends
-            biomarkers = ['glucose', 'cholesterol', 'triglycerides', 'hdl', 'ldl']
-            for biomarker in biomarkers:
-                if biomarker in input_data.columns:
-                    base_value = input_data[biomarker].iloc[0]
-                    future_trends['biomarker_predictions'][biomarker] = [
-                        round(self._predict_biomarker_change(base_value, week, input_data), 1)
-                        for week in range(prediction_weeks)
-                    ]
-            
             return future_trends
             
         except Exception as e:
             print(f"Error in future trend prediction: {str(e)}")
             return None
 
-    def _calculate_weekly_change(self, base_value, patient_data):
-        """Calculate predicted weekly changes based on health indicators"""
-        # Implement sophisticated change calculation based on multiple factors
-        metabolic_factor = (patient_data['metabolic_efficiency_score'].iloc[0] - 50) / 100
-        risk_factor = (patient_data['cardiovascular_risk_index'].iloc[0] - 50) / 100
-        health_factor = (patient_data['liver_health_index'].iloc[0] + 
-                        patient_data['kidney_function_index'].iloc[0]) / 200
-        
-        # Calculate change with dampening factor
-        max_weekly_change = 2.0  # Maximum 2% change per week
-        change = (metabolic_factor + health_factor - risk_factor) * max_weekly_change
-        
-        # Add small random variation
-        noise = np.random.normal(0, 0.2)
-        
-        return change + noise
-
-    def _predict_biomarker_change(self, base_value, week, patient_data):
-        """Predict changes in biomarker values over time"""
-        # Calculate change factors based on patient metrics
-        metabolic_health = patient_data['metabolic_efficiency_score'].iloc[0] / 100
-        risk_level = patient_data['cardiovascular_risk_index'].iloc[0] / 100
-        
-        # Calculate target value based on normal ranges
-        if 'glucose' in patient_data.columns:
-            target = 90  # Ideal glucose level
-        elif 'cholesterol' in patient_data.columns:
-            target = 170  # Ideal cholesterol level
-        else:
-            target = base_value
-        
-        # Calculate weekly progression
-        max_change = abs(target - base_value) * 0.1  # Maximum 10% movement toward target per week
-        direction = 1 if target > base_value else -1
-        
-        change = max_change * (metabolic_health - risk_level) * direction
-        
-        # Add decay factor over time
-        decay = np.exp(-0.1 * week)
-        change *= decay
-        
-        # Add small random variation
-        noise = np.random.normal(0, base_value * 0.01)  # 1% random variation
+    def simulate_trends(self, patients, prediction_weeks=12, random_state=None):
+        """Simulate weekly health trends for many patients at once.
+
+        ``patients`` is a DataFrame of patient markers; missing features get
+        the same defaults as in ``predict_many``. Returns a dict of arrays:
+        ``health_score``, ``metabolite_score`` and ``risk_level`` of shape
+        (patients, weeks) and ``biomarkers`` of shape (patients, weeks,
+        len(TREND_BIOMARKERS)). Patient ``i`` draws its noise from its own
+        generator, the ``i``-th child of ``SeedSequence(random_state)``, so a
+        patient's trajectory does not depend on the rest of the batch.
+        """
+        patients = pd.DataFrame(patients)
+        missing_features = [col for col in self.advanced_features if col not in patients.columns]
+        if missing_features:
+            inputs = patients.reindex(columns=list(dict.fromkeys([*patients.columns, *self.base_features, *self.advanced_inputs])))
+            advanced_features = self.calculate_advanced_features(inputs)
+            patients = patients.assign(**{key: advanced_features[key] for key in missing_features})
+        X = self._feature_matrix(patients)
+        n_patients, n_weeks, n_markers = len(X), prediction_weeks, len(TREND_BIOMARKERS)
+        
+        # Standard normal noise per patient: two score rows, then one row per biomarker
+        seeds = np.random.SeedSequence(random_state).spawn(n_patients)
+        noise = np.empty((n_patients, 2 + n_markers, n_weeks))
+        for i, seed in enumerate(seeds):
+            noise[i] = np.random.default_rng(seed).standard_normal((2 + n_markers, n_weeks))
+        
+        def feature(name):
+            return X[:, self._feature_index[name]]
+        
+        # Scores drift by the same amount every week, driven by the current indices
+        metabolic_factor = (feature('metabolic_efficiency_score') - 50) / 100
+        risk_factor = (feature('cardiovascular_risk_index') - 50) / 100
+        health_factor = (feature('liver_health_index') + feature('kidney_function_index')) / 200
+        drift = (metabolic_factor + health_factor - risk_factor) * TREND_MAX_WEEKLY_CHANGE
+        
+        scores = self._predict_scaled((X - self.scaler.mean_) / self.scaler.scale_)[1]
+        health = np.empty((n_patients, n_weeks))
+        metabolite = np.empty((n_patients, n_weeks))
+        current_health, current_metabolite = scores[:, 0], scores[:, 1]
+        for week in range(n_weeks):
+            # Clipped every week, so a score resting at 0 or 100 can move straight back
+            current_health = np.clip(current_health + drift + TREND_SCORE_NOISE * noise[:, 0, week], 0, 100)
+            current_metabolite = np.clip(current_metabolite + drift + TREND_SCORE_NOISE * noise[:, 1, week], 0, 100)
+            health[:, week] = current_health
+            metabolite[:, week] = current_metabolite
+        
+        # Biomarkers move up to 10% of the way to their target, scaled by metabolic
+        # health against cardiovascular risk and decaying over time, plus 1% noise
+        base = np.stack([feature(marker) for marker in TREND_BIOMARKERS], axis=1)
+        targets = np.array([TREND_BIOMARKER_TARGETS.get(marker, np.nan) for marker in TREND_BIOMARKERS])
+        targets = np.where(np.isnan(targets), base, targets)
+        pull = (feature('metabolic_efficiency_score') - feature('cardiovascular_risk_index')) / 100
+        step = 0.1 * (targets - base) * pull[:, None]
+        decay = np.exp(-0.1 * np.arange(n_weeks))
+        biomarkers = (
+            base[:, None, :]
+            + step[:, None, :] * decay[None, :, None]
+            + 0.01 * base[:, None, :] * noise[:, 2:, :].transpose(0, 2, 1)
+        )
         
-        return base_value + (change + noise)
+        return {
+            'health_score': health,
+            'metabolite_score': metabolite,
+            'risk_level': 100 - (health + metabolite) / 2,
+            'biomarkers': biomarkers
+        }
 
     def get_feature_importance(self):
         """Get feature importance from both classifier and regressor"""
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+import joblib
+import sklearn
+
+from flat_trees import export_flat_models, load_flat_models
+
+
+class ModelRegistry:
+    """Versioned on-disk store for the fitted scaler, imputer, classifier and regressor.
+
+    Artifacts are written next to a ``registry.json`` manifest that records the
+    fingerprint of the feature schema, training configuration and training
+    data they were built from. ``load`` only hands back artifacts whose
+    fingerprint matches, so a schema, config or data change forces a retrain
+    instead of serving stale models.
+
+    Each version also gets a flat, memory-mappable copy of its tree ensembles
+    under ``flat/v<version>`` (see ``flat_trees``) for the shared loading mode.
+    """
+
+    MANIFEST_NAME = 'registry.json'
+    FLAT_DIR = 'flat'
+
+    ARTIFACTS = {
+        'scaler': 'scaler.joblib',
+        'imputer': 'feature_imputer.joblib',
+        'classifier': 'health_classifier.joblib',
+        'regressor': 'health_regressor.joblib'
+    }
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.manifest_path = os.path.join(model_path, self.MANIFEST_NAME)
+        os.makedirs(model_path, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(feature_columns, regression_targets, training_config):
+        """Hash everything that changes what a trained model means."""
+        payload = {
+            'feature_columns': list(feature_columns),
+            'regression_targets': list(regression_targets),
+            'training_config': training_config,
+            'sklearn_version': sklearn.__version__
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def load_manifest(self):
+        """Return the current manifest, or None if nothing has been registered."""
+        if not os.path.exists(self.manifest_path):
+            return None
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Unreadable model registry manifest: {str(e)}")
+            return None
+
+    @property
+    def version(self):
+        manifest = self.load_manifest()
+        return manifest['version'] if manifest else 0
+
+    def flat_path(self, version):
+        return os.path.join(self.model_path, self.FLAT_DIR, f'v{version}')
+
+    def load(self, fingerprint, mmap_mode=None):
+        """Load the registered artifacts if they were trained for ``fingerprint``.
+
+        With ``mmap_mode`` set, the classifier and regressor are not unpickled;
+        instead ``artifacts['compiled']`` is their flat ``CompiledHealthEnsemble``
+        with memory-mapped node arrays, so worker processes share one physical
+        copy of the trees.
+        """
+        manifest = self.load_manifest()
+        if manifest is None:
+            print("No registered models found")
+            return None
+
+        if manifest.get('fingerprint') != fingerprint:
+            print(f"Registered models (version {manifest.get('version')}) do not match the current feature schema/training config/training data")
+            return None
+
+        artifacts = {}
+        try:
+            if mmap_mode is not None:
+                flat_path = self.flat_path(manifest['version'])
+                if not os.path.isdir(flat_path):
+                    print(f"Exporting flat models for version {manifest['version']}...")
+                    export_flat_models(
+                        joblib.load(os.path.join(self.model_path, manifest['artifacts']['classifier'])),
+                        joblib.load(os.path.join(self.model_path, manifest['artifacts']['regressor'])),
+                        flat_path
+                    )
+                artifacts['compiled'] = load_flat_models(flat_path, mmap_mode=mmap_mode)
+
+            for name, filename in manifest['artifacts'].items():
+                if mmap_mode is not None and name in ('classifier', 'regressor'):
+                    continue
+                artifacts[name] = joblib.load(os.path.join(self.model_path, filename))
+        except Exception as e:
+            print(f"Error loading registered models: {str(e)}")
+            return None
+
+        return artifacts
+
+    def save(self, fingerprint, artifacts, metadata=None):
+        """Persist ``artifacts`` as the next registry version and return it."""
+        previous = self.load_manifest() or {}
+        version = previous.get('version', 0) + 1
+
+        for name, obj in artifacts.items():
+            filename = self.ARTIFACTS.get(name, f'{name}.joblib')
+            path = os.path.join(self.model_path, filename)
+            tmp_path = f'{path}.tmp'
+            joblib.dump(obj, tmp_path)
+            os.replace(tmp_path, path)
+
+        manifest = {
+            'version': version,
+            'fingerprint': fingerprint,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'sklearn_version': sklearn.__version__,
+            'artifacts': {name: self.ARTIFACTS.get(name, f'{name}.joblib') for name in artifacts},
+            'metadata': metadata or {},
+            'history': previous.get('history', []) + [{
+                'version': version,
+                'fingerprint': fingerprint,
+                'created_at': datetime.now().isoformat(timespec='seconds')
+            }]
+        }
+
+        if 'classifier' in artifacts and 'regressor' in artifacts:
+            export_flat_models(artifacts['classifier'], artifacts['regressor'], self.flat_path(version))
+
+        tmp_manifest = f'{self.manifest_path}.tmp'
+        with open(tmp_manifest, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_manifest, self.manifest_path)
+
+        self._prune_flat_versions(keep=version)
+        return version
+
+    def _prune_flat_versions(self, keep):
+        """Remove flat exports of superseded versions.
+
+        Workers that still have the old files mapped keep working: unlinking a
+        file does not invalidate existing mappings.
+        """
+        flat_root = os.path.join(self.model_path, self.FLAT_DIR)
+        if not os.path.isdir(flat_root):
+            return
+        for entry in os.listdir(flat_root):
+            if entry != f'v{keep}':
+                shutil.rmtree(os.path.join(flat_root, entry), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect or rebuild the registered health models")
+    parser.add_argument('--retrain', action='store_true', help="Retrain and register a new model version")
+    parser.add_argument('--update', metavar='CSV', help="Incrementally update the models with new patient rows")
+    parser.add_argument('--train-store', metavar='DIR', help="Train and register models from a columnar training store")
+    parser.add_argument('--rows', type=int, help="With --train-store, first generate this many synthetic rows into DIR")
+    parser.add_argument('--patient-json', metavar='JSON', help="With --train-store, also ingest this JSON array of patient records into DIR")
+    args = parser.parse_args()
+
+    if args.retrain:
+        from ml_model import HealthAnalysisModel
+        HealthAnalysisModel(retrain=True)
+
+    if args.update:
+        import pandas as pd
+        from ml_model import HealthAnalysisModel
+        HealthAnalysisModel().update_models(pd.read_csv(args.update))
+
+    if args.train_store:
+        from ml_model import HealthAnalysisModel
+        model = HealthAnalysisModel()
+        if args.rows or args.patient_json:
+            patient_batches = None
+            if args.patient_json:
+                from patient_dataset import iter_patient_batches
+                patient_batches = iter_patient_batches(args.patient_json)
+            model.write_training_store(args.train_store, args.rows or 0, patient_batches=patient_batches)
+        model.train_from_store(args.train_store)
+
+    registry = ModelRegistry(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+    manifest = registry.load_manifest()
+    if manifest is None:
+        print("No registered models")
+    else:
+        print(f"Version: {manifest['version']}")
+        print(f"Fingerprint: {manifest['fingerprint']}")
+        print(f"Created: {manifest['created_at']}")
+        print(f"Artifacts: {', '.join(manifest['artifacts'].values())}")
@@ -0,0 +1,179 @@
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Field names used in the nested patient records (data/diverse_patient_dataset.json)
+# and the feature columns they map onto. Fields can sit at the top level or
+# inside any panel ("Lipid Profile", "Liver Function", ...).
+FIELD_COLUMNS = {
+    'Age': 'age',
+    'BMI': 'bmi',
+    'Fasting Glucose': 'glucose',
+    'Glucose': 'glucose',
+    'Total Cholesterol': 'cholesterol',
+    'Triglycerides': 'triglycerides',
+    'HDL': 'hdl',
+    'LDL': 'ldl',
+    'ALT': 'alt',
+    'AST': 'ast',
+    'Bilirubin': 'bilirubin',
+    'Alkaline Phosphatase': 'alkaline_phosphatase',
+    'Creatinine': 'creatinine',
+    'BUN': 'bun',
+    'Sodium': 'sodium',
+    'Potassium': 'potassium',
+    'Chloride': 'chloride',
+    'Bicarbonate': 'bicarbonate',
+    'Calcium': 'calcium',
+    'Magnesium': 'magnesium',
+    'Phosphate': 'phosphate',
+    'Total Protein': 'total_protein',
+    'Albumin': 'albumin',
+    'Globulin': 'globulin',
+    'A/G Ratio': 'ag_ratio',
+    'CRP': 'crp',
+    'HbA1c': 'hba1c',
+    'WBC': 'wbc',
+    'RBC': 'rbc',
+    'Hemoglobin': 'hemoglobin',
+    'Hematocrit': 'hematocrit',
+    'Platelets': 'platelets',
+    'Troponin I': 'troponin_i',
+    'Weight': 'weight',
+    'Height': 'height'
+}
+
+CATEGORY_COLUMNS = {
+    'Ethnicity': 'ethnicity',
+    'Disease Diagnosis': 'diagnosis'
+}
+
+# Same encoding as the training data and the web form
+GENDER_CODES = {'male': 1.0, 'female': 0.0}
+
+# Every batch has these columns, in this order: float64 measurements (NaN when a
+# record does not have them), then categoricals
+NUMERIC_COLUMNS = ['gender'] + list(dict.fromkeys(FIELD_COLUMNS.values()))
+PATIENT_COLUMNS = NUMERIC_COLUMNS + list(CATEGORY_COLUMNS.values())
+
+_WHITESPACE = re.compile(r'\s*')
+
+
+def iter_json_array(file, read_size=65536):
+    """Yield the elements of the JSON array in ``file`` one at a time.
+
+    The file is read ``read_size`` characters at a time, so memory use is
+    bounded by the largest element rather than the whole document.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    expect = '['
+
+    while True:
+        position = _WHITESPACE.match(buffer, position).end()
+        if position == len(buffer):
+            if eof:
+                raise ValueError("JSON array ended unexpectedly")
+            chunk = file.read(read_size)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+            continue
+
+        char = buffer[position]
+        if expect == '[':
+            if char != '[':
+                raise ValueError(f"Expected a JSON array, found {char!r}")
+            position += 1
+            expect = 'first'
+        elif expect == 'separator':
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"Expected ',' or ']' between array elements, found {char!r}")
+            position += 1
+            expect = 'value'
+        elif expect == 'first' and char == ']':
+            return
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None
+            # Unless the element is followed by its separator it may have been
+            # cut short (a number split across reads); read on and decode again
+            if end is not None and not eof:
+                following = _WHITESPACE.match(buffer, end).end()
+                if following == len(buffer) or buffer[following] not in ',]':
+                    end = None
+            if end is None:
+                chunk = file.read(read_size)
+                buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+                continue
+            yield value
+            position = end
+            expect = 'separator'
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def flatten_patient(record):
+    """Map one nested patient record onto flat feature columns.
+
+    Unknown fields are ignored. BMI is derived from weight (kg) and height
+    (cm) when the record does not give it.
+    """
+    row = {}
+    pending = [record]
+    while pending:
+        for key, value in pending.pop().items():
+            if isinstance(value, dict):
+                pending.append(value)
+            elif key in FIELD_COLUMNS:
+                row[FIELD_COLUMNS[key]] = _to_float(value)
+            elif key in CATEGORY_COLUMNS:
+                row[CATEGORY_COLUMNS[key]] = value
+            elif key == 'Gender':
+                row['gender'] = GENDER_CODES.get(str(value).lower(), np.nan)
+
+    if 'bmi' not in row and row.get('weight') and row.get('height'):
+        row['bmi'] = row['weight'] / (row['height'] / 100) ** 2
+    return row
+
+
+def iter_patient_batches(path, batch_size=10000, read_size=65536):
+    """Stream a JSON array of nested patient records as typed DataFrame batches.
+
+    Each batch has the ``PATIENT_COLUMNS`` schema, so batches can be passed
+    straight to ``HealthAnalysisModel.predict_many`` or
+    ``write_training_store``.
+    """
+    with open(path, encoding='utf-8') as f:
+        columns = {name: [] for name in PATIENT_COLUMNS}
+        rows = 0
+        for record in iter_json_array(f, read_size):
+            row = flatten_patient(record)
+            for name, values in columns.items():
+                values.append(row.get(name, np.nan if name in NUMERIC_COLUMNS else None))
+            rows += 1
+            if rows == batch_size:
+                yield _to_frame(columns)
+                columns = {name: [] for name in PATIENT_COLUMNS}
+                rows = 0
+        if rows:
+            yield _to_frame(columns)
+
+
+def _to_frame(columns):
+    frame = {name: np.array(columns[name], dtype=np.float64) for name in NUMERIC_COLUMNS}
+    for name in CATEGORY_COLUMNS.values():
+        frame[name] = pd.Categorical(columns[name])
+    return pd.DataFrame(frame, columns=PATIENT_COLUMNS)
@@ -0,0 +1,396 @@
+import copy
+import functools
+import io
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+
+
+def _build_stylesheet():
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        alignment=1  # Center alignment
+    ))
+    styles.add(ParagraphStyle(
+        'Warning',
+        parent=styles['Normal'],
+        textColor=colors.red
+    ))
+    styles.add(ParagraphStyle(
+        'Contraindication',
+        parent=styles['Normal'],
+        textColor=colors.red
+    ))
+    styles.add(ParagraphStyle(
+        'Footer',
+        parent=styles['Normal'],
+        fontSize=8,
+        textColor=colors.gray
+    ))
+    return styles
+
+
+# Built once per process and shared by every report; Table.setStyle copies
+# the commands, so the table styles can be reused as they are
+STYLES = _build_stylesheet()
+
+HEADER_ROW_TABLE_STYLE = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('PADDING', (0, 0), (-1, -1), 6),
+])
+
+HEADER_COLUMN_TABLE_STYLE = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+    ('PADDING', (0, 0), (-1, -1), 6),
+])
+
+
+@functools.lru_cache(maxsize=None)
+def _parsed_paragraph(text, style_name):
+    return Paragraph(text, STYLES[style_name])
+
+
+def _static_paragraph(text, style_name):
+    """Paragraph for text that is the same in every report.
+
+    The markup is parsed once; each report gets a shallow copy, since
+    layout state is set on the copy and the parsed fragments are not modified.
+    """
+    return copy.copy(_parsed_paragraph(text, style_name))
+
+
+def get_score_category(score):
+    if score >= 90:
+        return "Excellent"
+    elif score >= 80:
+        return "Good"
+    elif score >= 70:
+        return "Fair"
+    elif score >= 60:
+        return "Poor"
+    else:
+        return "Critical"
+
+
+def get_metabolite_status(metabolite, value):
+    if not value:
+        return "N/A"
+    
+    if metabolite == 'glucose':
+        if value < 70:
+            return "Low"
+        elif value > 100:
+            return "High"
+        return "Normal"
+    elif metabolite == 'cholesterol':
+        if value < 125:
+            return "Low"
+        elif value > 200:
+            return "High"
+        return "Normal"
+    elif metabolite == 'triglycerides':
+        if value > 150:
+            return "High"
+        return "Normal"
+    elif metabolite == 'hdl':
+        if value < 40:
+            return "Low"
+        return "Normal"
+    elif metabolite == 'ldl':
+        if value > 100:
+            return "High"
+        return "Normal"
+    return "Unknown"
+
+
+def build_report_pdf(report_data):
+    """Render the health report as PDF bytes"""
+    # Generate PDF using reportlab
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    styles = STYLES
+    story = []
+
+    # Title
+    story.append(_static_paragraph("MetabolX Health Analysis Report", 'CustomTitle'))
+    story.append(Spacer(1, 12))
+
+    # Patient Information
+    story.append(_static_paragraph("Patient Information", 'Heading2'))
+    patient_data = [
+        ["Name:", report_data.get('patientName', 'N/A')],
+        ["Age:", f"{report_data.get('age', 0)} years"],
+        ["Gender:", report_data.get('gender', 'N/A')],
+        ["BMI:", f"{report_data.get('bmi', 'N/A')} ({report_data.get('bmiCategory', 'N/A')})"],
+        ["Ethnicity:", report_data.get('ethnicity', 'N/A')],
+        ["Diagnosed Conditions:", ", ".join(report_data.get('conditions', ['None']))],
+        ["Current Medications:", ", ".join(report_data.get('medications', ['None']))],
+        ["Allergies:", ", ".join(report_data.get('allergies', ['None']))]
+    ]
+    patient_table = Table(patient_data, colWidths=[2*inch, 4*inch])
+    patient_table.setStyle(HEADER_COLUMN_TABLE_STYLE)
+    story.append(patient_table)
+    story.append(Spacer(1, 20))
+
+    # Overall Scores
+    story.append(_static_paragraph("Health Scores", 'Heading2'))
+    scores_data = [
+        ["Score Type", "Value", "Category"],
+        ["Overall Health Score", f"{report_data.get('healthScore', 0)}/100", get_score_category(report_data.get('healthScore', 0))],
+        ["Metabolite Score", f"{report_data.get('metaboliteScore', 0)}/100", get_score_category(report_data.get('metaboliteScore', 0))],
+        ["Comprehensive Score", f"{report_data.get('comprehensiveScore', 0)}/100", get_score_category(report_data.get('comprehensiveScore', 0))]
+    ]
+    scores_table = Table(scores_data, colWidths=[2*inch, 2*inch, 2*inch])
+    scores_table.setStyle(HEADER_ROW_TABLE_STYLE)
+    story.append(scores_table)
+    story.append(Spacer(1, 20))
+
+    # Metabolite Analysis
+    metabolites = report_data.get('metabolites', {})
+    story.append(_static_paragraph("Metabolite Analysis", 'Heading2'))
+    metabolite_data = [
+        ["Metabolite", "Value", "Normal Range", "Status"],
+        ["Glucose", f"{metabolites.get('glucose', 0)} mg/dL", "70-100 mg/dL", 
+         get_metabolite_status('glucose', metabolites.get('glucose', 0))],
+        ["Cholesterol", f"{metabolites.get('cholesterol', 0)} mg/dL", "125-200 mg/dL",
+         get_metabolite_status('cholesterol', metabolites.get('cholesterol', 0))],
+        ["Triglycerides", f"{metabolites.get('triglycerides', 0)} mg/dL", "<150 mg/dL",
+         get_metabolite_status('triglycerides', metabolites.get('triglycerides', 0))],
+        ["HDL", f"{metabolites.get('hdl', 0)} mg/dL", ">40 mg/dL",
+         get_metabolite_status('hdl', metabolites.get('hdl', 0))],
+        ["LDL", f"{metabolites.get('ldl', 0)} mg/dL", "<100 mg/dL",
+         get_metabolite_status('ldl', metabolites.get('ldl', 0))]
+    ]
+    metabolite_table = Table(metabolite_data, colWidths=[1.5*inch, 1.5*inch, 1.5*inch, 1.5*inch])
+    metabolite_table.setStyle(HEADER_ROW_TABLE_STYLE)
+    story.append(metabolite_table)
+    story.append(Spacer(1, 20))
+
+    # Comprehensive Analysis
+    story.append(_static_paragraph("Comprehensive Analysis", 'Heading2'))
+    for analysis in report_data.get('comprehensiveAnalysis', []):
+        analysis_text = f"{analysis['name']}: Score {analysis['score']}/100 - {analysis['description']}"
+        story.append(Paragraph(analysis_text, styles['Normal']))
+        story.append(Spacer(1, 6))
+    story.append(Spacer(1, 14))
+
+    # Metabolism Analysis
+    story.append(_static_paragraph("Metabolism Analysis", 'Heading2'))
+    for metabolism in report_data.get('metabolism', []):
+        metabolism_text = f"{metabolism['type']}: {metabolism['percentage']}% - {metabolism.get('status', '')}"
+        story.append(Paragraph(metabolism_text, styles['Normal']))
+        story.append(Spacer(1, 6))
+    story.append(Spacer(1, 14))
+
+    # Primary Diagnosis
+    story.append(_static_paragraph("Diagnosis", 'Heading2'))
+    story.append(Paragraph(f"Primary Diagnosis: {report_data['analysis'].get('primaryDiagnosis', 'N/A')}", styles['Normal']))
+    story.append(Spacer(1, 10))
+
+    # Findings
+    story.append(_static_paragraph("Key Findings:", 'Heading3'))
+    for finding in report_data['analysis'].get('findings', []):
+        story.append(Paragraph(f"• {finding}", styles['Normal']))
+    story.append(Spacer(1, 14))
+
+    # Health Risks
+    story.append(_static_paragraph("Health Risk Assessment", 'Heading2'))
+    risk_data = [
+        ["Risk Type", "Assessment"],
+        ["Diabetes Risk", report_data['analysis'].get('diabetesRisk', 'N/A')],
+        ["Heart Disease Risk", report_data['analysis'].get('heartDiseaseRisk', 'N/A')]
+    ]
+    risk_table = Table(risk_data, colWidths=[3*inch, 3*inch])
+    risk_table.setStyle(HEADER_ROW_TABLE_STYLE)
+    story.append(risk_table)
+    story.append(Spacer(1, 20))
+
+    # Critical Markers
+    if report_data.get('criticalMarkers'):
+        story.append(_static_paragraph("Critical Markers", 'Heading2'))
+        for marker in report_data['criticalMarkers']:
+            story.append(Paragraph(f"• {marker}", styles['Normal']))
+        story.append(Spacer(1, 14))
+
+    # Improvement Areas
+    if report_data.get('improvementAreas'):
+        story.append(_static_paragraph("Areas for Improvement", 'Heading2'))
+        for area in report_data['improvementAreas']:
+            story.append(Paragraph(f"• {area}", styles['Normal']))
+        story.append(Spacer(1, 14))
+
+    # Medicine Recommendations
+    if report_data.get('medicines'):
+        story.append(_static_paragraph("Medicine Recommendations", 'Heading2'))
+        for medicine in report_data['medicines']:
+            med_text = f"""• {medicine['name']} (Score: {medicine['score']}/100)
+               Category: {medicine['category']}
+               Primary Use: {medicine['primaryUse']}
+               Dosage: {medicine['dosage']}
+               Description: {medicine['description']}"""
+            story.append(Paragraph(med_text, styles['Normal']))
+            if medicine.get('warnings'):
+                warnings_text = "Warnings: " + ", ".join(medicine['warnings'])
+                story.append(Paragraph(warnings_text, styles['Warning']))
+            story.append(Spacer(1, 10))
+        story.append(Spacer(1, 14))
+
+    # Medicine Comparison Analysis
+    if report_data.get('medicineComparison'):
+        story.append(_static_paragraph("Top Medicines Metabolite Impact Analysis", 'Heading2'))
+
+        # Create comparison table headers
+        comparison_data = [["Metric", "Medicine 1", "Medicine 2"]]
+
+        # Add comparison metrics
+        metrics = report_data['medicineComparison'].get('comparisonMetrics', {})
+        for metric_name, values in metrics.items():
+            comparison_data.append([
+                metric_name.replace('_', ' ').title(),
+                f"{values.get('medicine1', 0)}/100",
+                f"{values.get('medicine2', 0)}/100"
+            ])
+
+        # Create and style the comparison table
+        comparison_table = Table(comparison_data, colWidths=[2*inch, 2*inch, 2*inch])
+        comparison_table.setStyle(HEADER_ROW_TABLE_STYLE)
+        story.append(comparison_table)
+        story.append(Spacer(1, 20))
+
+        # Detailed metabolite impact for each top medicine
+        for medicine in report_data['medicineComparison'].get('topMedicines', []):
+            story.append(Paragraph(f"Detailed Analysis: {medicine['name']}", styles['Heading3']))
+
+            # Metabolite Impact Table
+            impact_data = [["Metabolism Type", "Impact Score", "Description"]]
+            for metabolism_type, impact in medicine.get('metaboliteImpact', {}).items():
+                impact_data.append([
+                    metabolism_type.replace('_', ' ').title(),
+                    f"{impact.get('impact', 0)}/100",
+                    impact.get('description', 'N/A')
+                ])
+
+            impact_table = Table(impact_data, colWidths=[1.5*inch, 1*inch, 3.5*inch])
+            impact_table.setStyle(HEADER_ROW_TABLE_STYLE)
+            story.append(impact_table)
+            story.append(Spacer(1, 10))
+
+            # Biomarker Effects
+            story.append(_static_paragraph("Expected Biomarker Effects:", 'Heading4'))
+            for effect in medicine.get('biomarkerEffects', []):
+                effect_text = f"""• {effect['marker']}: 
+                   Expected Change: {effect['expectedChange']}
+                   Timeframe: {effect['timeframe']}
+                   Confidence: {effect['confidenceLevel']}%"""
+                story.append(Paragraph(effect_text, styles['Normal']))
+
+            # Synergies and Contraindications
+            if medicine.get('synergies'):
+                story.append(_static_paragraph("Synergistic Effects:", 'Heading4'))
+                for synergy in medicine['synergies']:
+                    story.append(Paragraph(f"• {synergy}", styles['Normal']))
+
+            if medicine.get('contraindications'):
+                story.append(_static_paragraph("Contraindications:", 'Heading4'))
+                for contraindication in medicine['contraindications']:
+                    story.append(Paragraph(f"• {contraindication}", styles['Contraindication']))
+
+            story.append(Spacer(1, 20))
+
+    # Recommendations
+    story.append(_static_paragraph("Recommendations", 'Heading2'))
+    recommendations = report_data['analysis'].get('recommendations', [])
+    if recommendations:
+        for recommendation in recommendations:
+            story.append(Paragraph(f"• {recommendation}", styles['Normal']))
+            story.append(Spacer(1, 6))
+    else:
+        story.append(_static_paragraph("No specific recommendations at this time.", 'Normal'))
+    story.append(Spacer(1, 20))
+
+    # Follow-up Plan
+    story.append(_static_paragraph("Follow-up Plan", 'Heading2'))
+    story.append(Paragraph(report_data['analysis'].get('followUpPlan', 'Please consult with your healthcare provider for follow-up care.'), styles['Normal']))
+    story.append(Spacer(1, 20))
+
+    # Footer
+    story.append(Spacer(1, 30))
+    story.append(_static_paragraph("This report is generated by MetabolX and should be reviewed with your healthcare provider.", 'Footer'))
+    story.append(Paragraph(f"Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Footer']))
+    story.append(Paragraph(f"Report ID: {datetime.now().strftime('%Y%m%d%H%M%S')}", styles['Footer']))
+
+    # Build PDF
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def _render(report_data):
+    start = time.perf_counter()
+    pdf = build_report_pdf(report_data)
+    return pdf, time.perf_counter() - start
+
+
+class ReportRenderPool:
+    """Render report PDFs in a pool of worker processes.
+
+    reportlab layout is CPU-bound and holds the GIL, so it runs outside the
+    web process's threads. Workers are forked when the pool is created;
+    create it before starting any threads. ``render`` blocks until the PDF
+    is ready and returns the bytes together with the render time;
+    ``render_many`` renders a batch, for bulk exports.
+    """
+
+    def __init__(self, max_workers=2):
+        context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+        self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+        # Start the workers now rather than on the first report
+        self._executor.submit(int).result()
+        self._lock = threading.Lock()
+        self._stats = {'reports': 0, 'render_seconds': 0.0, 'max_render_seconds': 0.0}
+
+    def render(self, report_data):
+        """Return ``(pdf_bytes, render_seconds)`` for ``report_data``."""
+        pdf, seconds = self._executor.submit(_render, report_data).result()
+        self._record(seconds)
+        print(f"Rendered PDF report ({len(pdf)} bytes) in {seconds:.3f}s")
+        return pdf, seconds
+
+    def render_many(self, reports, chunksize=8):
+        """Yield ``(pdf_bytes, render_seconds)`` for each report, in order.
+
+        Reports are sent to the workers ``chunksize`` at a time, so bulk
+        exports spread over every worker without a round trip per report.
+        """
+        for pdf, seconds in self._executor.map(_render, reports, chunksize=chunksize):
+            self._record(seconds)
+            yield pdf, seconds
+
+    def _record(self, seconds):
+        with self._lock:
+            self._stats['reports'] += 1
+            self._stats['render_seconds'] += seconds
+            self._stats['max_render_seconds'] = max(self._stats['max_render_seconds'], seconds)
+
+    def stats(self):
+        """Report count and render times, for monitoring."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['mean_render_seconds'] = round(stats['render_seconds'] / stats['reports'], 4) if stats['reports'] else 0.0
+        return stats
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
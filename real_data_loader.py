@@ -1,11 +1,77 @@
+import hashlib
+import json
+import shutil
+
 import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from columnar_store import ColumnarStore
+from synthetic_shards import iter_shards
+
+# NHANES SAS transport files in the data directory, joined on the respondent
+# sequence number. The demographic table decides which respondents are kept.
+NHANES_TABLES = ['demographic', 'glucose', 'cholesterol', 'biochem', 'blood', 'liver']
+NHANES_KEY = 'SEQN'
+
+# NHANES variable -> loader column. Where several tables measure the same
+# marker, the earlier variable wins and later ones only fill its gaps.
+NHANES_VARIABLES = [
+    ('RIDAGEYR', 'age'),
+    ('RIAGENDR', 'gender'),
+    ('BMXBMI', 'bmi'),
+    ('LBXGLU', 'glucose'),
+    ('LBXTC', 'cholesterol'),
+    ('LBXTR', 'triglycerides'),
+    ('LBDHDD', 'hdl'),
+    ('LBDLDL', 'ldl'),
+    ('LBXSATSI', 'alt'),
+    ('LBXSASSI', 'ast'),
+    ('LBXSTB', 'bilirubin'),
+    ('LBXSAPSI', 'alkaline_phosphatase'),
+    ('LBXSCR', 'creatinine'),
+    ('LBXSBU', 'bun'),
+    ('LBXSNASI', 'sodium'),
+    ('LBXSKSI', 'potassium'),
+    ('LBXSCLSI', 'chloride'),
+    ('LBXSC3SI', 'bicarbonate'),
+    ('LBXSCA', 'calcium'),
+    ('LBXSPH', 'phosphate'),
+    ('LBXSTP', 'total_protein'),
+    ('LBXSAL', 'albumin'),
+    ('LBXSGB', 'globulin'),
+    ('LBXSGL', 'glucose'),
+    ('LBXSCH', 'cholesterol'),
+    ('LBXSTR', 'triglycerides'),
+    ('LBXHSCRP', 'crp')
+]
+
+# Rows decoded per read from a transport file
+XPT_CHUNK_ROWS = 10000
+
+def nhanes_source_paths(data_dir='real_data'):
+    """Map each NHANES table to its transport file under ``data_dir``, for the files that exist"""
+    paths = {table: Path(data_dir) / f'{table}_raw.xpt' for table in NHANES_TABLES}
+    return {table: path for table, path in paths.items() if path.exists()}
+
+
+def nhanes_source_digest(data_dir='real_data'):
+    """Hash of the contents of the NHANES transport files under ``data_dir``"""
+    digest = hashlib.sha256()
+    for table, path in nhanes_source_paths(data_dir).items():
+        digest.update(table.encode('utf-8'))
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
 class RealDataLoader:
-    def __init__(self):
-        self.data_dir = Path('real_data')
+    def __init__(self, data_dir='real_data'):
+        self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
+        # Joined NHANES tables, cached as a columnar store
+        self.nhanes_cache_dir = self.data_dir / 'nhanes_columns'
         
         # Define realistic ranges for health metrics based on medical literature
         self.ranges = {
@@ -52,56 +118,57 @@ class RealDataLoader:
             'cortisol': 15  # Cortisol (μg/dL)
         }
     
-    def generate_realistic_data(self, n_samples=1000):
+    def generate_realistic_data(self, n_samples=1000, random_state=None):
         """
         Generate synthetic health data that follows realistic distributions
         """
         print("Generating synthetic health data with realistic distributions...")
+        rng = np.random.default_rng(random_state)
         data = pd.DataFrame()
         
         # Demographics
-        data['age'] = np.random.normal(45, 15, n_samples).clip(self.ranges['age'][0], self.ranges['age'][1])
-        data['gender_encoded'] = np.random.binomial(1, 0.5, n_samples)
+        data['age'] = rng.normal(45, 15, n_samples).clip(self.ranges['age'][0], self.ranges['age'][1])
+        data['gender_encoded'] = rng.binomial(1, 0.5, n_samples)
         
         # BMI with realistic distribution (slightly right-skewed)
-        data['bmi'] = np.random.lognormal(3.1, 0.2, n_samples).clip(self.ranges['bmi'][0], self.ranges['bmi'][1])
+        data['bmi'] = rng.lognormal(3.1, 0.2, n_samples).clip(self.ranges['bmi'][0], self.ranges['bmi'][1])
         
         # Glucose levels (fasting) - normal distribution with some elevated values
-        base_glucose = np.random.normal(95, 10, n_samples)
-        elevated_mask = np.random.random(n_samples) < 0.2  # 20% chance of elevated glucose
-        base_glucose[elevated_mask] += np.random.normal(40, 10, sum(elevated_mask))
+        base_glucose = rng.normal(95, 10, n_samples)
+        elevated_mask = rng.random(n_samples) < 0.2  # 20% chance of elevated glucose
+        base_glucose[elevated_mask] += rng.normal(40, 10, sum(elevated_mask))
         data['glucose'] = base_glucose.clip(self.ranges['glucose'][0], self.ranges['glucose'][1])
         
         # Lipid panel
-        data['cholesterol'] = np.random.normal(190, 35, n_samples).clip(self.ranges['cholesterol'][0], self.ranges['cholesterol'][1])
-        data['hdl'] = np.random.normal(55, 15, n_samples).clip(self.ranges['hdl'][0], self.ranges['hdl'][1])
+        data['cholesterol'] = rng.normal(190, 35, n_samples).clip(self.ranges['cholesterol'][0], self.ranges['cholesterol'][1])
+        data['hdl'] = rng.normal(55, 15, n_samples).clip(self.ranges['hdl'][0], self.ranges['hdl'][1])
         data['ldl'] = (data['cholesterol'] - data['hdl'] * 1.5).clip(self.ranges['ldl'][0], self.ranges['ldl'][1])
-        data['triglycerides'] = np.random.lognormal(5.0, 0.4, n_samples).clip(self.ranges['triglycerides'][0], self.ranges['triglycerides'][1])
+        data['triglycerides'] = rng.lognormal(5.0, 0.4, n_samples).clip(self.ranges['triglycerides'][0], self.ranges['triglycerides'][1])
         
         # Liver function tests
-        data['alt'] = np.random.lognormal(3.2, 0.3, n_samples).clip(self.ranges['alt'][0], self.ranges['alt'][1])
-        data['ast'] = np.random.lognormal(3.1, 0.3, n_samples).clip(self.ranges['ast'][0], self.ranges['ast'][1])
-        data['alkaline_phosphatase'] = np.random.normal(90, 20, n_samples).clip(self.ranges['alkaline_phosphatase'][0], self.ranges['alkaline_phosphatase'][1])
-        data['bilirubin'] = np.random.lognormal(0, 0.4, n_samples).clip(self.ranges['bilirubin'][0], self.ranges['bilirubin'][1])
+        data['alt'] = rng.lognormal(3.2, 0.3, n_samples).clip(self.ranges['alt'][0], self.ranges['alt'][1])
+        data['ast'] = rng.lognormal(3.1, 0.3, n_samples).clip(self.ranges['ast'][0], self.ranges['ast'][1])
+        data['alkaline_phosphatase'] = rng.normal(90, 20, n_samples).clip(self.ranges['alkaline_phosphatase'][0], self.ranges['alkaline_phosphatase'][1])
+        data['bilirubin'] = rng.lognormal(0, 0.4, n_samples).clip(self.ranges['bilirubin'][0], self.ranges['bilirubin'][1])
         
         # Kidney function tests
-        data['creatinine'] = np.random.normal(1.0, 0.3, n_samples).clip(self.ranges['creatinine'][0], self.ranges['creatinine'][1])
-        data['bun'] = np.random.normal(15, 5, n_samples).clip(self.ranges['bun'][0], self.ranges['bun'][1])
+        data['creatinine'] = rng.normal(1.0, 0.3, n_samples).clip(self.ranges['creatinine'][0], self.ranges['creatinine'][1])
+        data['bun'] = rng.normal(15, 5, n_samples).clip(self.ranges['bun'][0], self.ranges['bun'][1])
         
         # Electrolytes
-        data['sodium'] = np.random.normal(140, 3, n_samples).clip(self.ranges['sodium'][0], self.ranges['sodium'][1])
-        data['potassium'] = np.random.normal(4.0, 0.5, n_samples).clip(self.ranges['potassium'][0], self.ranges['potassium'][1])
-        data['chloride'] = np.random.normal(102, 3, n_samples).clip(self.ranges['chloride'][0], self.ranges['chloride'][1])
-        data['bicarbonate'] = np.random.normal(24, 2, n_samples).clip(self.ranges['bicarbonate'][0], self.ranges['bicarbonate'][1])
+        data['sodium'] = rng.normal(140, 3, n_samples).clip(self.ranges['sodium'][0], self.ranges['sodium'][1])
+        data['potassium'] = rng.normal(4.0, 0.5, n_samples).clip(self.ranges['potassium'][0], self.ranges['potassium'][1])
+        data['chloride'] = rng.normal(102, 3, n_samples).clip(self.ranges['chloride'][0], self.ranges['chloride'][1])
+        data['bicarbonate'] = rng.normal(24, 2, n_samples).clip(self.ranges['bicarbonate'][0], self.ranges['bicarbonate'][1])
         
         # Minerals
-        data['calcium'] = np.random.normal(9.5, 0.5, n_samples).clip(self.ranges['calcium'][0], self.ranges['calcium'][1])
-        data['magnesium'] = np.random.normal(2.0, 0.3, n_samples).clip(self.ranges['magnesium'][0], self.ranges['magnesium'][1])
-        data['phosphate'] = np.random.normal(3.5, 0.5, n_samples).clip(self.ranges['phosphate'][0], self.ranges['phosphate'][1])
+        data['calcium'] = rng.normal(9.5, 0.5, n_samples).clip(self.ranges['calcium'][0], self.ranges['calcium'][1])
+        data['magnesium'] = rng.normal(2.0, 0.3, n_samples).clip(self.ranges['magnesium'][0], self.ranges['magnesium'][1])
+        data['phosphate'] = rng.normal(3.5, 0.5, n_samples).clip(self.ranges['phosphate'][0], self.ranges['phosphate'][1])
         
         # Protein metrics
-        data['protein'] = np.random.normal(7.0, 0.5, n_samples).clip(self.ranges['protein'][0], self.ranges['protein'][1])
-        data['albumin'] = np.random.normal(4.2, 0.4, n_samples).clip(self.ranges['albumin'][0], self.ranges['albumin'][1])
+        data['protein'] = rng.normal(7.0, 0.5, n_samples).clip(self.ranges['protein'][0], self.ranges['protein'][1])
+        data['albumin'] = rng.normal(4.2, 0.4, n_samples).clip(self.ranges['albumin'][0], self.ranges['albumin'][1])
         data['globulin'] = (data['protein'] - data['albumin']).clip(1.5, 4.5)
         data['a_g_ratio'] = (data['albumin'] / data['globulin']).clip(0.8, 2.5)
         
@@ -123,13 +190,25 @@ class RealDataLoader:
         
         print(f"Generated {len(data)} synthetic health records with realistic distributions")
         
-        # Save the data
-        data.to_csv(self.data_dir / 'synthetic_health_data.csv', index=False)
+        # Save the data as a compressed columnar store
+        store_dir = self.data_dir / 'synthetic_health_columns'
+        shutil.rmtree(store_dir, ignore_errors=True)
+        ColumnarStore(str(store_dir), compression='zlib').append(data)
         return data
     
     def load_health_data(self):
         """Load and preprocess real health data."""
         try:
+            data = self.load_nhanes_data()
+            if data is not None:
+                print(f"Loaded {len(data)} NHANES health records")
+                # Markers NHANES does not measure stay missing for the imputer;
+                # the advanced biomarkers take their reference values
+                data = data.reindex(columns=list(dict.fromkeys([*self.required_columns, *data.columns])))
+                for marker, default_value in self.advanced_biomarkers.items():
+                    data[marker] = data[marker].fillna(default_value) if marker in data.columns else default_value
+                return data
+            
             print("Generating fresh synthetic health data...")
             # Generate synthetic data that mimics real data patterns
             data = self._generate_synthetic_health_data()
@@ -139,52 +218,54 @@ class RealDataLoader:
             print(f"Error loading health data: {str(e)}")
             return None
 
-    def _generate_synthetic_health_data(self, n_samples=1000):
+    def _generate_synthetic_health_data(self, n_samples=1000, rng=None):
         """Generate synthetic health data with realistic distributions."""
-        np.random.seed(42)
+        if rng is None:
+            # Legacy RandomState stream that the registered models were trained on
+            rng = np.random.RandomState(42)
         
         # Generate base features with realistic distributions
         data = pd.DataFrame({
-            'age': np.random.normal(45, 15, n_samples).clip(18, 90),
-            'gender': np.random.choice([0, 1], n_samples),
-            'bmi': np.random.normal(25, 4, n_samples).clip(18.5, 35),
-            'glucose': np.random.normal(95, 15, n_samples).clip(70, 180),
-            'cholesterol': np.random.normal(180, 30, n_samples).clip(150, 250),
-            'triglycerides': np.random.normal(120, 40, n_samples).clip(50, 250),
-            'hdl': np.random.normal(55, 10, n_samples).clip(35, 85),
-            'ldl': np.random.normal(100, 20, n_samples).clip(70, 160),
-            'alt': np.random.normal(25, 8, n_samples).clip(10, 60),
-            'ast': np.random.normal(23, 7, n_samples).clip(10, 50),
-            'bilirubin': np.random.normal(0.8, 0.2, n_samples).clip(0.3, 1.5),
-            'alkaline_phosphatase': np.random.normal(75, 15, n_samples).clip(45, 125),
-            'creatinine': np.random.normal(0.9, 0.2, n_samples).clip(0.6, 1.4),
-            'bun': np.random.normal(15, 3, n_samples).clip(8, 25),
-            'sodium': np.random.normal(140, 2, n_samples).clip(135, 145),
-            'potassium': np.random.normal(4.0, 0.3, n_samples).clip(3.5, 5.0),
-            'chloride': np.random.normal(102, 2, n_samples).clip(98, 106),
-            'bicarbonate': np.random.normal(24, 1.5, n_samples).clip(22, 28),
-            'calcium': np.random.normal(9.5, 0.3, n_samples).clip(8.8, 10.2),
-            'magnesium': np.random.normal(2.0, 0.15, n_samples).clip(1.7, 2.3),
-            'phosphate': np.random.normal(3.5, 0.3, n_samples).clip(2.8, 4.2),
-            'total_protein': np.random.normal(7.0, 0.3, n_samples).clip(6.2, 7.8),
-            'albumin': np.random.normal(4.2, 0.2, n_samples).clip(3.8, 4.8),
-            'globulin': np.random.normal(2.8, 0.2, n_samples).clip(2.3, 3.3),
-            'ag_ratio': np.random.normal(1.5, 0.15, n_samples).clip(1.2, 1.8),
+            'age': rng.normal(45, 15, n_samples).clip(18, 90),
+            'gender': rng.choice([0, 1], n_samples),
+            'bmi': rng.normal(25, 4, n_samples).clip(18.5, 35),
+            'glucose': rng.normal(95, 15, n_samples).clip(70, 180),
+            'cholesterol': rng.normal(180, 30, n_samples).clip(150, 250),
+            'triglycerides': rng.normal(120, 40, n_samples).clip(50, 250),
+            'hdl': rng.normal(55, 10, n_samples).clip(35, 85),
+            'ldl': rng.normal(100, 20, n_samples).clip(70, 160),
+            'alt': rng.normal(25, 8, n_samples).clip(10, 60),
+            'ast': rng.normal(23, 7, n_samples).clip(10, 50),
+            'bilirubin': rng.normal(0.8, 0.2, n_samples).clip(0.3, 1.5),
+            'alkaline_phosphatase': rng.normal(75, 15, n_samples).clip(45, 125),
+            'creatinine': rng.normal(0.9, 0.2, n_samples).clip(0.6, 1.4),
+            'bun': rng.normal(15, 3, n_samples).clip(8, 25),
+            'sodium': rng.normal(140, 2, n_samples).clip(135, 145),
+            'potassium': rng.normal(4.0, 0.3, n_samples).clip(3.5, 5.0),
+            'chloride': rng.normal(102, 2, n_samples).clip(98, 106),
+            'bicarbonate': rng.normal(24, 1.5, n_samples).clip(22, 28),
+            'calcium': rng.normal(9.5, 0.3, n_samples).clip(8.8, 10.2),
+            'magnesium': rng.normal(2.0, 0.15, n_samples).clip(1.7, 2.3),
+            'phosphate': rng.normal(3.5, 0.3, n_samples).clip(2.8, 4.2),
+            'total_protein': rng.normal(7.0, 0.3, n_samples).clip(6.2, 7.8),
+            'albumin': rng.normal(4.2, 0.2, n_samples).clip(3.8, 4.8),
+            'globulin': rng.normal(2.8, 0.2, n_samples).clip(2.3, 3.3),
+            'ag_ratio': rng.normal(1.5, 0.15, n_samples).clip(1.2, 1.8),
             # Advanced biomarkers
-            'crp': np.random.lognormal(0, 0.5, n_samples).clip(0.1, 10.0),
-            'esr': np.random.normal(15, 8, n_samples).clip(0, 50),
-            'fibrinogen': np.random.normal(300, 40, n_samples).clip(200, 500),
-            'malondialdehyde': np.random.lognormal(-0.5, 0.4, n_samples).clip(0.1, 3.0),
-            '8_ohdg': np.random.lognormal(0, 0.4, n_samples).clip(0.1, 5.0),
-            'testosterone': np.random.normal(600, 150, n_samples).clip(200, 1200),
-            'estradiol': np.random.normal(50, 15, n_samples).clip(10, 100),
-            'cortisol': np.random.normal(15, 4, n_samples).clip(5, 30)
+            'crp': rng.lognormal(0, 0.5, n_samples).clip(0.1, 10.0),
+            'esr': rng.normal(15, 8, n_samples).clip(0, 50),
+            'fibrinogen': rng.normal(300, 40, n_samples).clip(200, 500),
+            'malondialdehyde': rng.lognormal(-0.5, 0.4, n_samples).clip(0.1, 3.0),
+            '8_ohdg': rng.lognormal(0, 0.4, n_samples).clip(0.1, 5.0),
+            'testosterone': rng.normal(600, 150, n_samples).clip(200, 1200),
+            'estradiol': rng.normal(50, 15, n_samples).clip(10, 100),
+            'cortisol': rng.normal(15, 4, n_samples).clip(5, 30)
         })
         
         # Add correlations between related markers
         data['hdl'] = data['hdl'] - 0.3 * data['triglycerides'] / 100
         data['ldl'] = data['cholesterol'] - data['hdl'] - data['triglycerides'] / 5
-        data['ast'] = data['alt'] * 0.8 + np.random.normal(0, 2, n_samples)
+        data['ast'] = data['alt'] * 0.8 + rng.normal(0, 2, n_samples)
         data['globulin'] = data['total_protein'] - data['albumin']
         data['ag_ratio'] = data['albumin'] / data['globulin']
         
@@ -214,6 +295,101 @@ class RealDataLoader:
         
         return data
 
+    def load_nhanes_data(self):
+        """Load the joined NHANES tables, or None when the transport files are unusable.
+
+        The first load parses the ``.xpt`` files and caches the joined rows as a
+        columnar store; later loads read the cached columns through memory maps
+        until any of the transport files changes.
+        """
+        paths = nhanes_source_paths(self.data_dir)
+        if 'demographic' not in paths:
+            return None
+        
+        signature = {table: [path.stat().st_size, path.stat().st_mtime_ns] for table, path in paths.items()}
+        sources_path = self.nhanes_cache_dir / 'sources.json'
+        if sources_path.exists():
+            with open(sources_path) as f:
+                if json.load(f) == signature:
+                    return ColumnarStore(str(self.nhanes_cache_dir)).read()
+        
+        try:
+            tables = {table: self._read_xpt(path) for table, path in paths.items()}
+        except Exception as e:
+            print(f"Error reading NHANES transport files: {str(e)}")
+            return None
+        
+        data = self._join_nhanes_tables(tables)
+        
+        shutil.rmtree(self.nhanes_cache_dir, ignore_errors=True)
+        self.nhanes_cache_dir.mkdir(parents=True)
+        store = ColumnarStore(str(self.nhanes_cache_dir))
+        if len(data):
+            store.append(data)
+        with open(sources_path, 'w') as f:
+            json.dump(signature, f)
+        print(f"Cached {len(data)} joined NHANES records in {self.nhanes_cache_dir}")
+        return data
+
+    def _read_xpt(self, path):
+        """Read the respondent ID and the mapped variables of one transport file, chunk by chunk"""
+        wanted = {NHANES_KEY} | {variable for variable, _ in NHANES_VARIABLES}
+        chunks = []
+        with pd.read_sas(path, format='xport', chunksize=XPT_CHUNK_ROWS) as reader:
+            for chunk in reader:
+                chunks.append(chunk[[col for col in chunk.columns if col in wanted]])
+        table = pd.concat(chunks, ignore_index=True)
+        if NHANES_KEY not in table.columns:
+            raise ValueError(f"{path} has no {NHANES_KEY} column")
+        return table.drop_duplicates(NHANES_KEY)
+
+    def _join_nhanes_tables(self, tables):
+        """Hash join every table onto the demographic respondents and map the variables"""
+        keys = tables['demographic'][NHANES_KEY].to_numpy()
+        variables = {}
+        for table in tables.values():
+            # Build a hash index of the table's IDs once, then probe it with every respondent
+            positions = pd.Index(table[NHANES_KEY].to_numpy()).get_indexer(keys)
+            found = positions >= 0
+            for variable in table.columns.drop(NHANES_KEY):
+                values = np.full(len(keys), np.nan)
+                values[found] = table[variable].to_numpy(dtype=np.float64)[positions[found]]
+                variables.setdefault(variable, values)
+        
+        data = pd.DataFrame(index=pd.RangeIndex(len(keys)))
+        for variable, column in NHANES_VARIABLES:
+            if variable not in variables:
+                continue
+            if column in data.columns:
+                data[column] = data[column].fillna(pd.Series(variables[variable]))
+            else:
+                data[column] = variables[variable]
+        
+        if 'gender' in data.columns:
+            # NHANES codes 1 = male, 2 = female
+            data['gender'] = data['gender'].map({1.0: 1.0, 2.0: 0.0})
+        if 'albumin' in data.columns and 'globulin' in data.columns:
+            data['ag_ratio'] = data['albumin'] / data['globulin']
+        
+        # Adults with at least one lab result
+        labs = data.columns.difference(['age', 'gender'])
+        keep = data[labs].notna().any(axis=1).to_numpy()
+        if 'age' in data.columns:
+            keep &= (data['age'] >= self.ranges['age'][0]).to_numpy()
+        return data[keep].reset_index(drop=True)
+
+    def iter_synthetic_health_data(self, n_samples, chunk_size=100000, random_state=42, n_jobs=1):
+        """Yield ``n_samples`` synthetic health records in chunks of ``chunk_size`` rows.
+
+        Each chunk is drawn from its own ``SeedSequence`` child, so any chunk
+        can be regenerated without producing the ones before it, and chunks
+        can be generated in ``n_jobs`` worker processes without changing them.
+        """
+        yield from iter_shards(self._draw_synthetic_health_data, n_samples, chunk_size, random_state, n_jobs)
+
+    def _draw_synthetic_health_data(self, rng, n_samples):
+        return self._generate_synthetic_health_data(n_samples, rng=rng)
+
 if __name__ == "__main__":
     loader = RealDataLoader()
     health_data = loader.load_health_data()
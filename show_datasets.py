@@ -1,5 +1,8 @@
+import shutil
+
 import pandas as pd
 import numpy as np
+from columnar_store import ColumnarStore
 from ml_model import HealthAnalysisModel
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -9,9 +12,10 @@ def analyze_datasets():
     model = HealthAnalysisModel()
     data = model.generate_training_data(n_samples=1000)
     
-    # Save full dataset to CSV
-    data.to_csv('training_data.csv', index=False)
-    print("\nFull dataset saved to training_data.csv")
+    # Save the full dataset to a compressed columnar store
+    shutil.rmtree('training_data', ignore_errors=True)
+    ColumnarStore('training_data', compression='zlib').append(data.astype({'health_status': 'category'}))
+    print("\nFull dataset saved to training_data/")
     
     # Display basic statistics
     print("\nDataset Overview:")
@@ -87,16 +91,12 @@ def analyze_datasets():
     ]
     print(data[advanced_features].describe())
     
-    # Save advanced features to a separate CSV
-    data[advanced_features].to_csv('advanced_features.csv', index=False)
-    
     print("\nVisualizations have been saved as:")
     print("1. score_distributions.png")
     print("2. system_scores.png")
     print("3. correlation_matrix.png")
     print("\nDetailed data has been saved to:")
-    print("1. training_data.csv (complete dataset)")
-    print("2. advanced_features.csv (advanced features only)")
+    print("training_data/ (columnar store; e.g. ColumnarStore('training_data').read(advanced_features))")
 
 if __name__ == "__main__":
     analyze_datasets() 
\ No newline at end of file
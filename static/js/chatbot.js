@@ -143,6 +143,20 @@ document.addEventListener('DOMContentLoaded', function() {
         if (save) {
             saveChatHistory();
         }
+        return messageDiv;
+    }
+
+    // Keep the conversation across page loads within the browser session
+    function saveChatHistory() {
+        const messages = Array.from(chatMessages.querySelectorAll('.chat-message:not(.typing-message)'))
+            .map(message => message.outerHTML);
+        sessionStorage.setItem('metabolxChatHistory', JSON.stringify(messages));
+    }
+
+    function loadChatHistory() {
+        const messages = JSON.parse(sessionStorage.getItem('metabolxChatHistory') || '[]');
+        messages.forEach(html => chatMessages.insertAdjacentHTML('beforeend', html));
+        chatMessages.scrollTop = chatMessages.scrollHeight;
     }
 
     // Handle form submission
@@ -158,25 +172,33 @@ document.addEventListener('DOMContentLoaded', function() {
         // Show typing indicator
         const typingIndicator = showTyping();
         
+        // The reply is streamed: the message appears with the first token and grows
+        let replyText = null;
+        const showReply = (text) => {
+            if (replyText === null) {
+                typingIndicator.remove();
+                replyText = addMessage('ai', '<span class="message-text"></span>', false).querySelector('.message-text');
+            }
+            replyText.textContent = text;
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+        };
+        
         try {
-            const response = await fetch('/chat', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ message }),
+            let reply = '';
+            await postEventStream('/chat/stream', { message }, (event, data) => {
+                if (event === 'token') {
+                    reply += data.delta;
+                    showReply(reply);
+                } else if (event === 'done') {
+                    showReply(data.response);
+                    saveChatHistory();
+                    
+                    // Update suggestions based on context
+                    updateSuggestions(data.response);
+                } else if (event === 'error') {
+                    throw new Error(data.error);
+                }
             });
-            
-            const data = await response.json();
-            
-            // Remove typing indicator
-            typingIndicator.remove();
-            
-            // Add AI response
-            addMessage('ai', data.response);
-            
-            // Update suggestions based on context
-            updateSuggestions(data.response);
         } catch (error) {
             console.error('Error:', error);
             typingIndicator.remove();
@@ -0,0 +1,20 @@
+import numpy as np
+from joblib import Parallel, delayed
+
+
+def iter_shards(draw, n_samples, shard_size, seed=42, n_jobs=1):
+    """Yield ``draw(rng, n_rows)`` for consecutive shards of ``n_samples`` rows, in order.
+
+    Shard ``i`` gets its own ``numpy.random.Generator`` seeded from the
+    ``i``-th child of ``SeedSequence(seed)``, and the shard boundaries depend
+    only on ``n_samples`` and ``shard_size``, so the rows are the same for
+    every ``n_jobs``. Unless ``n_jobs`` is 1 the shards are drawn in loky
+    worker processes (``draw`` must be picklable), with only a couple of
+    shards per worker in flight at a time.
+    """
+    sizes = [min(shard_size, n_samples - start) for start in range(0, n_samples, shard_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = (delayed(draw)(np.random.default_rng(child), size) for child, size in zip(seeds, sizes))
+    if len(sizes) <= 1:
+        n_jobs = 1
+    yield from Parallel(n_jobs=n_jobs, backend='loky', return_as='generator')(tasks)
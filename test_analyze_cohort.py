@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope='module')
+def cohort(model):
+    data = model.generate_training_data(n_samples=300)
+    # Spread the indices so that every insight threshold is crossed somewhere
+    rng = np.random.RandomState(0)
+    for column in ('crp', 'testosterone', 'malondialdehyde', 'alt', 'creatinine', 'total_protein'):
+        data[column] = data[column] * rng.uniform(0, 60, len(data))
+    return data
+
+
+def test_cohort_matches_analyze_health_per_patient(model, cohort):
+    result = model.analyze_cohort(cohort)
+
+    for i in range(0, len(cohort), 10):
+        patient = model.analyze_health(cohort.iloc[i])
+        scores = result['scores'].iloc[i]
+
+        for key in ('healthScore', 'metaboliteScore', 'comprehensiveScore'):
+            assert scores[key] == pytest.approx(patient[key])
+        for name, value in {**patient['advancedFeatures'], **patient['systemScores']}.items():
+            assert scores[name] == pytest.approx(value)
+
+        insights = result['insights'].iloc[i]
+        assert list(insights.index[insights.to_numpy()]) == patient['insights']
+
+        recommendations = result['recommendations'].iloc[i]
+        flagged = recommendations.index[recommendations.to_numpy()]
+        for category, texts in patient['recommendations'].items():
+            assert [text for flagged_category, text in flagged if flagged_category == category] == texts
+
+
+def test_each_patient_gets_at_most_one_insight_per_rule(model, cohort):
+    insights = model.analyze_cohort(cohort)['insights'].to_numpy()
+
+    # Columns come in (insight, moderate insight) pairs
+    assert not (insights[:, 0::2] & insights[:, 1::2]).any()
+    assert insights.any(axis=0).sum() > len(insights[0]) // 2
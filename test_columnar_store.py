@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from columnar_store import ColumnarStore
+
+
+def test_append_and_read_back(tmp_path):
+    store = ColumnarStore(str(tmp_path / 'store'))
+    rng = np.random.RandomState(0)
+    chunks = [
+        pd.DataFrame({'age': rng.normal(45, 15, n), 'gender': rng.choice([0, 1], n)})
+        for n in (100, 37, 250)
+    ]
+    for chunk in chunks:
+        store.append(chunk)
+
+    expected = pd.concat(chunks, ignore_index=True)
+    reopened = ColumnarStore(str(tmp_path / 'store'))
+
+    assert len(reopened) == len(expected)
+    assert isinstance(reopened.column('age'), np.memmap)
+    pd.testing.assert_frame_equal(reopened.read(), expected)
+    pd.testing.assert_frame_equal(reopened.read(['gender'], 90, 140), expected[['gender']].iloc[90:140].reset_index(drop=True))
+    pd.testing.assert_frame_equal(pd.concat(reopened.iter_chunks(64), ignore_index=True), expected)
+
+
+def test_rejects_non_numeric_columns(tmp_path):
+    store = ColumnarStore(str(tmp_path / 'store'))
+    with pytest.raises(ValueError):
+        store.append(pd.DataFrame({'health_status': ['healthy', 'at_risk']}))
+
+
+def test_compressed_store_reads_projections_and_row_ranges(tmp_path):
+    store = ColumnarStore(str(tmp_path / 'store'), compression='zlib')
+    rng = np.random.RandomState(0)
+    chunks = [
+        pd.DataFrame({'glucose': rng.normal(95, 15, n), 'gender': rng.choice([0, 1], n), 'flag': rng.rand(n) > 0.5})
+        for n in (100, 37, 250)
+    ]
+    for chunk in chunks:
+        store.append(chunk)
+
+    expected = pd.concat(chunks, ignore_index=True)
+    reopened = ColumnarStore(str(tmp_path / 'store'))
+
+    assert reopened.compression == 'zlib'
+    assert len(reopened) == len(expected)
+    pd.testing.assert_frame_equal(reopened.read(), expected)
+    # Row ranges inside one block, across blocks and past the end
+    for start, stop in ((10, 20), (90, 140), (130, None), (300, 1000), (50, 50)):
+        pd.testing.assert_frame_equal(
+            reopened.read(['gender', 'glucose'], start, stop),
+            expected[['gender', 'glucose']].iloc[start:stop].reset_index(drop=True)
+        )
+    np.testing.assert_array_equal(reopened.column('flag'), expected['flag'])
+    pd.testing.assert_frame_equal(pd.concat(reopened.iter_chunks(64), ignore_index=True), expected)
+
+
+@pytest.mark.parametrize('compression', [None, 'zlib'])
+def test_categorical_columns_round_trip(tmp_path, compression):
+    store = ColumnarStore(str(tmp_path / 'store'), compression=compression)
+    first = pd.DataFrame({'health_score': [80.0, 55.0], 'health_status': pd.Categorical(['healthy', 'at_risk'])})
+    # A category first seen in a later chunk, and a missing value
+    second = pd.DataFrame({'health_score': [20.0, 60.0], 'health_status': pd.Categorical(['unhealthy', None])})
+    store.append(first)
+    store.append(second)
+
+    data = ColumnarStore(str(tmp_path / 'store')).read()
+
+    assert data['health_status'].tolist()[:3] == ['healthy', 'at_risk', 'unhealthy']
+    assert data['health_status'].isna().tolist() == [False, False, False, True]
+    assert list(data['health_status'].cat.categories) == ['at_risk', 'healthy', 'unhealthy']
+    np.testing.assert_array_equal(data['health_score'], [80.0, 55.0, 20.0, 60.0])
+
+
+def fail_schema_write(store):
+    raise OSError("No space left on device")
+
+
+@pytest.mark.parametrize('compression', [None, 'zlib'])
+def test_append_after_an_interrupted_append(tmp_path, monkeypatch, compression):
+    first = pd.DataFrame({'glucose': [90.0, 101.5], 'gender': [0, 1]})
+    lost = pd.DataFrame({'glucose': [130.0, 88.0, 95.0], 'gender': [1, 1, 0]})
+    third = pd.DataFrame({'glucose': [77.0], 'gender': [0]})
+    ColumnarStore(str(tmp_path / 'store'), compression=compression).append(first)
+
+    # Crash after the column bytes are written but before the schema is
+    with monkeypatch.context() as patch:
+        patch.setattr(ColumnarStore, '_write_schema', fail_schema_write)
+        with pytest.raises(OSError):
+            ColumnarStore(str(tmp_path / 'store')).append(lost)
+
+    assert len(ColumnarStore(str(tmp_path / 'store'))) == 2
+    ColumnarStore(str(tmp_path / 'store')).append(third)
+
+    expected = pd.concat([first, third], ignore_index=True)
+    pd.testing.assert_frame_equal(ColumnarStore(str(tmp_path / 'store')).read(), expected)
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from feature_imputer import FeatureImputer
+
+
+def reference_fill(frame):
+    """The per-column median/mode loop the imputer replaced"""
+    for col in frame.columns:
+        if frame[col].dtype in ['float64', 'int64']:
+            frame[col] = frame[col].fillna(frame[col].median())
+        else:
+            frame[col] = frame[col].fillna(frame[col].mode()[0])
+    return frame
+
+
+def make_frame():
+    rng = np.random.RandomState(0)
+    frame = pd.DataFrame({
+        'glucose': rng.normal(95, 15, 200),
+        'gender': rng.choice([0, 1], 200),
+        'bmi': rng.normal(25, 5, 200),
+        'health_status': rng.choice(['healthy', 'at_risk', 'unhealthy'], 200).astype(object)
+    })
+    frame.loc[rng.rand(200) < 0.2, 'glucose'] = np.nan
+    frame.loc[rng.rand(200) < 0.1, 'bmi'] = np.nan
+    frame.loc[rng.rand(200) < 0.1, 'health_status'] = np.nan
+    return frame
+
+
+def test_matches_per_column_fill():
+    expected = reference_fill(make_frame())
+
+    frame = make_frame()
+    imputer = FeatureImputer().fit(frame)
+    imputer.transform(frame)
+
+    pd.testing.assert_frame_equal(frame, expected)
+
+
+def test_fill_values_default_for_unknown_columns():
+    imputer = FeatureImputer().fit(make_frame())
+
+    values = imputer.fill_values(['bmi', 'unknown'])
+
+    assert values[0] == np.nanmedian(make_frame()['bmi'])
+    assert values[1] == 0.0
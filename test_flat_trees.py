@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
+from sklearn.multioutput import MultiOutputRegressor
+
+from flat_trees import CompiledHealthEnsemble, export_flat_models, load_flat_models
+
+
+@pytest.fixture(scope='module')
+def fitted_models():
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(600, 12))
+    y = (X[:, 0] + X[:, 1] + rng.normal(scale=0.5, size=600) > 0).astype(int)
+    Y = np.column_stack([X[:, i] * 3 + X[:, i + 1] ** 2 for i in range(9)])
+    classifier = RandomForestClassifier(n_estimators=25, random_state=42).fit(X, y)
+    regressor = MultiOutputRegressor(GradientBoostingRegressor(n_estimators=30, random_state=42)).fit(X, Y)
+    return classifier, regressor
+
+
+def test_compiled_matches_sklearn(fitted_models):
+    classifier, regressor = fitted_models
+    compiled = CompiledHealthEnsemble.from_sklearn(classifier, regressor)
+    X = np.random.RandomState(1).normal(size=(2000, 12))
+
+    labels, scores = compiled.predict(X)
+
+    np.testing.assert_array_equal(labels, classifier.predict(X))
+    np.testing.assert_allclose(compiled.predict_proba(X), classifier.predict_proba(X), atol=1e-12)
+    np.testing.assert_allclose(scores, regressor.predict(X), rtol=1e-10, atol=1e-10)
+
+
+def test_single_row_matches_sklearn(fitted_models):
+    classifier, regressor = fitted_models
+    compiled = CompiledHealthEnsemble.from_sklearn(classifier, regressor)
+    x = np.random.RandomState(2).normal(size=(1, 12))
+
+    labels, scores = compiled.predict(x)
+
+    assert labels[0] == classifier.predict(x)[0]
+    np.testing.assert_allclose(scores, regressor.predict(x), rtol=1e-10, atol=1e-10)
+
+
+def test_single_class_forest():
+    rng = np.random.RandomState(3)
+    X = rng.normal(size=(100, 5))
+    classifier = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, np.zeros(100, dtype=int))
+    regressor = MultiOutputRegressor(GradientBoostingRegressor(n_estimators=5)).fit(X, X[:, :2])
+
+    labels, scores = CompiledHealthEnsemble.from_sklearn(classifier, regressor).predict(X)
+
+    np.testing.assert_array_equal(labels, np.zeros(100))
+    np.testing.assert_allclose(scores, regressor.predict(X), rtol=1e-10, atol=1e-10)
+
+
+def test_export_round_trip_is_memory_mapped(fitted_models, tmp_path):
+    classifier, regressor = fitted_models
+    directory = str(tmp_path / 'v1')
+    export_flat_models(classifier, regressor, directory)
+
+    compiled = load_flat_models(directory, mmap_mode='r')
+    X = np.random.RandomState(4).normal(size=(300, 12))
+    labels, scores = compiled.predict(X)
+
+    assert isinstance(compiled.threshold, np.memmap)
+    np.testing.assert_array_equal(labels, classifier.predict(X))
+    np.testing.assert_allclose(scores, regressor.predict(X), rtol=1e-10, atol=1e-10)
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from job_queue import JobQueue, InMemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return InMemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / 'jobs.sqlite'))
+
+
+def wait_for(queue, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+def test_submit_returns_before_the_job_finishes(store):
+    release = threading.Event()
+    queue = JobQueue(store)
+
+    def analysis():
+        release.wait(5)
+        return {'healthScore': 80}
+
+    async def failing():
+        raise ValueError('no JSON object in response')
+
+    try:
+        job_id = queue.submit(analysis)
+        assert queue.get(job_id)['status'] in ('queued', 'running')
+        release.set()
+        failed_id = queue.submit(failing)
+
+        assert wait_for(queue, job_id)['result'] == {'healthScore': 80}
+        failed = wait_for(queue, failed_id)
+    finally:
+        queue.shutdown()
+
+    assert failed['status'] == 'failed'
+    assert failed['error'] == 'no JSON object in response'
+    assert queue.get('missing') is None
+
+
+def test_worker_pool_is_bounded():
+    lock = threading.Lock()
+    running = {'now': 0, 'max': 0}
+
+    def job():
+        with lock:
+            running['now'] += 1
+            running['max'] = max(running['max'], running['now'])
+        time.sleep(0.05)
+        with lock:
+            running['now'] -= 1
+
+    queue = JobQueue(max_workers=2)
+    job_ids = [queue.submit(job) for _ in range(6)]
+    queue.shutdown()
+
+    assert all(queue.get(job_id)['status'] == 'done' for job_id in job_ids)
+    assert running['max'] == 2
+
+
+def test_sqlite_jobs_are_visible_to_other_store_instances(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite')
+    queue = JobQueue(SQLiteJobStore(path))
+    job_id = queue.submit(lambda: [1, 2, 3])
+    queue.shutdown()
+
+    assert SQLiteJobStore(path).get(job_id)['result'] == [1, 2, 3]
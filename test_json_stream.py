@@ -0,0 +1,50 @@
+import json
+
+from json_stream import IncrementalJSONObjectParser
+
+
+SCHEMA = {'healthScore': 'number', 'summary': 'string', 'biomarkers': 'array', 'charts': 'object'}
+
+DOCUMENT = {
+    'healthScore': 82,
+    'summary': 'Mostly fine, {watch} "LDL", \\ and [sleep]',
+    'biomarkers': [{'name': 'LDL', 'value': 130}, {'name': 'HDL', 'value': 55}],
+    'charts': {'labels': ['a', 'b'], 'values': [1, 2]}
+}
+
+
+def test_chunked_stream_matches_json_loads():
+    text = 'Here is the analysis:\n' + json.dumps(DOCUMENT, indent=2) + '\nLet me know!'
+    parser = IncrementalJSONObjectParser(SCHEMA)
+
+    completed = []
+    for i in range(0, len(text), 3):
+        completed.extend(parser.feed(text[i:i + 3]))
+
+    assert [key for key, _ in completed] == list(DOCUMENT)
+    assert parser.close() == DOCUMENT
+    assert parser.complete and not parser.truncated and not parser.errors
+
+
+def test_truncated_stream_keeps_finished_members_and_repairs_the_last():
+    text = json.dumps(DOCUMENT)
+    cut = text.index('{"name": "HDL"') + 5
+    parser = IncrementalJSONObjectParser(SCHEMA)
+    parser.feed(text[:cut])
+
+    members = parser.close()
+
+    assert parser.truncated
+    assert members['healthScore'] == 82
+    assert members['summary'] == DOCUMENT['summary']
+    assert members['biomarkers'] == [{'name': 'LDL', 'value': 130}]
+    assert parser.missing == ['charts']
+
+
+def test_members_of_the_wrong_type_are_rejected():
+    parser = IncrementalJSONObjectParser(SCHEMA)
+    parser.feed('{"healthScore": true, "summary": "ok", "biomarkers": {}}')
+
+    assert parser.close() == {'summary': 'ok'}
+    assert parser.missing == ['healthScore', 'biomarkers', 'charts']
+    assert len(parser.errors) == 2
@@ -0,0 +1,46 @@
+import time
+
+from llm_cache import LLMResponseCache
+
+
+def messages(text):
+    return [{'role': 'system', 'content': 'You analyze blood reports.'}, {'role': 'user', 'content': text}]
+
+
+def test_key_ignores_whitespace_but_not_content_model_or_schema():
+    key = LLMResponseCache.make_key('gpt-4', messages('Glucose: 95\nHDL: 50'))
+
+    assert key == LLMResponseCache.make_key('gpt-4', messages('  Glucose:   95 HDL: 50\n'))
+    assert key != LLMResponseCache.make_key('gpt-4', messages('Glucose: 96\nHDL: 50'))
+    assert key != LLMResponseCache.make_key('gpt-3.5-turbo', messages('Glucose: 95\nHDL: 50'))
+    assert key != LLMResponseCache.make_key('gpt-4', messages('Glucose: 95\nHDL: 50'), schema_version=2)
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    cache = LLMResponseCache(max_entries=2, ttl=60)
+    cache.set('a', 'A')
+    cache.set('b', 'B')
+    cache.get('a')
+    cache.set('c', 'C')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    assert cache.get('a') is None
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['stores']) == (2, 2, 3)
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'llm_cache.sqlite')
+    LLMResponseCache(path=path).set('key', '{"healthScore": 80}')
+
+    cache = LLMResponseCache(path=path)
+
+    assert cache.get('key') == '{"healthScore": 80}'
+    assert cache.get('key') == '{"healthScore": 80}'
+    assert cache.stats()['disk_hits'] == 1
+    assert cache.stats()['memory_hits'] == 1
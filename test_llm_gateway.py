@@ -0,0 +1,172 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+import pytest
+
+from llm_gateway import LLMGateway
+
+
+class StubChatCompletions(BaseHTTPRequestHandler):
+    """Minimal stand-in for the chat-completions endpoint; echoes the last message"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        with server.lock:
+            server.requests.append(body)
+            server.clients.add(self.client_address)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+
+        reply = f"echo: {body['messages'][-1]['content']}"
+        if body.get('stream'):
+            self.send_stream(body['model'], reply.split(' '))
+            return
+
+        payload = json.dumps({
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': 0,
+            'model': body['model'],
+            'choices': [{
+                'index': 0,
+                'finish_reason': 'stop',
+                'message': {'role': 'assistant', 'content': reply}
+            }],
+            'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2}
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_stream(self, model, words):
+        """Send the reply as chat.completion.chunk events, one word at a time"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        pieces = [word if i == 0 else f' {word}' for i, word in enumerate(words)]
+        for piece in pieces:
+            chunk = {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion.chunk',
+                'created': 0,
+                'model': model,
+                'choices': [{'index': 0, 'finish_reason': None, 'delta': {'content': piece}}]
+            }
+            self.write_chunk(f'data: {json.dumps(chunk)}\n\n')
+            time.sleep(self.server.chunk_delay)
+        self.write_chunk('data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubChatCompletions)
+    server.lock = threading.Lock()
+    server.requests, server.clients = [], set()
+    server.in_flight = server.max_in_flight = 0
+    server.delay = server.chunk_delay = 0.0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_gateway(server, **kwargs):
+    return LLMGateway(api_key='test-key', base_url=f'http://127.0.0.1:{server.server_port}/v1', **kwargs)
+
+
+def test_chat_returns_reply_and_reuses_connection_across_event_loops(stub_server):
+    gateway = make_gateway(stub_server)
+    messages = [{'role': 'user', 'content': 'hello'}]
+    try:
+        # Each asyncio.run is a separate event loop, like separate Flask requests
+        first = asyncio.run(gateway.chat(messages, model='gpt-4', max_tokens=50))
+        second = asyncio.run(gateway.chat(messages, model='gpt-4', max_tokens=50))
+    finally:
+        gateway.close()
+
+    assert first == second == 'echo: hello'
+    assert stub_server.requests[0]['max_tokens'] == 50
+    assert len(stub_server.clients) == 1
+
+
+def test_concurrency_is_bounded(stub_server):
+    stub_server.delay = 0.2
+    gateway = make_gateway(stub_server, max_concurrency=3)
+
+    async def run_many():
+        return await asyncio.gather(*(
+            gateway.chat([{'role': 'user', 'content': str(i)}]) for i in range(9)
+        ))
+
+    try:
+        replies = asyncio.run(run_many())
+    finally:
+        gateway.close()
+
+    assert replies == [f'echo: {i}' for i in range(9)]
+    assert stub_server.max_in_flight == 3
+
+
+def test_per_call_timeout(stub_server):
+    stub_server.delay = 1.0
+    gateway = make_gateway(stub_server, max_retries=0)
+    try:
+        with pytest.raises(openai.APITimeoutError):
+            asyncio.run(gateway.chat([{'role': 'user', 'content': 'slow'}], timeout=0.2))
+    finally:
+        gateway.close()
+
+
+def test_stream_chat_yields_tokens_as_they_arrive(stub_server):
+    stub_server.chunk_delay = 0.1
+    gateway = make_gateway(stub_server)
+    try:
+        start = time.perf_counter()
+        stream = gateway.stream_chat([{'role': 'user', 'content': 'one two three four'}])
+        first = next(stream)
+        first_chunk_seconds = time.perf_counter() - start
+        rest = list(stream)
+        total_seconds = time.perf_counter() - start
+    finally:
+        gateway.close()
+
+    assert first + ''.join(rest) == 'echo: one two three four'
+    assert len(rest) == 4
+    assert first_chunk_seconds < total_seconds / 2
+    assert stub_server.requests[0]['stream'] is True
+
+
+def test_astream_chat(stub_server):
+    gateway = make_gateway(stub_server)
+
+    async def collect():
+        return [chunk async for chunk in gateway.astream_chat([{'role': 'user', 'content': 'a b'}])]
+
+    try:
+        chunks = asyncio.run(collect())
+    finally:
+        gateway.close()
+
+    assert chunks == ['echo:', ' a', ' b']
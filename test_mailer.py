@@ -0,0 +1,142 @@
+import smtplib
+import socketserver
+import threading
+import time
+from email.mime.text import MIMEText
+
+import pytest
+
+from mailer import Mailer, SMTPConnectionPool
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    """Debugging SMTP server: accepts messages and records them; replies can be scripted"""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode('ascii'))
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.sessions += 1
+        self.reply('220 stub ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line[:4].decode('ascii').upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 stub')
+            elif verb == 'RCPT':
+                with server.lock:
+                    server.rcpt_count += 1
+                    self.reply(server.rcpt_replies.pop(0) if server.rcpt_replies else '250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in iter(self.rfile.readline, b''):
+                    if data_line == b'.\r\n':
+                        break
+                    data.append(data_line)
+                if server.data_barrier is not None:
+                    # Hold the reply until enough sessions are sending at once
+                    server.data_barrier.wait()
+                with server.lock:
+                    reply = server.data_replies.pop(0) if server.data_replies else '250 OK'
+                    if reply.startswith('250'):
+                        server.messages.append(b''.join(data))
+                self.reply(reply)
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                # MAIL, RSET, NOOP
+                self.reply('250 OK')
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), StubSMTPHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.sessions = server.rcpt_count = 0
+    server.messages, server.rcpt_replies, server.data_replies = [], [], []
+    server.data_barrier = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_mailer(server, max_connections=2, **kwargs):
+    pool = SMTPConnectionPool('127.0.0.1', server.server_address[1], starttls=False, max_connections=max_connections)
+    return Mailer(pool, **kwargs)
+
+
+def message(to):
+    msg = MIMEText('Your report is attached.')
+    msg['From'] = 'reports@metabolx.test'
+    msg['To'] = to
+    msg['Subject'] = 'Report'
+    return msg
+
+
+def test_many_messages_share_one_session(smtp_server):
+    mailer = make_mailer(smtp_server, max_connections=1)
+    try:
+        futures = [mailer.submit(message(f'patient{i}@example.com')) for i in range(5)]
+        for future in futures:
+            future.result(5)
+        mailer.send(message('late@example.com'), timeout=5)
+    finally:
+        mailer.close()
+
+    assert len(smtp_server.messages) == 6
+    assert smtp_server.sessions == 1
+    assert mailer.pool.connections_opened == 1
+
+
+def test_every_pool_connection_delivers_at_once(smtp_server):
+    # Neither DATA is answered until both sessions have sent one
+    smtp_server.data_barrier = threading.Barrier(2, timeout=5)
+    mailer = make_mailer(smtp_server, max_connections=2, batch_size=1)
+    try:
+        futures = [mailer.submit(message(f'patient{i}@example.com')) for i in range(2)]
+        for future in futures:
+            future.result(5)
+    finally:
+        mailer.close()
+
+    assert len(smtp_server.messages) == 2
+    assert smtp_server.sessions == 2
+    assert mailer.pool.connections_opened == 2
+
+
+def test_temporary_failures_are_retried_with_backoff(smtp_server):
+    smtp_server.data_replies = ['451 Try again later', '451 Try again later']
+    mailer = make_mailer(smtp_server, backoff=0.05)
+    try:
+        start = time.perf_counter()
+        mailer.send(message('patient@example.com'), timeout=5)
+        elapsed = time.perf_counter() - start
+    finally:
+        mailer.close()
+
+    assert len(smtp_server.messages) == 1
+    # Waited 0.05s, then 0.1s
+    assert elapsed >= 0.15
+
+
+def test_permanent_rejections_are_not_retried(smtp_server):
+    smtp_server.rcpt_replies = ['550 No such user']
+    mailer = make_mailer(smtp_server, backoff=0.05)
+    try:
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            mailer.send(message('nobody@example.com'), timeout=5)
+        mailer.send(message('patient@example.com'), timeout=5)
+    finally:
+        mailer.close()
+
+    assert smtp_server.rcpt_count == 2
+    assert len(smtp_server.messages) == 1
@@ -1,39 +1,10 @@
 import pandas as pd
 import numpy as np
 from ml_model import HealthAnalysisModel
+from sample_patients import generate_test_patient
 import json
 from pathlib import Path
 
-def generate_test_patient():
-    """Generate a test patient with realistic health metrics"""
-    return {
-        'age': np.random.normal(45, 15),
-        'gender_encoded': np.random.binomial(1, 0.5),
-        'bmi': np.random.normal(25, 4),
-        'glucose': np.random.normal(95, 15),
-        'cholesterol': np.random.normal(190, 30),
-        'triglycerides': np.random.normal(150, 50),
-        'hdl': np.random.normal(55, 15),
-        'ldl': np.random.normal(120, 30),
-        'alt': np.random.normal(30, 10),
-        'ast': np.random.normal(25, 8),
-        'creatinine': np.random.normal(1.0, 0.3),
-        'bun': np.random.normal(15, 5),
-        'sodium': np.random.normal(140, 3),
-        'potassium': np.random.normal(4.0, 0.5),
-        'chloride': np.random.normal(102, 3),
-        'bicarbonate': np.random.normal(24, 2),
-        'calcium': np.random.normal(9.5, 0.5),
-        'magnesium': np.random.normal(2.0, 0.3),
-        'phosphate': np.random.normal(3.5, 0.5),
-        'protein': np.random.normal(7.0, 0.5),
-        'albumin': np.random.normal(4.2, 0.4),
-        'globulin': np.random.normal(2.8, 0.3),
-        'a_g_ratio': np.random.normal(1.5, 0.3),
-        'bilirubin': np.random.normal(0.8, 0.3),
-        'alkaline_phosphatase': np.random.normal(80, 20)
-    }
-
 def main():
     # Initialize the model
     print("Initializing Health Analysis Model...")
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+import ml_model
+
+
+@pytest.fixture
+def model(fresh_model):
+    # Every test registers a version of its own
+    return fresh_model
+
+
+def append_stored_rows(model, monkeypatch, tmp_path):
+    model.training_store.append(pd.DataFrame({'glucose': [92.0], 'health_score': [81.0]}))
+
+
+def bump_generator_version(model, monkeypatch, tmp_path):
+    monkeypatch.setattr(ml_model, 'TRAINING_DATA_VERSION', ml_model.TRAINING_DATA_VERSION + 1)
+
+
+def replace_nhanes_files(model, monkeypatch, tmp_path):
+    (tmp_path / 'real_data').mkdir()
+    (tmp_path / 'real_data' / 'demographic_raw.xpt').write_bytes(b'HEADER RECORD')
+    monkeypatch.chdir(tmp_path)
+
+
+def test_matching_fingerprint_loads_without_retraining(model, monkeypatch):
+    monkeypatch.setattr(model, 'train_models', lambda: pytest.fail("retrained with a matching fingerprint"))
+    version = model.registry.version
+    model.load_or_train_models()
+    assert model.registry.version == version
+
+
+@pytest.mark.parametrize('change_data', [append_stored_rows, bump_generator_version, replace_nhanes_files])
+def test_training_data_change_forces_retraining(model, monkeypatch, tmp_path, change_data):
+    registered, version = model.training_fingerprint(), model.registry.version
+    retrained = []
+    monkeypatch.setattr(model, 'train_models', lambda: retrained.append(True))
+
+    change_data(model, monkeypatch, tmp_path)
+    fingerprint = model.training_fingerprint()
+    assert fingerprint != registered
+    assert model.registry.load(fingerprint) is None
+
+    model.load_or_train_models()
+    assert retrained
+    assert model.registry.version == version + 1
+    assert model.registry.load(fingerprint) is not None
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+from sklearn.multioutput import MultiOutputRegressor
+
+
+@pytest.fixture(scope='module')
+def training_rows(model):
+    rows = model._prepare_training_rows(model._sample_training_data(np.random.default_rng(0), 300))
+    X = rows[model.feature_columns].to_numpy()
+    X_scaled = (X - X.mean(axis=0)) / X.std(axis=0)
+    return X_scaled, (rows['health_score'] >= 70).astype(int), rows[model.regression_targets]
+
+
+def fit(model, training_rows, n_jobs):
+    model.classifier = RandomForestClassifier(n_estimators=10, random_state=42)
+    model.regressor = MultiOutputRegressor(GradientBoostingRegressor(n_estimators=10, random_state=42))
+    model.training_jobs = n_jobs
+    model._fit_estimators(*training_rows)
+    return model.classifier, model.regressor
+
+
+def test_parallel_fit_is_identical_to_serial_and_plain_fit(model, training_rows):
+    X_scaled, y_health, y_regression = training_rows
+
+    serial = fit(model, training_rows, n_jobs=1)
+    parallel = fit(model, training_rows, n_jobs=2)
+    plain_classifier = RandomForestClassifier(n_estimators=10, random_state=42).fit(X_scaled, y_health)
+    plain_regressor = MultiOutputRegressor(GradientBoostingRegressor(n_estimators=10, random_state=42)).fit(X_scaled, y_regression)
+
+    for classifier, regressor in (parallel, (plain_classifier, plain_regressor)):
+        np.testing.assert_array_equal(classifier.predict(X_scaled), serial[0].predict(X_scaled))
+        np.testing.assert_array_equal(classifier.predict_proba(X_scaled), serial[0].predict_proba(X_scaled))
+        np.testing.assert_array_equal(regressor.predict(X_scaled), serial[1].predict(X_scaled))
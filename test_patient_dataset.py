@@ -0,0 +1,64 @@
+import io
+import json
+import os
+
+import numpy as np
+import pytest
+
+from patient_dataset import PATIENT_COLUMNS, flatten_patient, iter_json_array, iter_patient_batches
+
+DATASET = os.path.join(os.path.dirname(__file__), 'data', 'diverse_patient_dataset.json')
+
+RECORD = {
+    'Age': 52,
+    'Gender': 'Female',
+    'Ethnicity': 'Asian',
+    'Weight': 80.0,
+    'Height': 160.0,
+    'Lipid Profile': {'Total Cholesterol': 210.5, 'LDL': 130.1, 'HDL': 45.0, 'Triglycerides': 160.2},
+    'Glucose & HbA1c': {'Fasting Glucose': 101.3, 'HbA1c': 5.9},
+    'Disease Diagnosis': 'Diabetes'
+}
+
+
+def test_streamed_elements_match_json_load():
+    with open(DATASET, encoding='utf-8') as f:
+        expected = json.load(f)
+
+    # A tiny read size splits records, keys and numbers across reads
+    with open(DATASET, encoding='utf-8') as f:
+        assert list(iter_json_array(f, read_size=7)) == expected
+
+    assert list(iter_json_array(io.StringIO(' [ ] '))) == []
+    assert list(iter_json_array(io.StringIO('[1, 2.5, {"a": [3]}]'), read_size=1)) == [1, 2.5, {'a': [3]}]
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('[1, 2')))
+
+
+def test_panels_are_flattened_onto_feature_columns():
+    row = flatten_patient(RECORD)
+
+    assert row['cholesterol'] == 210.5
+    assert row['glucose'] == 101.3
+    assert row['hba1c'] == 5.9
+    assert row['gender'] == 0.0
+    assert row['bmi'] == pytest.approx(80.0 / 1.6 ** 2)
+    assert row['diagnosis'] == 'Diabetes'
+
+
+def test_batches_feed_scoring_and_training(model):
+    batches = list(iter_patient_batches(DATASET, batch_size=200))
+    assert [len(batch) for batch in batches] == [200, 200, 100]
+    for batch in batches:
+        assert list(batch.columns) == PATIENT_COLUMNS
+        assert batch['glucose'].dtype == np.float64
+        assert batch['sodium'].isna().all()
+
+    predictions = model.predict_many(iter_patient_batches(DATASET, batch_size=200), chunk_size=150)
+    assert len(predictions) == 500
+    assert not predictions.isna().any().any()
+
+    rows = model._prepare_training_rows(batches[0])
+    assert list(rows.columns) == model.feature_columns + model.regression_targets
+    assert not rows.isna().any().any()
+    assert rows['glucose'].equals(batches[0]['glucose'])
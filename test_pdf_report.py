@@ -0,0 +1,69 @@
+from datetime import datetime
+
+import pytest
+from reportlab import rl_config
+
+from pdf_report import ReportRenderPool, build_report_pdf
+
+
+class FixedDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2024, 1, 31, 9, 30)
+
+REPORT = {
+    'patientName': 'Jane Doe',
+    'healthScore': 82,
+    'metabolites': {'glucose': 105, 'hdl': 35},
+    'comprehensiveAnalysis': [{'name': 'Cardiovascular', 'score': 70, 'description': 'Watch LDL'}],
+    'criticalMarkers': ['Glucose above range'],
+    'analysis': {'primaryDiagnosis': 'Prediabetes', 'findings': ['High fasting glucose'], 'recommendations': ['Walk daily']}
+}
+
+
+@pytest.fixture
+def invariant_output(monkeypatch):
+    """Make rendering deterministic: no creation dates, ids or timestamps"""
+    monkeypatch.setattr(rl_config, 'invariant', 1)
+    monkeypatch.setattr('pdf_report.datetime', FixedDatetime)
+
+
+def test_build_report_pdf_returns_pdf_bytes():
+    pdf = build_report_pdf(REPORT)
+
+    assert pdf.startswith(b'%PDF')
+    assert pdf.rstrip().endswith(b'%%EOF')
+
+
+def test_render_pool_renders_in_workers_and_records_times():
+    pool = ReportRenderPool(max_workers=2)
+    try:
+        renders = [pool.render(REPORT) for _ in range(3)]
+        stats = pool.stats()
+    finally:
+        pool.shutdown()
+
+    assert all(pdf.startswith(b'%PDF') and seconds > 0 for pdf, seconds in renders)
+    assert stats['reports'] == 3
+    assert 0 < stats['max_render_seconds'] <= stats['render_seconds']
+
+
+def test_reports_do_not_share_layout_state(invariant_output):
+    # Styles and static headings are reused between reports
+    first = build_report_pdf(REPORT)
+    build_report_pdf({'analysis': {'recommendations': []}})
+
+    assert build_report_pdf(REPORT) == first
+
+
+def test_render_many_keeps_order(invariant_output):
+    reports = [dict(REPORT, patientName=f'Patient {i}') for i in range(5)]
+    pool = ReportRenderPool(max_workers=2)
+    try:
+        renders = list(pool.render_many(reports, chunksize=2))
+        stats = pool.stats()
+    finally:
+        pool.shutdown()
+
+    assert [pdf for pdf, _ in renders] == [build_report_pdf(report) for report in reports]
+    assert stats['reports'] == 5
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(scope='module')
+def patients(model):
+    data = model._sample_training_data(np.random.default_rng(0), 250)
+    # Leave some features out so the defaults are exercised too
+    data.loc[::7, 'glucose'] = np.nan
+    return data[model.base_features + ['crp', 'esr']]
+
+
+@pytest.fixture(scope='module')
+def expected(model, patients):
+    rows = []
+    for patient in patients.to_dict('records'):
+        result = model.predict(patient)
+        rows.append([result['health_risk'], result['health_score'], result['metabolite_score'],
+                     result['comprehensive_score'], *result['system_scores'].values()])
+    return pd.DataFrame(rows, columns=['health_risk'] + model.regression_targets)
+
+
+def assert_matches(result, expected):
+    assert list(result.columns) == list(expected.columns)
+    np.testing.assert_array_equal(result['health_risk'], expected['health_risk'])
+    np.testing.assert_allclose(result.iloc[:, 1:].to_numpy(), expected.iloc[:, 1:].to_numpy(), rtol=1e-10)
+
+
+def test_every_input_type_matches_row_by_row_predict(model, patients, expected):
+    inputs = {
+        'dataframe': patients,
+        'structured array': patients.to_records(index=False),
+        'dicts': iter(patients.to_dict('records')),
+        'dataframes': (patients.iloc[start:start + 60] for start in range(0, len(patients), 60)),
+    }
+    for data in inputs.values():
+        # chunk_size below the row count: chunks must come back in input order
+        assert_matches(model.predict_many(data, chunk_size=40), expected)
+
+
+def test_empty_input_gives_empty_frame(model):
+    for empty in ([], pd.DataFrame(columns=model.base_features)):
+        result = model.predict_many(empty)
+        assert len(result) == 0
+        assert list(result.columns) == ['health_risk'] + model.regression_targets
+
+
+def test_plain_2d_array_is_rejected(model, patients):
+    with pytest.raises(ValueError):
+        model.predict_many(patients.to_numpy())
@@ -0,0 +1,129 @@
+import math
+import struct
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from columnar_store import ColumnarStore
+from real_data_loader import RealDataLoader
+
+
+def ibm_float(value):
+    """Encode ``value`` as an 8-byte IBM hexadecimal float (missing -> SAS '.')"""
+    if value is None or math.isnan(value):
+        return b'.' + bytes(7)
+    if value == 0:
+        return bytes(8)
+    sign = 0x80 if value < 0 else 0
+    value = abs(value)
+    exponent = math.floor(math.log(value, 16)) + 1
+    mantissa = round(value / 16.0 ** exponent * 2 ** 56)
+    if mantissa >= 2 ** 56:
+        mantissa >>= 4
+        exponent += 1
+    return bytes([sign | (exponent + 64)]) + mantissa.to_bytes(7, 'big')
+
+
+def write_xpt(path, frame):
+    """Write a numeric DataFrame as a SAS version 5 transport file"""
+    def record(text):
+        return text.ljust(80).encode('ascii')
+
+    header = [
+        record('HEADER RECORD*******LIBRARY HEADER RECORD!!!!!!!000000000000000000000000000000'),
+        record('SAS     SAS     SASLIB  9.4     X64_7PRO' + ' ' * 24 + '01JAN20:00:00:00'),
+        record('01JAN20:00:00:00'),
+        record('HEADER RECORD*******MEMBER  HEADER RECORD!!!!!!!000000000000000001600000000140'),
+        record('HEADER RECORD*******DSCRPTR HEADER RECORD!!!!!!!000000000000000000000000000000'),
+        record('SAS     TABLE   SASDATA 9.4     X64_7PRO' + ' ' * 24 + '01JAN20:00:00:00'),
+        record('01JAN20:00:00:00'),
+        record(f'HEADER RECORD*******NAMESTR HEADER RECORD!!!!!!!000000{len(frame.columns):04d}00000000000000000000'),
+    ]
+    namestrs = b''.join(
+        struct.pack('>hhhh8s40s8shhh2s8shhl52s', 1, 0, 8, i + 1, name.encode().ljust(8), b' ' * 40,
+                    b' ' * 8, 0, 0, 0, b'\0\0', b' ' * 8, 0, 0, i * 8, bytes(52))
+        for i, name in enumerate(frame.columns)
+    )
+    observations = b''.join(ibm_float(float(value)) for row in frame.itertuples(index=False) for value in row)
+
+    def pad(data):
+        return data + b' ' * (-len(data) % 80)
+
+    with open(path, 'wb') as f:
+        f.write(b''.join(header) + pad(namestrs))
+        f.write(record('HEADER RECORD*******OBS     HEADER RECORD!!!!!!!000000000000000000000000000000'))
+        f.write(pad(observations))
+
+
+@pytest.fixture
+def nhanes_dir(tmp_path):
+    rng = np.random.RandomState(0)
+    seqn = np.arange(1000, 1300, dtype=float)
+    write_xpt(tmp_path / 'demographic_raw.xpt', pd.DataFrame({
+        'SEQN': seqn, 'RIAGENDR': rng.choice([1.0, 2.0], 300), 'RIDAGEYR': rng.randint(5, 80, 300).astype(float)
+    }))
+    # Lab tables cover different, shuffled subsets of the respondents
+    glucose_ids = rng.permutation(seqn)[:200]
+    write_xpt(tmp_path / 'glucose_raw.xpt', pd.DataFrame({'SEQN': glucose_ids, 'LBXGLU': glucose_ids / 10}))
+    biochem_ids = rng.permutation(seqn)[:250]
+    write_xpt(tmp_path / 'biochem_raw.xpt', pd.DataFrame({
+        'SEQN': biochem_ids, 'LBXSGL': np.full(250, 999.0), 'LBXSAL': np.full(250, 4.0),
+        'LBXSGB': np.full(250, 2.5), 'LBXSCR': np.where(np.arange(250) % 5, 0.9, np.nan)
+    }))
+    return tmp_path
+
+
+def test_tables_are_joined_on_respondent_id(nhanes_dir):
+    data = RealDataLoader(nhanes_dir).load_nhanes_data()
+
+    demographic = pd.read_sas(nhanes_dir / 'demographic_raw.xpt', format='xport')
+    glucose = pd.read_sas(nhanes_dir / 'glucose_raw.xpt', format='xport').set_index('SEQN')['LBXGLU']
+    biochem = pd.read_sas(nhanes_dir / 'biochem_raw.xpt', format='xport').set_index('SEQN')
+    expected = demographic[demographic['RIDAGEYR'] >= 18]
+    expected = expected[expected['SEQN'].isin(glucose.index) | expected['SEQN'].isin(biochem.index)]
+
+    assert len(data) == len(expected)
+    np.testing.assert_array_equal(data['age'], expected['RIDAGEYR'])
+    np.testing.assert_array_equal(data['gender'], (expected['RIAGENDR'] == 1).astype(float))
+    # The glucose table wins over the biochemistry panel, which only fills gaps
+    expected_glucose = glucose.reindex(expected['SEQN']).fillna(biochem['LBXSGL'].reindex(expected['SEQN']))
+    np.testing.assert_allclose(data['glucose'], expected_glucose)
+    np.testing.assert_allclose(data['creatinine'], biochem['LBXSCR'].reindex(expected['SEQN']))
+    assert data['ag_ratio'].dropna().eq(1.6).all()
+
+
+def test_joined_rows_are_cached_as_columns(nhanes_dir, monkeypatch):
+    loader = RealDataLoader(nhanes_dir)
+    first = loader.load_nhanes_data()
+    assert len(ColumnarStore(str(loader.nhanes_cache_dir))) == len(first)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("transport files parsed again")
+    monkeypatch.setattr(pd, 'read_sas', fail)
+    pd.testing.assert_frame_equal(RealDataLoader(nhanes_dir).load_nhanes_data(), first)
+
+    health_data = RealDataLoader(nhanes_dir).load_health_data()
+    assert len(health_data) == len(first)
+    assert health_data['sodium'].isna().all()
+    assert (health_data['esr'] == 15).all()
+
+
+def test_invalid_transport_files_fall_back_to_synthetic_data(tmp_path):
+    (tmp_path / 'demographic_raw.xpt').write_text('<!DOCTYPE html><title>Page Not Found</title>')
+    loader = RealDataLoader(tmp_path)
+
+    assert loader.load_nhanes_data() is None
+    assert len(loader.load_health_data()) == 1000
+
+
+def test_markers_missing_from_real_data_take_synthetic_medians(nhanes_dir, model):
+    synthetic = model.generate_training_data(200)
+    # The fixture has no cholesterol table, so no cholesterol values at all
+    real = RealDataLoader(nhanes_dir).load_health_data()
+    assert real['cholesterol'].isna().all()
+
+    for data in (real, real.drop(columns=['cholesterol', 'magnesium', 'esr'])):
+        prepared = model._prepare_real_data(data, synthetic)
+        assert len(prepared) == len(real)
+        assert not prepared[model.advanced_features + model.regression_targets].isna().any().any()
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from real_data_loader import RealDataLoader
+
+
+def test_training_chunks_do_not_depend_on_worker_count(model):
+    serial = list(model.iter_training_data(2500, chunk_size=1000, n_jobs=1))
+    parallel = list(model.iter_training_data(2500, chunk_size=1000, n_jobs=2))
+
+    assert [len(chunk) for chunk in parallel] == [1000, 1000, 500]
+    for a, b in zip(serial, parallel):
+        pd.testing.assert_frame_equal(a, b)
+    # Every chunk has its own stream
+    assert not np.allclose(serial[0]['glucose'].to_numpy()[:500], serial[2]['glucose'].to_numpy())
+
+
+def test_health_record_chunks_do_not_depend_on_worker_count():
+    loader = RealDataLoader()
+    serial = pd.concat(loader.iter_synthetic_health_data(1200, chunk_size=500, n_jobs=1), ignore_index=True)
+    parallel = pd.concat(loader.iter_synthetic_health_data(1200, chunk_size=500, n_jobs=2), ignore_index=True)
+
+    pd.testing.assert_frame_equal(serial, parallel)
+
+
+def test_generators_leave_the_global_random_state_alone(model):
+    np.random.seed(123)
+    expected = np.random.random(3)
+
+    np.random.seed(123)
+    model.generate_synthetic_data(100)
+    model.generate_training_data(100)
+    RealDataLoader().load_health_data()
+
+    np.testing.assert_array_equal(np.random.random(3), expected)
+    pd.testing.assert_frame_equal(model.generate_synthetic_data(100), model.generate_synthetic_data(100))
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml_model import MARKER_REFERENCE_RANGES, SYSTEM_MARKER_WEIGHTS
+
+
+def reference_system_scores(system_markers, data):
+    """The original per-marker loop, kept here as the reference"""
+    scores = {}
+    for system, markers in system_markers.items():
+        score = 0
+        for marker in markers:
+            if marker in data and marker in SYSTEM_MARKER_WEIGHTS[system]:
+                min_val, max_val = MARKER_REFERENCE_RANGES[marker]
+                normalized_value = max(0, min(1, (data[marker] - min_val) / (max_val - min_val)))
+                score += normalized_value * SYSTEM_MARKER_WEIGHTS[system][marker]
+        scores[system] = score * 100
+    return scores
+
+
+def test_single_patient_matches_marker_loop(model):
+    data = model.generate_training_data(n_samples=200)
+
+    for patient in data.to_dict('records'):
+        scores = model.calculate_system_scores(patient)
+        expected = reference_system_scores(model.system_scores, patient)
+        assert scores.keys() == expected.keys()
+        np.testing.assert_allclose(list(scores.values()), list(expected.values()), atol=1e-9)
+
+    partial = {'glucose': 130, 'hdl': 30}
+    assert model.calculate_system_scores(partial) == pytest.approx(reference_system_scores(model.system_scores, partial))
+
+
+def test_frame_gives_one_row_per_patient(model):
+    data = model.generate_training_data(n_samples=300)
+
+    scores = model.calculate_system_scores(data)
+
+    assert list(scores.columns) == list(model.system_scores)
+    assert scores.index.equals(data.index)
+    expected = pd.DataFrame([reference_system_scores(model.system_scores, row) for row in data.to_dict('records')])
+    np.testing.assert_allclose(scores.to_numpy(), expected.to_numpy(), atol=1e-9)
+
+
+def test_normalize_marker_accepts_arrays(model):
+    values = np.array([50.0, 85.0, 130.0])
+
+    np.testing.assert_allclose(model.normalize_marker('glucose', values), [0.0, 0.5, 1.0])
+    assert model.normalize_marker('glucose', 85) == 0.5
+    assert model.normalize_marker('unknown', 1.0) == 0.5
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+SCORE_COLUMNS = [
+    'health_score', 'metabolite_score', 'comprehensive_score',
+    'liver_score', 'kidney_score', 'cardio_score',
+    'endocrine_score', 'immune_score', 'digestive_score'
+]
+
+
+def reference_target_scores(data):
+    """Row-by-row scoring as generate_target_variables did it before vectorization"""
+    rows = []
+    for _, row in data.iterrows():
+        base_health = (
+            (100 - abs(row['glucose'] - 90) / 2) * 0.2 +
+            (100 - row['cholesterol'] / 200 * 100) * 0.2 +
+            (row['hdl'] / 60 * 100) * 0.2 +
+            (100 - row['bmi'] / 30 * 100) * 0.2 +
+            (100 - abs(row['total_protein'] - 7.0) * 20) * 0.2
+        ).clip(0, 100)
+        health_score = (
+            base_health * 0.6 +
+            (100 - row['cardiovascular_risk_index']) * 0.1 +
+            row['liver_health_index'] * 0.1 +
+            row['kidney_function_index'] * 0.1 +
+            row['metabolic_efficiency_score'] * 0.1
+        ).clip(0, 100)
+        metabolite_score = (
+            (100 - abs(row['glucose'] - 90)) * 0.2 +
+            (100 - row['cholesterol'] / 200 * 100) * 0.2 +
+            (row['hdl'] / 60 * 100) * 0.2 +
+            (100 - row['triglycerides'] / 150 * 100) * 0.2 +
+            (100 - abs(row['total_protein'] - 7.0) * 20) * 0.2
+        ).clip(0, 100)
+        comprehensive_score = (
+            health_score * 0.4 +
+            metabolite_score * 0.3 +
+            row['metabolic_efficiency_score'] * 0.3
+        ).clip(0, 100)
+        endocrine_score = (
+            (100 - abs(row['glucose'] - 90)) * 0.4 +
+            row['metabolic_efficiency_score'] * 0.6
+        ).clip(0, 100)
+        immune_score = (
+            (100 - row['inflammation_index']) * 0.5 +
+            (row['total_protein'] / 7.0 * 100) * 0.5
+        ).clip(0, 100)
+        digestive_score = (
+            row['liver_health_index'] * 0.3 +
+            (100 - abs(row['total_protein'] - 7.0) * 20) * 0.4 +
+            (100 - row['inflammation_index']) * 0.3
+        ).clip(0, 100)
+        rows.append([
+            health_score, metabolite_score, comprehensive_score,
+            row['liver_health_index'], row['kidney_function_index'],
+            100 - row['cardiovascular_risk_index'],
+            endocrine_score, immune_score, digestive_score
+        ])
+    return pd.DataFrame(rows, columns=SCORE_COLUMNS, dtype=np.float64)
+
+
+def test_matches_row_loop_on_training_data(model):
+    # The row loop needs all-numeric rows (object rows yield plain floats without .clip)
+    data = model.generate_training_data(n_samples=500).drop(columns=['health_status'])
+    expected = reference_target_scores(data)
+
+    result = model.generate_target_variables(data.copy())
+
+    for column in SCORE_COLUMNS:
+        np.testing.assert_array_equal(result[column].to_numpy(dtype=np.float64), expected[column].to_numpy())
+
+
+def test_matches_row_loop_with_defaults_and_missing_values(model):
+    rng = np.random.RandomState(0)
+    data = pd.DataFrame({
+        'glucose': rng.normal(95, 30, 200),
+        'hdl': rng.normal(50, 15, 200),
+        'bmi': rng.normal(27, 6, 200),
+        'inflammation_index': rng.normal(1, 0.5, 200)
+    })
+    data.loc[::7, 'glucose'] = np.nan
+
+    result = model.generate_target_variables(data.copy())
+    expected = reference_target_scores(result)
+
+    for column in SCORE_COLUMNS:
+        np.testing.assert_array_equal(result[column].to_numpy(dtype=np.float64), expected[column].to_numpy())
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from training_store import TrainingStore
+
+
+def test_legacy_csv_rows_are_imported_once(tmp_path):
+    rng = np.random.RandomState(0)
+    legacy = pd.DataFrame({'glucose': rng.normal(95, 15, 20), 'health_score': rng.uniform(0, 100, 20)})
+    legacy_csv = tmp_path / 'training_store.csv'
+    legacy.to_csv(legacy_csv, index=False)
+
+    store = TrainingStore(str(tmp_path / 'training_store'), legacy_csv=str(legacy_csv))
+    new_rows = pd.DataFrame({'health_score': [80.0], 'glucose': [90]})
+    store.append(new_rows)
+
+    reopened = TrainingStore(str(tmp_path / 'training_store'), legacy_csv=str(legacy_csv))
+    expected = pd.concat([legacy, new_rows[legacy.columns].astype(float)], ignore_index=True)
+    assert not legacy_csv.exists()
+    assert len(reopened) == 21
+    pd.testing.assert_frame_equal(reopened.load(), expected, check_exact=False)
+    pd.testing.assert_frame_equal(reopened.load(['health_score'], 15), expected[['health_score']].iloc[15:].reset_index(drop=True), check_exact=False)
+
+
+def test_empty_store_loads_none(tmp_path):
+    assert TrainingStore(str(tmp_path / 'training_store')).load() is None
+
+
+def test_directory_is_created_by_the_first_append(tmp_path):
+    store = TrainingStore(str(tmp_path / 'training_store'))
+    assert not (tmp_path / 'training_store').exists()
+    store.append(pd.DataFrame({'health_score': [75.0]}))
+    assert len(TrainingStore(str(tmp_path / 'training_store'))) == 1
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from ml_model import TREND_BIOMARKERS
+from sample_patients import generate_test_patient
+
+
+@pytest.fixture(scope='module')
+def cohort(model):
+    return model.generate_training_data(n_samples=50)
+
+
+def test_cohort_forecast_is_dense_and_bounded(model, cohort):
+    trends = model.simulate_trends(cohort, prediction_weeks=8, random_state=1)
+
+    assert trends['health_score'].shape == (50, 8)
+    assert trends['risk_level'].shape == (50, 8)
+    assert trends['biomarkers'].shape == (50, 8, len(TREND_BIOMARKERS))
+    for key in ('health_score', 'metabolite_score'):
+        assert ((trends[key] >= 0) & (trends[key] <= 100)).all()
+    np.testing.assert_allclose(trends['risk_level'], 100 - (trends['health_score'] + trends['metabolite_score']) / 2)
+    # Biomarkers stay close to the current value
+    current = cohort[TREND_BIOMARKERS].to_numpy()[:, None, :]
+    assert (np.abs(trends['biomarkers'] / current - 1) < 0.2).all()
+
+
+def test_each_patient_has_its_own_noise_stream(model, cohort):
+    batch = model.simulate_trends(cohort, random_state=7)
+    again = model.simulate_trends(cohort, random_state=7)
+    first_alone = model.simulate_trends(cohort.iloc[:1], random_state=7)
+
+    for key in batch:
+        np.testing.assert_array_equal(batch[key], again[key])
+        np.testing.assert_array_equal(batch[key][:1], first_alone[key])
+    assert not np.array_equal(batch['health_score'], model.simulate_trends(cohort, random_state=8)['health_score'])
+
+
+def test_single_patient_trends(model):
+    patient = generate_test_patient()
+
+    trends = model.predict_future_trends(patient, prediction_weeks=6)
+
+    assert len(trends['health_score']) == len(trends['metabolite_score']) == len(trends['risk_level']) == 6
+    assert set(trends['biomarker_predictions']) == {marker for marker in TREND_BIOMARKERS if marker in patient}
+    assert all(len(values) == 6 for values in trends['biomarker_predictions'].values())
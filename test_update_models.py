@@ -0,0 +1,94 @@
+import os
+
+import numpy as np
+import pytest
+
+from columnar_store import ColumnarStore
+
+
+@pytest.fixture
+def model(fresh_model):
+    # Every test registers updates of its own
+    return fresh_model
+
+
+def sample_rows(model, seed, n_samples):
+    return model._prepare_training_rows(model._sample_training_data(np.random.default_rng(seed), n_samples))
+
+
+def tree_leaves(model, X_scaled, n_classifier_trees, n_stages):
+    """Leaf reached by every probe row in the first trees of each ensemble"""
+    X_scaled = X_scaled.astype(np.float32)
+    leaves = [tree.apply(X_scaled) for tree in model.classifier.estimators_[:n_classifier_trees]]
+    for booster in model.regressor.estimators_:
+        leaves.extend(stage.apply(X_scaled) for stage in booster.estimators_[:n_stages, 0])
+    return np.array(leaves)
+
+
+def test_existing_trees_keep_their_decisions(model):
+    probe = sample_rows(model, 1, 300)[model.feature_columns]
+    n_classifier_trees = len(model.classifier.estimators_)
+    n_stages = model.regressor.estimators_[0].estimators_.shape[0]
+    before = tree_leaves(model, model.scaler.transform(probe), n_classifier_trees, n_stages)
+    old_mean = model.scaler.mean_.copy()
+
+    model.update_models(sample_rows(model, 2, 400), n_estimators=5)
+
+    assert not np.allclose(model.scaler.mean_, old_mean)
+    assert len(model.classifier.estimators_) == n_classifier_trees + 5
+    after = tree_leaves(model, model.scaler.transform(probe), n_classifier_trees, n_stages)
+    np.testing.assert_array_equal(after, before)
+
+
+def test_compiled_ensemble_matches_sklearn_after_update(model):
+    version = model.update_models(sample_rows(model, 2, 400), n_estimators=5)
+    probe = sample_rows(model, 3, 200)[model.feature_columns]
+    X_scaled = model.scaler.transform(probe)
+
+    expected_labels, expected_scores = model.classifier.predict(X_scaled), model.regressor.predict(X_scaled)
+    labels, scores = model.compiled.predict(X_scaled)
+    np.testing.assert_array_equal(labels, expected_labels)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-10, atol=1e-8)
+
+    # The re-registered version's flat export serves the same predictions
+    fingerprint = model.training_fingerprint()
+    artifacts = model.registry.load(fingerprint, mmap_mode='r')
+    assert model.registry.version == version
+    labels, scores = artifacts['compiled'].predict(artifacts['scaler'].transform(probe))
+    np.testing.assert_array_equal(labels, expected_labels)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-10, atol=1e-8)
+
+
+def test_classifier_is_skipped_when_new_rows_miss_a_class(model):
+    new_rows = sample_rows(model, 2, 100)
+    new_rows['health_score'] = 90.0
+    n_classifier_trees = len(model.classifier.estimators_)
+    n_stages = [booster.estimators_.shape[0] for booster in model.regressor.estimators_]
+
+    model.update_models(new_rows, n_estimators=3)
+
+    assert len(model.classifier.estimators_) == n_classifier_trees
+    assert [booster.estimators_.shape[0] for booster in model.regressor.estimators_] == [n + 3 for n in n_stages]
+
+
+def test_new_rows_are_appended_to_the_training_store(model):
+    first, second = sample_rows(model, 2, 120), sample_rows(model, 4, 80)
+
+    model.update_models(first, n_estimators=2)
+    model.update_models(second, n_estimators=2)
+
+    stored = model.training_store.load()
+    assert len(stored) == 200
+    np.testing.assert_allclose(stored['glucose'].to_numpy(), np.concatenate([first['glucose'], second['glucose']]))
+    assert list(stored.columns) == model.feature_columns + model.regression_targets
+
+
+def test_train_from_store_leaves_only_the_stored_columns(model, tmp_path):
+    store = ColumnarStore(str(tmp_path / 'rows'))
+    store.append(sample_rows(model, 5, 300))
+    before = sorted(os.listdir(store.directory))
+
+    version = model.train_from_store(store, chunk_size=100)
+
+    assert model.registry.version == version
+    assert sorted(os.listdir(store.directory)) == before
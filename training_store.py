@@ -0,0 +1,51 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import ColumnarStore
+
+
+class TrainingStore:
+    """Append-only store of prepared training rows (features plus targets).
+
+    Incremental updates append the rows they trained on here, and full
+    retrains read them back so accumulated patient data is never lost. Rows
+    are kept in a compressed ``ColumnarStore``, so reading them back means
+    decompressing binary columns rather than parsing CSV text, and readers
+    can ask for just the columns and rows they need. Rows in ``legacy_csv``
+    (the CSV file earlier versions wrote) are imported when the store is
+    first opened; the file is then renamed with an ``.imported`` suffix.
+    """
+
+    def __init__(self, directory, legacy_csv=None):
+        self.directory = directory
+        self.columns = ColumnarStore(directory, compression='zlib')
+        if legacy_csv is not None and os.path.exists(legacy_csv):
+            self.append(pd.read_csv(legacy_csv))
+            os.replace(legacy_csv, f'{legacy_csv}.imported')
+            print(f"Imported {len(self)} training rows from {legacy_csv}")
+
+    def __len__(self):
+        return len(self.columns)
+
+    def append(self, rows):
+        """Append a DataFrame of prepared rows."""
+        self.columns.append(rows.astype(np.float64))
+
+    def digest(self):
+        """Hash of the store's schema (columns, row count and compressed block
+        sizes), which changes with every append; None while the store is empty."""
+        if len(self) == 0:
+            return None
+        encoded = json.dumps(self.columns.schema, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def load(self, columns=None, start=0, stop=None):
+        """Return the stored rows (optionally only ``columns`` and rows
+        ``start:stop``), or None if nothing has been stored yet."""
+        if len(self) == 0:
+            return None
+        return self.columns.read(columns, start, stop)